@@ -0,0 +1,42 @@
+import functools
+
+
+class ChatMiddleware:
+    """
+    Base class for code that wraps an agent's LLM round-trips.
+
+    PraisonAI runs every task through `agent.chat()` (or `agent.achat()` for
+    async workflows). Subclasses override `__call__` / `acall` and decide
+    whether and how to invoke `call_next`, which is the original method.
+    """
+
+    def __call__(self, call_next, prompt, *args, **kwargs):
+        return call_next(prompt, *args, **kwargs)
+
+    async def acall(self, call_next, prompt, *args, **kwargs):
+        return await call_next(prompt, *args, **kwargs)
+
+
+def wrap_chat(agent, middleware: ChatMiddleware):
+    """Routes a PraisonAI agent's chat()/achat() through the given middleware."""
+    chat = agent.chat
+
+    @functools.wraps(chat)
+    def wrapped_chat(prompt, *args, **kwargs):
+        return middleware(chat, prompt, *args, **kwargs)
+
+    agent.chat = wrapped_chat
+
+    achat = getattr(agent, "achat", None)
+    if achat is not None:
+        @functools.wraps(achat)
+        async def wrapped_achat(prompt, *args, **kwargs):
+            return await middleware.acall(achat, prompt, *args, **kwargs)
+
+        agent.achat = wrapped_achat
+
+
+def agent_key(agent_wrapper) -> str:
+    """Short name of one of our agent wrappers, e.g. ReviewerAgent -> 'reviewer'."""
+    name = type(agent_wrapper).__name__
+    return (name[:-len("Agent")] if name.endswith("Agent") else name).lower()
@@ -0,0 +1,296 @@
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+# Upstream context allowed per task, in tokens. Looked up by task name, then
+# by its prefix ("hypothesis_2" -> "hypothesis"); tasks without an entry
+# (e.g. the first hypothesis task, which has no upstream) are not limited.
+DEFAULT_BUDGETS = {
+    "design": 1500,   # The hypothesis (or all candidates).
+    "execute": 3000,  # The design: its code blocks are always passed verbatim.
+    "analyze": 2000,  # The execution report.
+    "write": 2500,    # The analysis and the hypothesis.
+    "review": 4000,   # Anything besides the draft (see VERBATIM_INPUTS).
+}
+
+# Upstream outputs a task edits rather than reads, by task name (then prefix).
+# They are always passed whole: the reviewer must revise the actual draft, not
+# a digest of it. They count against the budget; the task's other upstream
+# outputs share what is left (at least a tenth of the budget).
+VERBATIM_INPUTS = {
+    "review": ("write",),
+}
+
+_CHARS_PER_TOKEN = 4
+_TRUNCATED = "\n[... truncated to fit the context budget]"
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"[a-z][a-z0-9_\-]{2,}")
+_NUMBER_RE = re.compile(r"\d")
+_CODE_BLOCK_RE = re.compile(r"```.*?```", re.S)
+_METRIC_LINE_RE = re.compile(r"\d.*(%|[:=])|[:=]\s*-?\.?\d", re.I)
+_ERROR_LINE_RE = re.compile(r"traceback|error|exception|failed|warning", re.I)
+_STATUS_LINE_RE = re.compile(r"success|status|wall_time|cpu_time|peak_rss|result", re.I)
+_LATEX_SECTION_RE = re.compile(r"\\(?:sub)*section\*?\{([^}]*)\}")
+_LATEX_COMMAND_RE = re.compile(r"\\[a-zA-Z]+\*?(?:\[[^\]]*\])?")
+_STOPWORDS = frozenset(
+    "the and for are but not you all any can had her was one our out has have this that with from they will "
+    "would there their what which when were been into more some such than then them these also its may our "
+    "each other only over should very".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), as used for tracing."""
+    return math.ceil(len(text) / _CHARS_PER_TOKEN) if text else 0
+
+
+def _truncate(text: str, tokens: int) -> str:
+    limit = tokens * _CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:max(0, limit - len(_TRUNCATED))].rstrip() + _TRUNCATED
+
+
+def extractive_summary(text: str, tokens: int) -> str:
+    """
+    The most informative sentences of `text` that fit in `tokens`, in their
+    original order. Sentences score by the frequency of their content words
+    across the text, with a bonus for numbers; the first sentence is always kept.
+    """
+    if estimate_tokens(text) <= tokens:
+        return text
+    sentences = list(dict.fromkeys(s.strip() for s in _SENTENCE_RE.split(text) if s.strip()))
+    if len(sentences) <= 1:
+        return _truncate(" ".join(sentences), tokens)
+    frequency = Counter(word for word in _WORD_RE.findall(text.lower()) if word not in _STOPWORDS)
+
+    def score(sentence):
+        words = [word for word in _WORD_RE.findall(sentence.lower()) if word not in _STOPWORDS]
+        if not words:
+            return 0.0
+        return sum(frequency[word] for word in words) / len(words) + 2.0 * bool(_NUMBER_RE.search(sentence))
+
+    ranked = sorted(range(1, len(sentences)), key=lambda i: -score(sentences[i]))
+    limit = tokens * _CHARS_PER_TOKEN
+    keep, used = {0}, len(sentences[0])
+    for i in ranked:
+        if used + len(sentences[i]) + 1 <= limit:
+            keep.add(i)
+            used += len(sentences[i]) + 1
+    return _truncate(" ".join(sentences[i] for i in sorted(keep)), tokens)
+
+
+def digest_execution(text: str, tokens: int) -> str:
+    """
+    An execution report reduced to what downstream analysis needs: lines
+    carrying numbers or metrics, status lines, and errors (with the last line
+    of each traceback), in order. Reports without such lines are summarized.
+    """
+    if estimate_tokens(text) <= tokens:
+        return text
+    lines = text.splitlines()
+    kept, seen = [], set()
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped or stripped in seen:
+            continue
+        traceback_end = i > 0 and lines[i - 1].startswith("  ") and not line.startswith(" ")
+        if (_METRIC_LINE_RE.search(stripped) or _ERROR_LINE_RE.search(stripped)
+                or _STATUS_LINE_RE.search(stripped) or traceback_end):
+            seen.add(stripped)
+            kept.append(stripped)
+    if not kept:
+        return extractive_summary(text, tokens)  # A prose report: nothing to pick lines from.
+    digest = f"[Execution digest: {len(kept)} of {len(lines)} lines]\n" + "\n".join(kept)
+    if estimate_tokens(digest) > tokens and len(kept) > 2:
+        # The end (final metrics, errors) first, then as much of the start as fits.
+        available = tokens * _CHARS_PER_TOKEN - 100  # Header and omission marker.
+        tail, used = [], 0
+        for line in reversed(kept):
+            if used + len(line) + 1 > available // 2:
+                break
+            tail.insert(0, line)
+            used += len(line) + 1
+        head = []
+        for line in kept[:len(kept) - len(tail)]:
+            if used + len(line) + 1 > available:
+                break
+            head.append(line)
+            used += len(line) + 1
+        skipped = len(kept) - len(head) - len(tail)
+        digest = (f"[Execution digest: {len(head) + len(tail)} of {len(lines)} lines]\n" + "\n".join(head)
+                  + (f"\n[... {skipped} lines omitted]\n" if skipped else "\n") + "\n".join(tail))
+    return _truncate(digest, tokens)
+
+
+def digest_design(text: str, tokens: int) -> str:
+    """
+    Code blocks are kept verbatim, since they are executed as written; the
+    prose around them is summarized into whatever budget is left.
+    """
+    if estimate_tokens(text) <= tokens:
+        return text
+    blocks = _CODE_BLOCK_RE.findall(text)
+    if not blocks:
+        return extractive_summary(text, tokens)
+    prose = _CODE_BLOCK_RE.sub("\n", text)
+    remaining = max(tokens - sum(map(estimate_tokens, blocks)), tokens // 10)
+    return extractive_summary(prose, remaining) + "\n\n" + "\n\n".join(blocks)
+
+
+def digest_latex(text: str, tokens: int) -> str:
+    """
+    A LaTeX draft as plain text: the preamble is dropped and each section is
+    summarized under its heading, sharing the budget by section length.
+    """
+    if estimate_tokens(text) <= tokens:
+        return text
+    body = text.split("\\begin{document}", 1)[-1].split("\\end{document}", 1)[0]
+    parts = _LATEX_SECTION_RE.split(body)  # [intro, title, body, title, body, ...]
+    sections = [("", parts[0])] + list(zip(parts[1::2], parts[2::2]))
+    plain = [(title, re.sub(r"[{}]", "", _LATEX_COMMAND_RE.sub("", content)).strip())
+             for title, content in sections]
+    plain = [(title, content) for title, content in plain if title or content]
+    total = sum(len(content) for _, content in plain) or 1
+    available = tokens - sum(estimate_tokens(title) + 2 for title, _ in plain)
+    out = []
+    for title, content in plain:
+        share = max(1, available * len(content) // total)
+        summary = extractive_summary(content, share) if content else ""
+        out.append(f"## {title}\n{summary}" if title else summary)
+    return _truncate("\n\n".join(out), tokens)
+
+
+# How an oversized upstream output is reduced, by task name (then prefix).
+DIGESTERS = {
+    "design": digest_design,
+    "execute": digest_execution,
+    "write": digest_latex,
+}
+
+
+def _lookup(table: dict, name: str):
+    return table.get(name, table.get(name.split("_")[0]))
+
+
+class ContextBudget:
+    """
+    Caps the upstream context in each task's prompt (workflows.scheduler
+    builds prompts from only the outputs a task declares it depends on). When
+    those outputs exceed the task's budget, small ones pass through intact
+    and the large ones share the rest, each reduced by the digester for its
+    kind (DIGESTERS, else an extractive summary). Outputs the task edits
+    (VERBATIM_INPUTS) are never reduced. Digests are cached by
+    content hash in an LRU of `max_entries`; `stages` records the tokens
+    each task's context had before and after.
+    """
+
+    def __init__(self, budgets: dict = None, default: int = None, max_entries: int = 256, verbatim: dict = None):
+        self.budgets = dict(DEFAULT_BUDGETS if budgets is None else budgets)
+        self.default = default
+        self.verbatim = dict(VERBATIM_INPUTS if verbatim is None else verbatim)
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "tokens_in": 0, "tokens_out": 0}
+        self.stages = {}  # task name -> {budget, tokens_in, tokens_out, digested}
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Returns None when CONTEXT_BUDGET is set to 0/false/off. A number sets
+        one budget (in tokens) for every task instead of DEFAULT_BUDGETS.
+        """
+        value = os.environ.get("CONTEXT_BUDGET", "1").lower()
+        if value in ("0", "false", "no", "off"):
+            return None
+        if value in ("1", "true", "yes", "on"):
+            return cls()
+        return cls(budgets={}, default=int(value))
+
+    def budget_for(self, name: str):
+        budget = _lookup(self.budgets, name)
+        return self.default if budget is None else budget
+
+    def _digest(self, name: str, text: str, tokens: int) -> str:
+        key = (name.split("_")[0], hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest(), tokens)
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest is not None:
+                self._digests.move_to_end(key)
+                self.stats["hits"] += 1
+                return digest
+        digest = (_lookup(DIGESTERS, name) or extractive_summary)(text, tokens)
+        with self._lock:
+            self.stats["misses"] += 1
+            self._digests[key] = digest
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+        return digest
+
+    def fit(self, name: str, upstream: dict) -> dict:
+        """The upstream outputs for task `name`, reduced to fit its budget."""
+        sizes = {dep: estimate_tokens(text) for dep, text in upstream.items()}
+        budget = self.budget_for(name)
+        fitted, digested = dict(upstream), []
+        if budget is not None and sum(sizes.values()) > budget:
+            verbatim = set(_lookup(self.verbatim, name) or ()) & set(sizes)
+            reducible = {dep: size for dep, size in sizes.items() if dep not in verbatim}
+            # Water-filling: the smallest outputs are kept whole while they fit
+            # their equal share; what they leave over goes to the larger ones.
+            remaining = max(budget - sum(sizes[dep] for dep in verbatim), budget // 10)
+            left = len(reducible)
+            for dep in sorted(reducible, key=reducible.get):
+                share = remaining // left
+                if sizes[dep] > share:
+                    fitted[dep] = self._digest(dep, upstream[dep], max(share, 1))
+                    digested.append(dep)
+                remaining -= min(sizes[dep], share)
+                left -= 1
+        tokens_in = sum(sizes.values())
+        tokens_out = sum(estimate_tokens(text) for text in fitted.values())
+        with self._lock:
+            self.stats["tokens_in"] += tokens_in
+            self.stats["tokens_out"] += tokens_out
+            stage = self.stages.setdefault(name, {"budget": budget, "tokens_in": 0, "tokens_out": 0,
+                                                  "digested": []})
+            stage["tokens_in"] += tokens_in
+            stage["tokens_out"] += tokens_out
+            stage["digested"] = sorted(set(stage["digested"]) | set(digested))
+        return fitted
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.stats["tokens_in"] - self.stats["tokens_out"]
+
+    def rows(self) -> list[dict]:
+        with self._lock:
+            return [dict(stage, task=name, saved=stage["tokens_in"] - stage["tokens_out"])
+                    for name, stage in self.stages.items()]
+
+    def summary(self) -> str:
+        total = self.stats["tokens_in"]
+        lines = [f"Context budget: {self.tokens_saved} of {total} upstream tokens saved "
+                 f"({100 * self.tokens_saved / total if total else 0:.0f}%), {self.stats['hits']} cached digests"]
+        for row in self.rows():
+            if row["tokens_in"]:
+                lines.append(f"  {row['task']:<14} budget {row['budget'] or '-':>5}  {row['tokens_in']:>6} -> "
+                             f"{row['tokens_out']:>6} tokens" + (f"  (digested: {', '.join(row['digested'])})"
+                                                                if row["digested"] else ""))
+        return "\n".join(lines)
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def get_context_budget():
+    """The process-wide ContextBudget, or None when disabled via CONTEXT_BUDGET=0."""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = ContextBudget.from_env() or False
+        return _budget or None
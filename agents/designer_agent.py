@@ -15,11 +15,18 @@ class DesignerAgent:
             llm=self.llm
         )
 
-    def get_task(self) -> Task:
+    def get_task(self, num_hypotheses: int = 1) -> Task:
+        if num_hypotheses > 1:
+            opening = (
+                f"The researchers proposed {num_hypotheses} candidate hypotheses. Pick the clearest, most testable one, "
+                "state it, and design a Python script for a computational experiment to test it. "
+            )
+        else:
+            opening = "Based on the hypothesis from the researcher, design a Python script for a computational experiment. "
         return Task(
             agent=self.agent,
             description=(
-                "Based on the hypothesis from the researcher, design a Python script for a computational experiment. "
+                opening +
                 "The script should:\n"
                 "- Generate 100 hypothetical molecular structures using a mock GNN model.\n"
                 "- Simulate the prediction of 'binding_affinity' and 'toxicity_score' for each.\n"
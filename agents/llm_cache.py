@@ -0,0 +1,207 @@
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from agents.chat_hooks import ChatMiddleware, agent_key, wrap_chat
+
+
+def model_key(llm_config) -> str:
+    """Identifies the model behind an `agent_llm_config` (never includes the API key)."""
+    if isinstance(llm_config, dict):
+        return json.dumps({k: v for k, v in llm_config.items() if k != "api_key"}, sort_keys=True)
+    return str(llm_config)
+
+
+def tool_schema(tools) -> list:
+    """A stable description of an agent's tools: name, signature and docstring."""
+    schema = []
+    for tool in tools or []:
+        try:
+            signature = str(inspect.signature(tool))
+        except (TypeError, ValueError):
+            signature = ""
+        schema.append([getattr(tool, "__name__", repr(tool)), signature, inspect.getdoc(tool) or ""])
+    return schema
+
+
+def _stable_default(value):
+    # Tools, pydantic models etc. show up in chat kwargs; their repr embeds a
+    # memory address, so key on the qualified name instead.
+    return getattr(value, "__qualname__", None) or type(value).__name__
+
+
+class LLMResponseCache:
+    """
+    Disk-backed cache of LLM responses shared by all agents.
+
+    Keys hash the model, the agent's system prompt (role/goal/backstory), the
+    conversation so far plus the new prompt, and the tool schema. Entries
+    expire after `ttl` seconds; when the database exceeds `max_bytes` the
+    least recently used entries are evicted. Backed by SQLite, so several
+    processes can share one cache file.
+    """
+
+    def __init__(self, path: str = "llm_cache.sqlite", ttl: float = 7 * 24 * 3600,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "stores": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, agent TEXT NOT NULL, response TEXT NOT NULL,
+                size INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds the cache from LLM_CACHE* environment variables, or returns None
+        when LLM_CACHE is not enabled.
+        """
+        if os.environ.get("LLM_CACHE", "").lower() not in ("1", "true", "yes", "on"):
+            return None
+        return cls(
+            path=os.environ.get("LLM_CACHE_PATH", "llm_cache.sqlite"),
+            ttl=float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600)),
+            max_bytes=int(float(os.environ.get("LLM_CACHE_MAX_MB", 256)) * 1024 * 1024),
+        )
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, messages: list, tools: list) -> str:
+        payload = json.dumps([model, system_prompt, messages, tools], sort_keys=True, default=_stable_default)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, agent: str, response: str):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, agent, response, size, now, now),
+            )
+            self.stats["stores"] += 1
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from least to most recently used until we are back under budget.
+        cursor = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access")
+        victims = []
+        for key, size in cursor:
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.stats["evictions"] += len(victims)
+
+    def summary(self) -> str:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        rate = self.stats["hits"] / lookups if lookups else 0.0
+        return (f"LLM cache: {self.stats['hits']} hits / {self.stats['misses']} misses "
+                f"({rate:.0%} hit rate), {self.stats['expired']} expired, {self.stats['evictions']} evicted")
+
+
+class ResponseCacheMiddleware(ChatMiddleware):
+    """
+    Serves an agent's chat() from the LLMResponseCache when the same request
+    was seen before. A hit is appended to the agent's chat_history like a
+    real turn, so follow-up prompts see (and key on) the same conversation.
+    """
+
+    def __init__(self, cache: LLMResponseCache, agent, name: str, model: str):
+        self.cache = cache
+        self.agent = agent
+        self.name = name
+        self.model = model
+        self.system_prompt = "\n".join(
+            str(getattr(agent, attr, "") or "") for attr in ("role", "goal", "backstory", "instructions")
+        )
+        self.tools = tool_schema(getattr(agent, "tools", None))
+
+    def _key(self, prompt, args, kwargs) -> str:
+        history = getattr(self.agent, "chat_history", None) or []
+        messages = list(history) + [{"role": "user", "content": prompt, "args": args, "kwargs": kwargs}]
+        return self.cache.make_key(self.model, self.system_prompt, messages, self.tools)
+
+    def _replay(self, prompt, response: str) -> str:
+        """Records a cached exchange in the agent's history, as a real chat() would."""
+        append = getattr(self.agent, "_append_to_chat_history", None)
+        if append is None:
+            history = getattr(self.agent, "chat_history", None)
+            append = history.append if isinstance(history, list) else None
+        if append is not None:
+            append({"role": "user", "content": prompt})
+            append({"role": "assistant", "content": response})
+        return response
+
+    def __call__(self, call_next, prompt, *args, **kwargs):
+        key = self._key(prompt, args, kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self._replay(prompt, cached)
+        response = call_next(prompt, *args, **kwargs)
+        if isinstance(response, str) and response:
+            self.cache.put(key, self.name, response)
+        return response
+
+    async def acall(self, call_next, prompt, *args, **kwargs):
+        key = self._key(prompt, args, kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self._replay(prompt, cached)
+        response = await call_next(prompt, *args, **kwargs)
+        if isinstance(response, str) and response:
+            self.cache.put(key, self.name, response)
+        return response
+
+
+def install_response_cache(agent_wrapper, cache: LLMResponseCache, llm_config) -> bool:
+    """
+    Enables response caching for one of our agent wrappers (ResearcherAgent etc.).
+    A hit skips the whole turn, including any tool calls the model would have
+    made (e.g. the Technician's execute_python_code), so agents with tools are
+    not cached unless they set `cache_responses = True`. Agents opt out with
+    `cache_responses = False` or by being listed in the comma-separated
+    LLM_CACHE_EXCLUDE env var (e.g. "reviewer,writer").
+    Returns True if the cache was installed.
+    """
+    name = agent_key(agent_wrapper)
+    excluded = {n.strip().lower() for n in os.environ.get("LLM_CACHE_EXCLUDE", "").split(",") if n.strip()}
+    enabled = getattr(agent_wrapper, "cache_responses", None)
+    if enabled is None:
+        enabled = not getattr(agent_wrapper.agent, "tools", None)
+    if not enabled or name in excluded:
+        return False
+    wrap_chat(agent_wrapper.agent, ResponseCacheMiddleware(cache, agent_wrapper.agent, name, model_key(llm_config)))
+    return True
@@ -0,0 +1,261 @@
+import json
+import os
+import re
+import threading
+import time
+
+from agents.chat_hooks import ChatMiddleware, agent_key, wrap_chat
+
+# Used when a routing file does not define its own; ordered from cheapest to strongest.
+DEFAULT_ESCALATION = ("cheap", "standard", "strong")
+
+# Responses that are a provider or client error rather than an answer.
+_ERROR_RESPONSE_RE = re.compile(
+    r"^\s*(error|an error occurred|litellm\.|openai\.|\w*(APIConnection|RateLimit|Authentication|Timeout)Error)",
+    re.I,
+)
+
+
+def _clarity_check(output: str):
+    from tools.scientific_tools import ScientificTools
+    result = ScientificTools.evaluate_hypothesis_clarity(output)
+    return None if result["proceed"] else f"unclear hypothesis (score {result['score']})"
+
+
+def _design_check(output: str):
+    from tools.scientific_tools import ScientificTools
+    from workflows.closed_loop import fenced_code
+    source = fenced_code(output)
+    if not source:
+        return None  # A design in prose; there is no code to check.
+    code = ScientificTools.analyze_code_for_errors(source)
+    if any(issue["severity"] == "error" for issue in code["issues"]):
+        return f"broken code ({code['diagnosis']})"
+    return None
+
+
+# Output checks per agent beyond the generic ones: (output) -> reason it fails, or None.
+VALIDATORS = {
+    "researcher": _clarity_check,
+    "designer": _design_check,
+}
+
+
+def validate_output(agent: str, output, min_chars: int = 20):
+    """Why an agent's response is unusable, or None if it passes."""
+    text = "" if output is None else str(output)
+    if not text.strip():
+        return "empty response"
+    if _ERROR_RESPONSE_RE.match(text):
+        return f"provider error ({text.strip()[:80]})"
+    if len(text.strip()) < min_chars:
+        return f"response shorter than {min_chars} characters"
+    check = VALIDATORS.get(agent)
+    return check(text) if check is not None else None
+
+
+class ModelRouter:
+    """
+    Assigns each agent (and optionally each task) a model tier from a JSON
+    routing file:
+
+        {"tiers": {"cheap":    {"provider": "ollama", "model": "llama3"},
+                   "standard": {"provider": "openai", "model": "gpt-4o-mini",
+                                "cost_per_1k_input": 0.00015, "cost_per_1k_output": 0.0006},
+                   "strong":   {"provider": "openai", "model": "gpt-4o",
+                                "cost_per_1k_input": 0.0025, "cost_per_1k_output": 0.01}},
+         "default": "standard",
+         "agents": {"technician": "cheap", "analyst": "cheap", "writer": "strong", "reviewer": "strong"},
+         "tasks": {"design": "strong"},
+         "escalation": ["cheap", "standard", "strong"],
+         "max_escalations": 2}
+
+    Tiers may mix providers. Besides "provider" and "model", a tier takes
+    "api_base" and "api_key" (default: the provider's environment variables).
+    When a response fails validate_output(), the call is repeated on the next
+    tier of "escalation", up to `max_escalations` times. Latency, tokens and
+    cost are accumulated per tier in `stats`.
+    """
+
+    def __init__(self, tiers: dict, default: str = None, agents: dict = None, tasks: dict = None,
+                 escalation=None, max_escalations: int = 2, min_chars: int = 20):
+        if not tiers:
+            raise ValueError("Model routing needs at least one tier.")
+        self.tiers = tiers
+        self.default = default or next(iter(tiers))
+        self.agents = agents or {}
+        self.tasks = tasks or {}
+        self.escalation = [tier for tier in (escalation or DEFAULT_ESCALATION) if tier in tiers]
+        self.max_escalations = max_escalations
+        self.min_chars = min_chars
+        unknown = {tier for tier in [self.default, *self.agents.values(), *self.tasks.values()] if tier not in tiers}
+        if unknown:
+            raise ValueError(f"Routing refers to undefined tier(s): {sorted(unknown)}")
+        for name, tier in tiers.items():
+            if tier.get("provider", "openai") not in ("openai", "ollama"):
+                raise ValueError(f"Tier '{name}': unsupported provider '{tier.get('provider')}'.")
+        self.stats = {name: {"calls": 0, "seconds": 0.0, "tokens_in": 0, "tokens_out": 0, "cost": 0.0,
+                             "failed_validation": 0, "escalated_in": 0} for name in tiers}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str):
+        with open(path) as f:
+            config = json.load(f)
+        return cls(config.get("tiers", {}), default=config.get("default"), agents=config.get("agents"),
+                   tasks=config.get("tasks"), escalation=config.get("escalation"),
+                   max_escalations=config.get("max_escalations", 2), min_chars=config.get("min_chars", 20))
+
+    @classmethod
+    def from_env(cls):
+        """The router described by the file at MODEL_ROUTING, or None when it is unset."""
+        path = os.environ.get("MODEL_ROUTING")
+        return cls.from_file(path) if path else None
+
+    def tier_for(self, agent: str, task: str = None) -> str:
+        """Task entries ("hypothesis" also covers hypothesis_<i>) win over agent entries."""
+        if task is not None:
+            tier = self.tasks.get(task, self.tasks.get(task.split("_")[0]))
+            if tier is not None:
+                return tier
+        return self.agents.get(agent, self.default)
+
+    def provider(self, tier: str) -> str:
+        return self.tiers[tier].get("provider", "openai")
+
+    def llm_config(self, tier: str):
+        """The `llm` argument for agents on `tier` (same shapes as llm_config.configure_llm())."""
+        spec = self.tiers[tier]
+        if self.provider(tier) == "ollama":
+            model = spec.get("model") or os.environ.get("OLLAMA_MODEL_NAME")
+            api_base = spec.get("api_base") or os.environ.get("OLLAMA_API_BASE")
+            if not api_base:
+                return model
+            # A dict, so one run can talk to Ollama and OpenAI at the same time.
+            return {"model": model if model.startswith("ollama/") else f"ollama/{model}", "base_url": api_base}
+        config = {
+            "model": spec.get("model") or os.environ.get("OPENAI_MODEL_NAME", "gpt-3.5-turbo"),
+            "api_key": spec.get("api_key") or os.environ.get("OPENAI_API_KEY", "not-needed"),
+        }
+        api_base = spec.get("api_base") or os.environ.get("OPENAI_API_BASE")
+        if api_base:
+            config["base_url"] = api_base
+        return config
+
+    def model_key(self) -> str:
+        """Identifies the routing (tiers, models and assignments, never API keys), e.g. for checkpoints."""
+        tiers = {name: {k: v for k, v in spec.items() if k != "api_key"} for name, spec in self.tiers.items()}
+        return json.dumps({"tiers": tiers, "default": self.default, "agents": self.agents, "tasks": self.tasks},
+                          sort_keys=True)
+
+    def next_tier(self, tier: str):
+        """The tier to escalate to from `tier`, or None at the top."""
+        if tier not in self.escalation:
+            return None
+        index = self.escalation.index(tier)
+        return self.escalation[index + 1] if index + 1 < len(self.escalation) else None
+
+    def record(self, tier: str, seconds: float, tokens_in: int, tokens_out: int, failed: bool = False,
+               escalated: bool = False):
+        spec = self.tiers[tier]
+        cost = (tokens_in * spec.get("cost_per_1k_input", 0.0) + tokens_out * spec.get("cost_per_1k_output", 0.0)) / 1000
+        with self._lock:
+            stats = self.stats[tier]
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["tokens_in"] += tokens_in
+            stats["tokens_out"] += tokens_out
+            stats["cost"] += cost
+            stats["failed_validation"] += failed
+            stats["escalated_in"] += escalated
+
+    def report(self) -> list[dict]:
+        with self._lock:
+            return [dict(stats, tier=name, model=self.tiers[name].get("model"), provider=self.provider(name),
+                         mean_latency=stats["seconds"] / stats["calls"] if stats["calls"] else 0.0)
+                    for name, stats in self.stats.items()]
+
+    def summary(self) -> str:
+        lines = [f"{'tier':<10} {'model':<24} {'calls':>5} {'mean s':>8} {'tokens in':>10} {'tokens out':>10} "
+                 f"{'cost $':>9} {'failed':>6} {'escalated in':>12}"]
+        for row in self.report():
+            lines.append(f"{row['tier']:<10} {str(row['model'])[:24]:<24} {row['calls']:>5} {row['mean_latency']:>8.2f} "
+                         f"{row['tokens_in']:>10} {row['tokens_out']:>10} {row['cost']:>9.4f} "
+                         f"{row['failed_validation']:>6} {row['escalated_in']:>12}")
+        return "Model routing:\n" + "\n".join(lines)
+
+
+class RoutingMiddleware(ChatMiddleware):
+    """
+    Accounts each chat() round-trip to the agent's tier and, when the response
+    fails validation, hands the same prompt to `escalate(tier)` -- the chat
+    of an agent on the next tier, which is routed the same way.
+    """
+
+    def __init__(self, router: ModelRouter, agent, name: str, tier: str, escalate, depth: int = 0):
+        self.router = router
+        self.agent = agent
+        self.name = name
+        self.tier = tier
+        self.escalate = escalate
+        self.depth = depth  # How many escalations led to this agent.
+
+    def _usage(self):
+        try:
+            usage = self.agent.cost_summary
+            return usage["tokens_in"], usage["tokens_out"]
+        except Exception:
+            return None
+
+    def _account(self, prompt, response, before, seconds) -> bool:
+        """Records the call; returns True if the response should be escalated."""
+        after = self._usage()
+        if before is not None and after is not None and after != (0, 0):
+            tokens_in, tokens_out = after[0] - before[0], after[1] - before[1]
+        else:
+            tokens_in, tokens_out = len(str(prompt)) // 4, len(str(response or "")) // 4
+        reason = validate_output(self.name, response, self.router.min_chars)
+        target = self.router.next_tier(self.tier) if self.depth < self.router.max_escalations else None
+        self.router.record(self.tier, seconds, tokens_in, tokens_out, failed=reason is not None,
+                           escalated=self.depth > 0)
+        if reason is not None and target is not None:
+            print(f"--- Escalating {self.name} from '{self.tier}' to '{target}': {reason} ---")
+            return True
+        return False
+
+    def __call__(self, call_next, prompt, *args, **kwargs):
+        before, start = self._usage(), time.perf_counter()
+        response = call_next(prompt, *args, **kwargs)
+        if self._account(prompt, response, before, time.perf_counter() - start):
+            return self.escalate(self.router.next_tier(self.tier)).chat(prompt, *args, **kwargs)
+        return response
+
+    async def acall(self, call_next, prompt, *args, **kwargs):
+        before, start = self._usage(), time.perf_counter()
+        response = await call_next(prompt, *args, **kwargs)
+        if self._account(prompt, response, before, time.perf_counter() - start):
+            return await self.escalate(self.router.next_tier(self.tier)).achat(prompt, *args, **kwargs)
+        return response
+
+
+def install_routing(agent_wrapper, router: ModelRouter, tier: str, escalate, depth: int = 0):
+    """
+    Routes one of our agent wrappers through `router`; `escalate(tier)` must
+    return the PraisonAI agent to retry a failed response with (built with
+    router.llm_config(tier) and installed with depth + 1).
+    """
+    wrap_chat(agent_wrapper.agent, RoutingMiddleware(router, agent_wrapper.agent, agent_key(agent_wrapper),
+                                                     tier, escalate, depth))
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """The process-wide ModelRouter, or None when MODEL_ROUTING is unset."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter.from_env() or False
+        return _router or None
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+from agents.chat_hooks import ChatMiddleware
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursting up to `capacity`.
+    acquire() blocks until a token is available; charge() takes tokens for
+    requests that were already made, and later callers wait off the debt.
+    Together, callers never exceed the rate averaged over the burst window.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError("TokenBucket rate must be positive.")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0  # Total seconds callers spent blocked, for reporting.
+
+    def _reserve(self, tokens: float) -> float:
+        """Takes tokens (possibly going negative) and returns how long to wait for them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += delay
+            return delay
+
+    def charge(self, tokens: float):
+        """Takes tokens without waiting; the bucket may go negative."""
+        with self._lock:
+            self._tokens -= tokens
+
+    def acquire(self, tokens: float = 1.0):
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class RateLimitMiddleware(ChatMiddleware):
+    """
+    Rate-limits an agent's LLM requests. A chat() that calls tools makes
+    several completion requests, so one token is taken before the chat and
+    the completions it made beyond that (from the agent's cost_summary) are
+    charged afterwards.
+    """
+
+    def __init__(self, bucket: TokenBucket, agent=None):
+        self.bucket = bucket
+        self.agent = agent
+
+    def _llm_calls(self):
+        try:
+            return self.agent.cost_summary["llm_calls"]
+        except Exception:
+            return None
+
+    def _charge_extra(self, before):
+        after = self._llm_calls()
+        if before is not None and after is not None and after - before > 1:
+            self.bucket.charge(after - before - 1)
+
+    def __call__(self, call_next, prompt, *args, **kwargs):
+        self.bucket.acquire()
+        before = self._llm_calls()
+        try:
+            return call_next(prompt, *args, **kwargs)
+        finally:
+            self._charge_extra(before)
+
+    async def acall(self, call_next, prompt, *args, **kwargs):
+        await self.bucket.acquire_async()
+        before = self._llm_calls()
+        try:
+            return await call_next(prompt, *args, **kwargs)
+        finally:
+            self._charge_extra(before)
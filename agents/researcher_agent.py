@@ -17,12 +17,15 @@ class ResearcherAgent:
             llm=self.llm
         )
 
-    def get_task(self, research_topic: str) -> Task:
-        return Task(
-            agent=self.agent,
-            description=(
-                f"1. Search for recent papers on the topic: '{research_topic}'.\n"
-                "2. Analyze the findings and identify a gap in the current research.\n"
-                "3. Formulate a single, clear, and testable hypothesis based on this gap."
-            )
+    def get_task(self, research_topic: str, candidate: int = None, num_candidates: int = 1) -> Task:
+        description = (
+            f"1. Search for recent papers on the topic: '{research_topic}'.\n"
+            "2. Analyze the findings and identify a gap in the current research.\n"
+            "3. Formulate a single, clear, and testable hypothesis based on this gap."
         )
+        if candidate is not None and num_candidates > 1:
+            description += (
+                f"\nYou are producing candidate hypothesis {candidate} of {num_candidates}; "
+                "pursue a different research gap than the other candidates would."
+            )
+        return Task(agent=self.agent, description=description)
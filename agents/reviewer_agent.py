@@ -2,6 +2,9 @@ from praisonaiagents import Agent as PraisonAIAgent
 from praisonaiagents import Task
 
 class ReviewerAgent:
+    # Reviews should always be a fresh critique, so never serve them from the LLM response cache.
+    cache_responses = False
+
     def __init__(self, llm):
         self.llm = llm
         self.agent = PraisonAIAgent(
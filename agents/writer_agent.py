@@ -13,7 +13,7 @@ class WriterAgent:
                 "in the formal structure of an academic paper. You draft the abstract, "
                 "introduction, methods, results, and conclusion."
             ),
-            tools=[ScientificTools.write_latex_paper],
+            tools=[ScientificTools.write_latex_paper, ScientificTools.write_latex_section],
             llm=self.llm
         )
 
@@ -1,139 +1,501 @@
 # AI Scientist Framework using PraisonAI
 # This script implements the high-level design for an autonomous research agent.
 # ... (rest of the header comments)
+#
+# Importing this module is cheap: the LLM configuration, agents, workflows and
+# the heavy praisonai/litellm imports are only created when first used, and a
+# run only builds the agents of the stages it executes.
 
+import argparse
+import functools
 import os
-import asyncio # Keep asyncio as PraisonAI/LiteLLM might use it internally
+import sys
+import time
 
-from praisonaiagents import PraisonAIAgents as Workflow
-from praisonaiagents import Agent as PraisonAIAgent
-from praisonaiagents import Task
+_STARTED = time.perf_counter()  # Cold-start reference point.
 
-from tools.scientific_tools import ScientificTools
-# MCP related imports removed
-
-# Agent imports
-from agents.researcher_agent import ResearcherAgent
-from agents.designer_agent import DesignerAgent
-from agents.technician_agent import TechnicianAgent
-from agents.analyst_agent import AnalystAgent
-from agents.writer_agent import WriterAgent
-from agents.reviewer_agent import ReviewerAgent
+# --- Research Topic ---
+research_topic = "Using Graph Neural Networks to discover molecules with high binding affinity and low toxicity."
 
-# Workflow imports
-from workflows.hypothesis_design_workflow import HypothesisDesignWorkflow
-from workflows.execution_workflow import ExecutionWorkflow
-from workflows.analysis_writing_workflow import AnalysisAndWritingWorkflow
-from workflows.review_workflow import ReviewWorkflow
 
 # --- LLM Configuration for Agents ---
-llm_provider = os.environ.get("LLM_PROVIDER", "openai").lower()
-llm_config_params = {}
+@functools.lru_cache(maxsize=None)
+def get_llm_config():
+    """(llm_provider, agent_llm_config), read from the environment once."""
+    from llm_config import configure_llm
+    return configure_llm()
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm_response_cache():
+    """The LLM response cache (opt-in via LLM_CACHE=1), or None."""
+    from agents.llm_cache import LLMResponseCache
+    cache = LLMResponseCache.from_env()
+    if cache is not None:
+        print(f"--- LLM response cache enabled ({cache.path}) ---")
+    return cache
+
+
+# --- Agent Instantiation ---
+def get_agent(name: str, tier: str = None):
+    """
+    The agent wrapper for a short name ("researcher", ..., "reviewer"), built on
+    first use. With model routing (MODEL_ROUTING), it runs on `tier`, by
+    default the tier the routing file gives the agent.
+    """
+    from agents.model_router import get_router
+    router = get_router()
+    if router is not None and tier is None:
+        tier = router.tier_for(name)
+    return _build_agent(name, tier)
+
 
-print(f"--- Configuring LLM for provider: {llm_provider} ---")
+@functools.lru_cache(maxsize=None)
+def _build_agent(name: str, tier: str = None, depth: int = 0, task: str = None):
+    """`depth` counts escalations that lead to this agent; `task` gives a task its own agent."""
+    from agents.llm_cache import install_response_cache
+    from agents.model_router import get_router, install_routing
+    from workflows.research_pipeline import AGENT_CLASSES
 
-if llm_provider == "ollama":
-    ollama_model_name = os.environ.get("OLLAMA_MODEL_NAME")
-    if not ollama_model_name:
-        raise ValueError("OLLAMA_MODEL_NAME environment variable must be set when LLM_PROVIDER is 'ollama'.")
-    if os.environ.get("OLLAMA_API_BASE"):
-        print(f"Using Ollama. Model: '{ollama_model_name}' (set via OLLAMA_MODEL_NAME env var). API Base: '{os.environ.get('OLLAMA_API_BASE')}' (set via OLLAMA_API_BASE env var).")
+    router = get_router()
+    if router is not None:
+        agent_llm_config = router.llm_config(tier)
     else:
-        print(f"Using Ollama. Model: '{ollama_model_name}' (set via OLLAMA_MODEL_NAME env var). OLLAMA_API_BASE not set (LiteLLM will use default).")
-
-elif llm_provider == "openai":
-    if not os.environ.get("OPENAI_API_KEY"):
-        print("OPENAI_API_KEY not found, using placeholder key.")
-        os.environ["OPENAI_API_KEY"] = "sk-your_api_key_here" # Placeholder
-    openai_model_name = os.environ.get("OPENAI_MODEL_NAME", "gpt-3.5-turbo")
-    print(f"Using OpenAI (model specified by OPENAI_MODEL_NAME env var: {openai_model_name} or LiteLLM default)")
-else:
-    raise ValueError(f"Unsupported LLM_PROVIDER: '{llm_provider}'. Must be 'openai' or 'ollama'.")
-
-# Determine the LLM configuration to be passed to individual agent instances
-agent_llm_config = None
-if llm_provider == "ollama":
-    agent_llm_config = os.environ.get("OLLAMA_MODEL_NAME")
-    # If praisonaiagents.Agent expects a dict, this might be:
-    # agent_llm_config = {
-    #     "model": os.environ.get("OLLAMA_MODEL_NAME"),
-    #     "api_base": os.environ.get("OLLAMA_API_BASE"),
-    #     # Potentially "api_key": "not-needed" or actual key if required by specific ollama setup with LiteLLM
-    # }
-elif llm_provider == "openai":
-    # Pass a dictionary to ensure api_key is explicitly included for LiteLLM
-    agent_llm_config = {
-        "model": os.environ.get("OPENAI_MODEL_NAME", "gpt-3.5-turbo"),
-        "api_key": os.environ.get("OPENAI_API_KEY", "not-needed") # Ensure OPENAI_API_KEY is included
-    }
-    # If an API base is needed (e.g. for local OpenAI compatible server), add it here:
-    # if os.environ.get("OPENAI_API_BASE"):
-    #    agent_llm_config["api_base"] = os.environ.get("OPENAI_API_BASE")
-
-print(f"--- Agent LLM Config determined: {agent_llm_config} ---")
-print("--- LLM Configuration for Agents Complete ---") # End of LLM config block
-
-# --- MCP Setup Removed ---
-# MCPClientManager instantiation removed
-# atexit registration removed
-# _run_async_cleanup function removed
-# MCP_TOOLS_CONFIG list removed
-
-# --- Agent Instantiation (must happen before Workflow instantiation) ---
-# The 'llm' parameter for these custom agent classes will now be the agent_llm_config
-researcher_agent_instance = ResearcherAgent(llm=agent_llm_config)
-designer_agent_instance = DesignerAgent(llm=agent_llm_config)
-technician_agent_instance = TechnicianAgent(llm=agent_llm_config)
-analyst_agent_instance = AnalystAgent(llm=agent_llm_config)
-writer_agent_instance = WriterAgent(llm=agent_llm_config)
-reviewer_agent_instance = ReviewerAgent(llm=agent_llm_config)
-
-all_agents_instances = [
-    researcher_agent_instance.agent, # Assuming .agent gives the PraisonAIAgent (praisonaiagents.Agent) instance
-    designer_agent_instance.agent,
-    technician_agent_instance.agent,
-    analyst_agent_instance.agent,
-    writer_agent_instance.agent,
-    reviewer_agent_instance.agent
-]
-
-# --- Workflow Instantiation (now with agents) ---
-# llm_config_params is currently empty. If Workflow needs specific LLM settings beyond agents,
-# this might need to be populated from llm_provider logic too.
-llm_object_for_agents = Workflow(agents=all_agents_instances, process="workflow", **llm_config_params)
-print("--- Main Workflow Object Instantiated ---")
+        _, agent_llm_config = get_llm_config()
+    # The 'llm' parameter for these custom agent classes is the agent_llm_config
+    agent = AGENT_CLASSES[name](llm=agent_llm_config)
+    cache = get_llm_response_cache()
+    if cache is not None and install_response_cache(agent, cache, agent_llm_config) and not depth:
+        print(f"--- LLM response cache installed for: {type(agent).__name__} ---")
+    from tools.tracing import get_tracer, install_tracing
+    tracer = get_tracer()
+    if tracer is not None:
+        # Installed after the cache so it wraps it: cached responses show up as fast LLM spans.
+        install_tracing(agent, tracer)
+    if router is not None:
+        # Outermost, so a bad response is escalated whether it came from the model or the cache.
+        install_routing(agent, router, tier, lambda target: _build_agent(name, target, depth + 1, task).agent,
+                        depth)
+    return agent
+
+
+def route_nodes(nodes: list) -> list:
+    """Moves tasks whose routing entry names another tier than their agent's onto an agent of that tier."""
+    from agents.model_router import get_router
+    from workflows.research_pipeline import TASK_AGENTS
+    router = get_router()
+    if router is None:
+        return nodes
+    for node in nodes:
+        name = TASK_AGENTS.get(node.name, TASK_AGENTS.get(node.name.split("_")[0]))
+        if name is None:
+            continue
+        tier = router.tier_for(name, node.name)
+        if tier != router.tier_for(name):
+            node.task.agent = _build_agent(name, tier, 0, node.name).agent
+    return nodes
+
+
+class _LazyAgents:
+    """Mapping view over get_agent(), so a workflow only builds the agents it uses."""
+
+    def __getitem__(self, name: str):
+        return get_agent(name)
+
+
+def candidate_researcher(task_name: str):
+    """The researcher for an extra candidate hypothesis task, with the same middleware as get_agent()."""
+    from agents.model_router import get_router
+    router = get_router()
+    tier = router.tier_for("researcher", task_name) if router is not None else None
+    return _build_agent("researcher", tier, 0, task_name)
+
 
 # --- Workflow Definitions (associating agents with their roles in these conceptual workflows) ---
-hypothesis_design_wf = HypothesisDesignWorkflow(researcher_agent_instance, designer_agent_instance)
-execution_wf = ExecutionWorkflow(technician_agent_instance)
-analysis_writing_wf = AnalysisAndWritingWorkflow(analyst_agent_instance, writer_agent_instance)
-review_wf = ReviewWorkflow(reviewer_agent_instance)
+@functools.lru_cache(maxsize=None)
+def get_workflow(stage: str):
+    """One of the four conceptual workflows (see workflows.research_pipeline.STAGES)."""
+    from workflows.research_pipeline import build_stage_workflow
+    options = {"researcher_factory": candidate_researcher} if stage == "hypothesis_design" else {}
+    return build_stage_workflow(stage, _LazyAgents(), **options)
 
-# --- Research Topic ---
-research_topic = "Using Graph Neural Networks to discover molecules with high binding affinity and low toxicity."
 
-# --- Main Orchestration ---
-if __name__ == "__main__":
+def parse_stages(value: str) -> list[str]:
+    from workflows.research_pipeline import STAGES
+    if not value:
+        return list(STAGES)
+    stages = [stage.strip() for stage in value.split(",") if stage.strip()]
+    # A unique prefix names a stage group too: "analysis" -> "analysis_writing".
+    for i, stage in enumerate(stages):
+        matches = [name for name in STAGES if name.startswith(stage)]
+        if stage not in STAGES and len(matches) == 1:
+            stages[i] = matches[0]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s) {unknown}; choose from {', '.join(STAGES)}.")
+    return [stage for stage in STAGES if stage in stages]  # Pipeline order.
+
+
+def parse_budget(args):
+    """The closed loop's Budget from --budget-* arguments (None without --closed-loop)."""
+    if not args.closed_loop:
+        return None
+    from workflows.closed_loop import Budget
+    return Budget(max_seconds=args.budget_minutes * 60 if args.budget_minutes else None,
+                  max_llm_calls=args.budget_llm_calls, max_tokens=args.budget_tokens)
+
+
+def parse_inputs(values: list[str]) -> dict:
+    """--input TASK=FILE pairs -> {task name: file contents}."""
+    inputs = {}
+    for value in values or []:
+        name, sep, path = value.partition("=")
+        if not sep:
+            raise SystemExit(f"--input expects TASK=FILE, got '{value}'.")
+        with open(path) as f:
+            inputs[name.strip()] = f.read()
+    return inputs
+
+
+def stream_manuscript(write_node, review_node, outputs: dict, checkpoints, reviewers: int = 1,
+                      reviewer_factory=None) -> dict:
+    """
+    Runs the write and review tasks as a workflows.manuscript_stream.ManuscriptStream:
+    each section is reviewed as soon as it is written, and the files under
+    <run_dir>/manuscript/ grow as the sections come in. Returns the outputs
+    of both tasks, checkpointed (and restored) like scheduler tasks.
+    `reviewer_factory(task_name)` builds the agents of the extra reviewers
+    (default: get_agent()'s, on the reviewer's tier).
+    """
+    from agents.context_budget import get_context_budget
+    from agents.model_router import get_router
+    from workflows.manuscript_stream import ManuscriptStream
+
+    upstream = {dep: outputs[dep] for dep in write_node.depends_on}
+    write_fingerprint = checkpoints.fingerprint(write_node, upstream)
+    draft = checkpoints.load("write", write_fingerprint)
+    if draft is not None:
+        manuscript = checkpoints.load("review", checkpoints.fingerprint(review_node, {"write": draft}))
+        if manuscript is not None:
+            print("--- Reused checkpoints for: write, review ---")
+            return {"write": draft, "review": manuscript}
+
+    context = dict(upstream)
+    if get_context_budget() is not None:
+        context = get_context_budget().fit(write_node.name, context)
+    analysis = context.pop("analyze", "")
+    hypothesis = "\n\n".join(context.values())
+    if reviewer_factory is None:
+        router = get_router()
+        tier = router.tier_for("reviewer", review_node.name) if router is not None else None
+        reviewer_factory = lambda task_name: _build_agent("reviewer", tier, 0, task_name)  # noqa: E731
+    # Each extra reviewer thread gets its own agent, so chat histories stay separate.
+    chats = [review_node.task.agent.chat] + [reviewer_factory(f"review_{i}").agent.chat
+                                             for i in range(2, reviewers + 1)]
+    stream = ManuscriptStream(write_node.task.agent.chat, chats, os.path.join(checkpoints.run_dir, "manuscript"))
+    started_at = time.time()
+    print(f"--- Streaming the manuscript section by section to {stream.out_dir} ---")
+    result = stream.run(analysis, hypothesis)
+    print(stream.summary())
+    checkpoints.save("write", write_fingerprint, result["draft"], started_at, stream.stats["wall_seconds"])
+    checkpoints.save("review", checkpoints.fingerprint(review_node, {"write": result["draft"]}),
+                     result["manuscript"], started_at, stream.stats["wall_seconds"])
+    return {"write": result["draft"], "review": result["manuscript"]}
+
+
+def split_manuscript_stream(nodes: list):
+    """(the other nodes, [write, review]) for --stream-manuscript; the list is empty unless both tasks are present."""
+    by_name = {node.name: node for node in nodes}
+    if "write" not in by_name or "review" not in by_name:
+        return nodes, []
+    streamed = [by_name["write"], by_name["review"]]
+    return [node for node in nodes if node not in streamed], streamed
+
+
+def make_scheduler(checkpoints, max_workers: int = 4, closed_loop: bool = False, max_retries=2, budget=None):
+    """A DAGScheduler, or with `closed_loop` a ClosedLoopEngine under `budget`, checkpointing to `checkpoints`."""
+    if closed_loop:
+        from workflows.closed_loop import ClosedLoopEngine
+        return ClosedLoopEngine(max_retries=max_retries, budget=budget, max_workers=max_workers,
+                                checkpoints=checkpoints)
+    from workflows.scheduler import DAGScheduler
+    return DAGScheduler(max_workers=max_workers, checkpoints=checkpoints)
+
+
+def run_pipeline(scheduler, nodes: list, inputs: dict, checkpoints, streamed=(), reviewers: int = 1,
+                 reviewer_factory=None) -> dict:
+    """
+    Runs `nodes` on `scheduler`, then the `streamed` write and review tasks
+    (see split_manuscript_stream) as a manuscript stream once their inputs
+    exist. Returns the outputs of every task that completed.
+    """
+    outputs = scheduler.run(nodes, inputs=inputs)
+    if streamed and all(dep in outputs for dep in streamed[0].depends_on):
+        outputs.update(stream_manuscript(*streamed, outputs, checkpoints, reviewers=reviewers,
+                                         reviewer_factory=reviewer_factory))
+    return outputs
+
+
+def enqueue_main(argv=None) -> str:
+    """`aiscientist.py enqueue`: adds a run's tasks to the job queue for `worker` processes."""
+    parser = argparse.ArgumentParser(prog="aiscientist.py enqueue",
+                                     description="Queue a pipeline run for worker processes.")
+    parser.add_argument("--queue", help="Job queue file (default: JOB_QUEUE_PATH or jobs.sqlite).")
+    parser.add_argument("--topic", default=research_topic, help="Research topic.")
+    parser.add_argument("--hypotheses", type=int, default=1, help="Number of candidate hypotheses.")
+    parser.add_argument("--stages", default="", help="Comma-separated stage groups to queue (default: all).")
+    parser.add_argument("--input", action="append", metavar="TASK=FILE",
+                        help="Output of a task outside --stages (repeatable).")
+    parser.add_argument("--wait", action="store_true", help="Wait for the run to finish and print its output.")
+    args = parser.parse_args(argv)
+
+    from workflows.job_queue import JobQueue
+    from workflows.research_pipeline import build_nodes
+
+    stages = parse_stages(args.stages)
+    jobs = []
+    for stage in stages:
+        for node in build_nodes({stage: get_workflow(stage)}, args.topic, num_hypotheses=args.hypotheses,
+                                stages=[stage]):
+            jobs.append({"name": node.name, "stage": stage, "depends_on": node.depends_on,
+                         "payload": {"topic": args.topic, "hypotheses": args.hypotheses}})
+    queue = JobQueue.from_env(args.queue)
+    try:
+        run_id = queue.enqueue_run(jobs, inputs=parse_inputs(args.input))
+    except ValueError as e:
+        raise SystemExit(f"{e} Pass the outputs of earlier stages with --input TASK=FILE.")
+    print(f"Queued run {run_id}: {', '.join(job['name'] for job in jobs)} in {queue.path}")
+    print(f"Start workers with: python aiscientist.py worker --stages {','.join(stages)}")
+    if args.wait:
+        while queue.pending_run(run_id):
+            time.sleep(1)
+        print(format_jobs(queue.jobs(run_id)))
+        final = queue.jobs(run_id)[-1]
+        if final["status"] == "done":
+            print(f"\nOutput of '{final['name']}':\n{final['output']}")
+    return run_id
+
+
+def format_jobs(jobs: list[dict]) -> str:
+    lines = [f"{'task':<16} {'stage':<18} {'status':<8} {'tries':>5}  error"]
+    for job in jobs:
+        lines.append(f"{job['name']:<16} {job['stage']:<18} {job['status']:<8} {job['attempts']:>5}  "
+                     f"{(job['error'] or '')[:60]}")
+    return "\n".join(lines)
+
+
+def worker_main(argv=None) -> dict:
+    """`aiscientist.py worker --stages execution,analysis`: runs queued tasks of those stage groups."""
+    parser = argparse.ArgumentParser(prog="aiscientist.py worker",
+                                     description="Claim and run queued pipeline tasks of some stage groups.")
+    parser.add_argument("--stages", default="", help="Comma-separated stage groups to work on (default: all).")
+    parser.add_argument("--queue", help="Job queue file (default: JOB_QUEUE_PATH or jobs.sqlite).")
+    parser.add_argument("--lease", type=float, help="Lease length in seconds (default: JOB_LEASE_SECONDS or 60).")
+    parser.add_argument("--poll", type=float, default=1.0, help="Seconds between polls when idle.")
+    parser.add_argument("--exit-when-idle", action="store_true",
+                        help="Exit once no task of these stages is queued or running.")
+    parser.add_argument("--trace", nargs="?", const="trace.json", metavar="PATH",
+                        help="Record spans of this worker and write a Chrome trace on exit.")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        from tools.tracing import enable_tracing
+        enable_tracing(args.trace)
+
+    from workflows.job_queue import JobQueue, JobWorker
+    from workflows.research_pipeline import build_nodes
+
+    stages = parse_stages(args.stages)
+    queue = JobQueue.from_env(args.queue)
+    if args.lease:
+        queue.lease_seconds = args.lease
+    scheduler = DAGScheduler(max_workers=1)
+
+    def run_job(job: dict, upstream: dict) -> str:
+        payload = job["payload"]
+        nodes = route_nodes(build_nodes({job["stage"]: get_workflow(job["stage"])}, payload["topic"],
+                                        num_hypotheses=payload["hypotheses"], stages=[job["stage"]]))
+        node = next(node for node in nodes if node.name == job["name"])
+        return scheduler.run_node(node, upstream)
+
+    worker = JobWorker(queue, stages, run_job, poll_interval=args.poll, exit_when_idle=args.exit_when_idle)
+    print(f"--- Worker {worker.worker_id} on {queue.path} (stages: {', '.join(stages)}) ---")
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        from tools.tracing import get_tracer
+        tracer = get_tracer()
+        if tracer is not None:
+            print(tracer.summary())
+            print(f"--- Chrome trace written to {tracer.export()} ---")
+    if scheduler.context_budget:
+        print(scheduler.context_budget.summary())
+    from agents.model_router import get_router
+    if get_router() is not None:
+        print(get_router().summary())
+    print(f"--- Worker {worker.worker_id} stopped: {worker.stats} ---")
+    return worker.stats
+
+
+COMMANDS = {"enqueue": enqueue_main, "worker": worker_main}
+
+
+def main(argv=None) -> dict:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+    parser = argparse.ArgumentParser(description="Run the AI Scientist research pipeline.",
+                                     epilog="Distributed runs: `aiscientist.py enqueue ...` queues a run and "
+                                            "`aiscientist.py worker --stages ...` processes it (see "
+                                            "workflows/job_queue.py).")
+    parser.add_argument("--topic", default=research_topic, help="Research topic.")
+    parser.add_argument("--max-workers", type=int, default=4,
+                        help="Maximum number of independent tasks to run concurrently.")
+    parser.add_argument("--hypotheses", type=int, default=1,
+                        help="Number of candidate hypotheses to research in parallel.")
+    parser.add_argument("--stages", default="",
+                        help="Comma-separated stage groups to run: hypothesis_design, execution, "
+                             "analysis_writing, review (default: all). Outputs of earlier stages come "
+                             "from --resume checkpoints or --input.")
+    parser.add_argument("--input", action="append", metavar="TASK=FILE",
+                        help="Output of a task outside --stages, e.g. execute=report.txt (repeatable).")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="Resume a previous run, skipping stages whose inputs are unchanged.")
+    parser.add_argument("--checkpoint-dir", default="checkpoints",
+                        help="Directory holding per-run stage checkpoints.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Build the agents and task graph for the selected stages, then exit.")
+    parser.add_argument("--closed-loop", action="store_true",
+                        help="Gate each stage on its evaluator and loop back to the failing stage (see "
+                             "workflows/closed_loop.py).")
+    parser.add_argument("--max-retries", type=int, default=2, help="Closed loop: retries per stage.")
+    parser.add_argument("--budget-minutes", type=float, help="Closed loop: stop after this much wall time.")
+    parser.add_argument("--budget-llm-calls", type=int, help="Closed loop: stop after this many LLM completion requests.")
+    parser.add_argument("--budget-tokens", type=int, help="Closed loop: stop after this many tokens.")
+    parser.add_argument("--trace", nargs="?", const="trace.json", metavar="PATH",
+                        help="Record per-stage/per-tool spans and write a Chrome trace (default: trace.json; "
+                             "same as AISCIENTIST_TRACE=PATH).")
+    parser.add_argument("--stream-manuscript", action="store_true",
+                        help="Write the paper section by section and review each section as soon as it is "
+                             "written, saving progress under checkpoints/<run-id>/manuscript/.")
+    parser.add_argument("--stream-reviewers", type=int, default=1,
+                        help="With --stream-manuscript: sections reviewed concurrently.")
+    parser.add_argument("--routing", metavar="FILE",
+                        help="JSON file assigning model tiers per agent/task, with escalation (same as "
+                             "MODEL_ROUTING=FILE; see agents/model_router.py).")
+    args = parser.parse_args(argv)
+
+    if args.routing:
+        os.environ["MODEL_ROUTING"] = args.routing
+    if args.trace:
+        from tools.tracing import enable_tracing
+        enable_tracing(args.trace)  # Before any agent or tool is created, so they get instrumented.
+
+    from agents.llm_cache import model_key
+    from workflows.checkpoint import CheckpointStore
+    from workflows.research_pipeline import build_nodes
+
+    stages = parse_stages(args.stages)
+    from agents.model_router import get_router
+    router = get_router()
+    if router is not None:
+        model = router.model_key()
+        print(f"--- Model routing from {os.environ['MODEL_ROUTING']}: tiers {', '.join(router.tiers)} ---")
+    else:
+        model = model_key(get_llm_config()[1])
+    checkpoints = CheckpointStore(args.checkpoint_dir, run_id=args.resume, model=model)
+    if args.resume and not checkpoints.exists():
+        print(f"--- No checkpoints found for run '{args.resume}'; starting it from scratch ---")
+
     print("🚀 Kicking off the AI Scientist Framework...")
-    print(f"Research Topic: {research_topic}\n")
+    print(f"Run ID: {checkpoints.run_id} (resume with --resume {checkpoints.run_id})")
+    print(f"Research Topic: {args.topic}\n")
 
-    tasks_hd = hypothesis_design_wf.get_tasks(research_topic)
-    tasks_ex = execution_wf.get_tasks()
-    tasks_aw = analysis_writing_wf.get_tasks()
-    tasks_rev = review_wf.get_tasks()
-    all_tasks = tasks_hd + tasks_ex + tasks_aw + tasks_rev
+    all_nodes = route_nodes(build_nodes({stage: get_workflow(stage) for stage in stages}, args.topic,
+                                        num_hypotheses=args.hypotheses, stages=stages))
 
-    print("--- Attempting to run main PraisonAI crew using llm_object_for_agents.start() ---")
-    final_manuscript = llm_object_for_agents.start()
+    # Outputs of tasks outside the selected stages: --input first, then the run's checkpoints.
+    node_names = {node.name for node in all_nodes}
+    needed = sorted({dep for node in all_nodes for dep in node.depends_on} - node_names)
+    inputs = parse_inputs(args.input)
+    for name in needed:
+        if name not in inputs:
+            output = checkpoints.latest_output(name)
+            if output is not None:
+                inputs[name] = output
+    missing = [name for name in needed if name not in inputs]
+    if missing:
+        raise SystemExit(f"Stages {stages} need the output of {missing}; pass --resume RUN_ID of a run "
+                         f"that completed them, or --input TASK=FILE.")
 
+    streamed = []  # The write and review nodes, when they run as a manuscript stream.
+    if args.stream_manuscript:
+        all_nodes, streamed = split_manuscript_stream(all_nodes)
+        if not streamed:
+            print("--- --stream-manuscript needs the analysis_writing and review stages; ignoring it ---")
+
+    print(f"--- Ready in {time.perf_counter() - _STARTED:.2f}s (stages: {', '.join(stages)}) ---")
+    if args.dry_run:
+        print(f"--- Dry run: would execute {[node.name for node in all_nodes + streamed]} with inputs {sorted(inputs)} ---")
+        return {}
+
+    scheduler = make_scheduler(checkpoints, args.max_workers, args.closed_loop, args.max_retries, parse_budget(args))
+    if args.closed_loop:
+        print(f"--- Running {len(all_nodes)} tasks in a closed loop (max_workers={args.max_workers}, "
+              f"max_retries={args.max_retries}) ---")
+    else:
+        print(f"--- Running {len(all_nodes)} tasks with DAGScheduler (max_workers={args.max_workers}) ---")
+    try:
+        outputs = run_pipeline(scheduler, all_nodes, inputs, checkpoints, streamed, reviewers=args.stream_reviewers)
+    finally:
+        from tools.tracing import get_tracer
+        tracer = get_tracer()
+        if tracer is not None:
+            print(tracer.summary())
+            print(f"--- Chrome trace written to {tracer.export()} (open in chrome://tracing or ui.perfetto.dev) ---")
+    if scheduler.restored:
+        print(f"--- Reused checkpoints for: {', '.join(sorted(scheduler.restored))} ---")
+    if args.closed_loop:
+        metrics_path = os.path.join(checkpoints.run_dir, "closed_loop.json")
+        scheduler.save_report(metrics_path)
+        print(f"{scheduler.summary()} (per-iteration metrics: {metrics_path})")
+    all_nodes += streamed
+
+    final_stage = all_nodes[-1].name
+    if final_stage not in outputs:
+        print(f"\n\n⚠️ Stopped before '{final_stage}' ({scheduler.status}); completed: {', '.join(outputs)}")
+        return outputs
     print("\n\n✅ AI Scientist Framework execution complete!")
     print("="*50)
-    print("Final Manuscript (as approved by Peer Reviewer):")
-    print(final_manuscript)
+    if final_stage == "review":
+        print("Final Manuscript (as approved by Peer Reviewer):")
+    else:
+        print(f"Output of '{final_stage}':")
+    print(outputs[final_stage])
     print("="*50)
+    llm_response_cache = get_llm_response_cache()
+    if llm_response_cache is not None:
+        print(llm_response_cache.summary())
+    from agents.context_budget import get_context_budget
+    context_budget = get_context_budget()
+    if context_budget is not None:
+        print(context_budget.summary())
+    if router is not None:
+        print(router.summary())
+    if "tools.scientific_tools" in sys.modules:
+        from tools.scientific_tools import get_search_cache
+        search_cache = get_search_cache()
+        if search_cache is not None:
+            print(search_cache.summary())
+        from tools.preflight import get_preflight
+        preflight = get_preflight()
+        if preflight is not None:
+            print(preflight.summary())
+    return outputs
+
 
-    # --- MCP Test Section Removed ---
-    # _run_mcp_direct_test function removed
-    # asyncio.run call for MCP test removed
-    # All print statements related to MCP test removed
-    print("\n--- MCP Test Section Fully Removed ---") # Placeholder to confirm removal in output
+# --- Main Orchestration ---
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# Batch runner for the AI Scientist Framework.
+# Runs one independent research pipeline per topic, concurrently, with a cap on
+# in-flight pipelines and per-provider token-bucket rate limits on LLM calls.
+# Each topic runs like `aiscientist.py` does: on the DAG scheduler (or the
+# closed-loop engine), with checkpoints, the context budget and, optionally,
+# manuscript streaming; `--resume BATCH_ID` reuses the checkpoints of a batch.
+#
+# Usage: python batch_runner.py topics.txt [--concurrency 8] [--openai-rpm 500] [--ollama-rpm 120]
+#            [--max-workers 4] [--hypotheses 3] [--closed-loop ...] [--stream-manuscript] [--resume BATCH_ID]
+# The topics file holds one research topic per line (blank lines and '#' comments are ignored).
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_config import configure_llm
+from aiscientist import make_scheduler, parse_budget, run_pipeline, split_manuscript_stream
+from agents.chat_hooks import wrap_chat
+from agents.llm_cache import LLMResponseCache, install_response_cache, model_key
+from agents.model_router import ModelRouter, install_routing
+from agents.rate_limit import RateLimitMiddleware, TokenBucket
+from tools.scientific_tools import get_search_cache
+from tools.tracing import get_tracer, install_tracing
+from workflows.checkpoint import CheckpointStore, new_run_id
+from workflows.research_pipeline import AGENT_CLASSES, STAGES, TASK_AGENTS, build_nodes, build_stage_workflow
+
+
+def read_topics(path: str) -> list[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def slugify(text: str, max_len: int = 60) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:max_len] or "topic"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class BatchRunner:
+    """
+    `pipeline` holds the per-topic run options of aiscientist.py: max_workers,
+    hypotheses, closed_loop, max_retries, budget (a closed_loop.Budget),
+    stream_manuscript and stream_reviewers. Topic <i> checkpoints to
+    <checkpoint_dir>/<batch_id>-<i>-<topic slug>.
+    """
+
+    def __init__(self, llm_provider: str, llm_config, output_dir: str, concurrency: int,
+                 rate_limits: dict, llm_cache: LLMResponseCache = None, router: ModelRouter = None,
+                 checkpoint_dir: str = None, batch_id: str = None, pipeline: dict = None):
+        self.llm_provider = llm_provider
+        self.llm_config = llm_config
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.checkpoint_dir = checkpoint_dir or os.path.join(output_dir, "checkpoints")
+        self.batch_id = batch_id or new_run_id()
+        self.pipeline = {"max_workers": 4, "hypotheses": 1, "closed_loop": False, "max_retries": 2, "budget": None,
+                         "stream_manuscript": False, "stream_reviewers": 1, **(pipeline or {})}
+        self.model = router.model_key() if router is not None else model_key(llm_config)
+        # One bucket per provider, shared by every agent of every pipeline.
+        self.buckets = {provider: TokenBucket(rpm / 60.0, capacity=burst)
+                        for provider, (rpm, burst) in rate_limits.items() if rpm > 0}
+        self.llm_cache = llm_cache
+        self.router = router
+        os.makedirs(output_dir, exist_ok=True)
+
+    def run_topic(self, index: int, topic: str) -> dict:
+        """Builds and runs a full pipeline for one topic (called on a worker thread)."""
+        start = time.perf_counter()
+        options = self.pipeline
+        agents = {name: self.topic_agent(name) for name in AGENT_CLASSES}
+        workflows = {stage: build_stage_workflow(stage, agents) for stage in STAGES if stage != "hypothesis_design"}
+        workflows["hypothesis_design"] = build_stage_workflow(
+            "hypothesis_design", agents, researcher_factory=lambda task: self.topic_agent("researcher", task))
+        nodes = self.route_nodes(build_nodes(workflows, topic, num_hypotheses=options["hypotheses"]))
+        streamed = []
+        if options["stream_manuscript"]:
+            nodes, streamed = split_manuscript_stream(nodes)
+        checkpoints = CheckpointStore(self.checkpoint_dir, run_id=f"{self.batch_id}-{index:04d}-{slugify(topic, 40)}",
+                                      model=self.model)
+        scheduler = make_scheduler(checkpoints, options["max_workers"], options["closed_loop"],
+                                   options["max_retries"], options["budget"])
+        result = {"index": index, "topic": topic, "run_id": checkpoints.run_id}
+        try:
+            outputs = run_pipeline(scheduler, nodes, {}, checkpoints, streamed, reviewers=options["stream_reviewers"],
+                                   reviewer_factory=lambda task: self.topic_agent("reviewer", task))
+            if "review" in outputs:
+                result.update(status="ok", manuscript=str(outputs["review"]))
+            else:
+                result.update(status="error", error=f"stopped before 'review' ({scheduler.status}); "
+                                                    f"completed: {', '.join(outputs)}")
+        except Exception as e:
+            result.update(status="error", error=f"{type(e).__name__}: {e}")
+        if options["closed_loop"]:
+            scheduler.save_report(os.path.join(checkpoints.run_dir, "closed_loop.json"))
+        result["restored"] = sorted(scheduler.restored)
+        result["latency"] = time.perf_counter() - start
+        return result
+
+    def topic_agent(self, name: str, task: str = None):
+        """A fresh agent wrapper for one topic (and optionally one task), with this runner's middleware."""
+        if self.router is not None:
+            return self.routed_agent(name, self.router.tier_for(name, task))
+        wrapper = AGENT_CLASSES[name](llm=self.llm_config)
+        self.install_middleware(wrapper, self.llm_provider, self.llm_config)
+        return wrapper
+
+    def route_nodes(self, nodes: list) -> list:
+        """Like aiscientist.route_nodes: tasks routed to another tier than their agent's get an agent on it."""
+        if self.router is None:
+            return nodes
+        for node in nodes:
+            name = TASK_AGENTS.get(node.name, TASK_AGENTS.get(node.name.split("_")[0]))
+            if name is not None and self.router.tier_for(name, node.name) != self.router.tier_for(name):
+                node.task.agent = self.topic_agent(name, node.name).agent
+        return nodes
+
+    def install_middleware(self, wrapper, provider: str, llm_config):
+        bucket = self.buckets.get(provider)
+        if bucket is not None:
+            wrap_chat(wrapper.agent, RateLimitMiddleware(bucket, wrapper.agent))
+        if self.llm_cache is not None:
+            # Wrapped last so it runs first: cache hits never spend rate-limit tokens.
+            install_response_cache(wrapper, self.llm_cache, llm_config)
+        tracer = get_tracer()
+        if tracer is not None:
+            install_tracing(wrapper, tracer)
+
+    def routed_agent(self, name: str, tier: str, depth: int = 0):
+        """An agent on a model tier, rate-limited by that tier's provider; escalations get their own agents."""
+        llm_config = self.router.llm_config(tier)
+        wrapper = AGENT_CLASSES[name](llm=llm_config)
+        self.install_middleware(wrapper, self.router.provider(tier), llm_config)
+        install_routing(wrapper, self.router, tier, lambda target: self.routed_agent(name, target, depth + 1).agent,
+                        depth)
+        return wrapper
+
+    def write_result(self, result: dict):
+        path = os.path.join(self.output_dir, f"{result['index']:04d}-{slugify(result['topic'])}.md")
+        with open(path, "w") as f:
+            f.write(f"# {result['topic']}\n\n")
+            f.write(f"Status: {result['status']} ({result['latency']:.1f}s)\n\n")
+            f.write(result.get("manuscript") or result.get("error", ""))
+            f.write("\n")
+        with open(os.path.join(self.output_dir, "results.jsonl"), "a") as f:
+            f.write(json.dumps({k: v for k, v in result.items() if k != "manuscript"} | {"output_file": path}) + "\n")
+
+    async def run(self, topics: list[str]) -> dict:
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+
+        async def guarded(index, topic):
+            async with semaphore:
+                return await loop.run_in_executor(executor, self.run_topic, index, topic)
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="pipeline") as executor:
+            pending = [guarded(i, topic) for i, topic in enumerate(topics)]
+            for next_done in asyncio.as_completed(pending):
+                result = await next_done
+                self.write_result(result)
+                results.append(result)
+                print(f"[{len(results)}/{len(topics)}] {result['status']:>5} {result['latency']:7.1f}s  {result['topic']}")
+
+        wall = time.perf_counter() - started
+        latencies = [r["latency"] for r in results]
+        summary = {
+            "batch_id": self.batch_id,
+            "topics": len(topics),
+            "succeeded": sum(r["status"] == "ok" for r in results),
+            "failed": sum(r["status"] != "ok" for r in results),
+            "wall_seconds": round(wall, 3),
+            "throughput_per_minute": round(len(results) / wall * 60, 3) if wall > 0 else 0.0,
+            "latency_p50": round(percentile(latencies, 50), 3),
+            "latency_p90": round(percentile(latencies, 90), 3),
+            "latency_p99": round(percentile(latencies, 99), 3),
+            "rate_limit_wait_seconds": {p: round(b.waited, 3) for p, b in self.buckets.items()},
+        }
+        if self.llm_cache is not None:
+            summary["llm_cache"] = dict(self.llm_cache.stats)
+        search_cache = get_search_cache()
+        if search_cache is not None:
+            summary["search_cache"] = dict(search_cache.stats)
+        if self.router is not None:
+            summary["model_routing"] = self.router.report()
+        tracer = get_tracer()
+        if tracer is not None:
+            summary["trace"] = {"path": tracer.export(), "spans": tracer.rows()}
+        with open(os.path.join(self.output_dir, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the AI Scientist pipeline over a file of research topics.")
+    parser.add_argument("topics_file")
+    parser.add_argument("--output-dir", default="batch_results")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum pipelines in flight.")
+    parser.add_argument("--openai-rpm", type=float, default=float(os.environ.get("OPENAI_RPM", 500)),
+                        help="OpenAI requests per minute (0 disables the limit).")
+    parser.add_argument("--ollama-rpm", type=float, default=float(os.environ.get("OLLAMA_RPM", 0)),
+                        help="Ollama requests per minute (0 disables the limit).")
+    parser.add_argument("--burst", type=float, default=None,
+                        help="Bucket capacity, i.e. how many calls may go out back to back (default: 1s worth).")
+    parser.add_argument("--routing", metavar="FILE", default=os.environ.get("MODEL_ROUTING"),
+                        help="JSON file assigning model tiers per agent (see agents/model_router.py).")
+    # Per-topic pipeline options, as in aiscientist.py.
+    parser.add_argument("--max-workers", type=int, default=4, help="Tasks run concurrently within one topic.")
+    parser.add_argument("--hypotheses", type=int, default=1,
+                        help="Number of candidate hypotheses to research in parallel per topic.")
+    parser.add_argument("--checkpoint-dir", help="Directory for per-topic checkpoints (default: OUTPUT_DIR/checkpoints).")
+    parser.add_argument("--resume", metavar="BATCH_ID",
+                        help="Resume a previous batch, skipping each topic's stages whose inputs are unchanged.")
+    parser.add_argument("--closed-loop", action="store_true",
+                        help="Gate each stage on its evaluator (see workflows/closed_loop.py).")
+    parser.add_argument("--max-retries", type=int, default=2, help="Closed loop: retries per stage.")
+    parser.add_argument("--budget-minutes", type=float, help="Closed loop: per-topic wall-time budget.")
+    parser.add_argument("--budget-llm-calls", type=int, help="Closed loop: per-topic LLM completion requests.")
+    parser.add_argument("--budget-tokens", type=int, help="Closed loop: per-topic token budget.")
+    parser.add_argument("--stream-manuscript", action="store_true",
+                        help="Write each paper section by section, reviewing sections as they are written.")
+    parser.add_argument("--stream-reviewers", type=int, default=1,
+                        help="With --stream-manuscript: sections reviewed concurrently.")
+    args = parser.parse_args()
+
+    topics = read_topics(args.topics_file)
+    llm_provider, agent_llm_config = configure_llm()
+    rate_limits = {
+        "openai": (args.openai_rpm, args.burst),
+        "ollama": (args.ollama_rpm, args.burst),
+    }
+    router = ModelRouter.from_file(args.routing) if args.routing else None
+    pipeline = {"max_workers": args.max_workers, "hypotheses": args.hypotheses, "closed_loop": args.closed_loop,
+                "max_retries": args.max_retries, "budget": parse_budget(args),
+                "stream_manuscript": args.stream_manuscript, "stream_reviewers": args.stream_reviewers}
+    runner = BatchRunner(llm_provider, agent_llm_config, args.output_dir, args.concurrency,
+                         rate_limits, llm_cache=LLMResponseCache.from_env(), router=router,
+                         checkpoint_dir=args.checkpoint_dir, batch_id=args.resume, pipeline=pipeline)
+    print(f"🚀 Running {len(topics)} topics with concurrency {args.concurrency} "
+          f"(batch {runner.batch_id}; resume with --resume {runner.batch_id})...")
+    summary = asyncio.run(runner.run(topics))
+    print("\n✅ Batch complete!")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
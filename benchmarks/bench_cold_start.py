@@ -0,0 +1,64 @@
+# Cold-start benchmark for aiscientist.py: wall time of fresh interpreter
+# processes that import the module, print --help, and build the agents and
+# task graph (--dry-run, no LLM calls) for all stages and for a single stage.
+#
+# Usage: python benchmarks/bench_cold_start.py [--repeat 5] [--json cold_start.json]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "aiscientist.py")
+
+
+def cases(workdir: str) -> dict:
+    draft = os.path.join(workdir, "draft.txt")
+    with open(draft, "w") as f:
+        f.write("A draft manuscript.\n")
+    return {
+        "import": [sys.executable, "-c", "import aiscientist"],
+        "help": [sys.executable, SCRIPT, "--help"],
+        "dry-run (all stages)": [sys.executable, SCRIPT, "--dry-run"],
+        "dry-run (review only)": [sys.executable, SCRIPT, "--dry-run", "--stages", "review",
+                                  "--input", f"write={draft}"],
+    }
+
+
+def time_command(command: list[str], workdir: str, env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="aiscientist.py cold-start benchmark.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")  # configure_llm() only needs it to be set.
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'case':<24} {'median s':>9} {'min s':>9} {'max s':>9}")
+        for name, command in cases(workdir).items():
+            time_command(command, workdir, env)  # Warm the OS file cache and .pyc files.
+            samples = [time_command(command, workdir, env) for _ in range(args.repeat)]
+            result = {"case": name, "median": round(statistics.median(samples), 4),
+                      "min": round(min(samples), 4), "max": round(max(samples), 4), "samples": samples}
+            results.append(result)
+            print(f"{name:<24} {result['median']:>9.3f} {result['min']:>9.3f} {result['max']:>9.3f}")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# Parse time and peak memory: results.csv vs. the columnar results format.
+#
+# For each size, a synthetic molecule screen is written in both formats and
+# every case runs in its own subprocess, so peak RSS (VmHWM) is per case:
+#   csv-load        whole-file load (pandas.read_csv, or np.loadtxt without pandas)
+#   csv-stream      tools.data_analyzer.analyze_csv (chunked)
+#   columnar-open   open the table and touch every value of one column
+#   columnar-stream tools.data_analyzer.analyze_columnar (mmap, chunked)
+#
+# Usage: python benchmarks/bench_columnar.py [--rows 1000000,10000000,50000000] [--skip-load-above 10000000]
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from tools.columnar import ColumnarWriter
+
+CASES = ("csv-load", "csv-stream", "columnar-open", "columnar-stream")
+
+
+def generate(directory: str, rows: int, chunk_rows: int = 1_000_000):
+    """Writes results.csv and results.col with the same random data."""
+    rng = np.random.default_rng(0)
+    csv_path = os.path.join(directory, "results.csv")
+    with open(csv_path, "w") as f, ColumnarWriter(os.path.join(directory, "results.col")) as col:
+        f.write("molecule_id,binding_affinity,toxicity_score\n")
+        for start in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - start)
+            ids = [f"MOL-{i:09d}" for i in range(start, start + n)]
+            affinity = rng.random(n)
+            toxicity = np.clip(0.3 * affinity + 0.7 * rng.random(n), 0.0, 1.0)
+            col.append({"molecule_id": ids, "binding_affinity": affinity, "toxicity_score": toxicity})
+            f.write("".join(f"{m},{a:.6f},{t:.6f}\n" for m, a, t in zip(ids, affinity.tolist(), toxicity.tolist())))
+
+
+def run_case(case: str, directory: str):
+    """Executed in the child process; prints the elapsed seconds and peak RSS as JSON."""
+    from tools.data_analyzer import analyze_columnar, analyze_csv, pd
+    from tools.columnar import open_columnar
+
+    csv_path = os.path.join(directory, "results.csv")
+    col_path = os.path.join(directory, "results.col")
+    start = time.perf_counter()
+    if case == "csv-load":
+        if pd is not None:
+            frame = pd.read_csv(csv_path)
+            checksum = float(frame["binding_affinity"].sum())
+        else:
+            data = np.loadtxt(csv_path, delimiter=",", skiprows=1, usecols=(1, 2))
+            checksum = float(data[:, 0].sum())
+    elif case == "csv-stream":
+        checksum = analyze_csv(csv_path).stats["binding_affinity"].mean
+    elif case == "columnar-open":
+        checksum = float(open_columnar(col_path)["binding_affinity"].sum())
+    elif case == "columnar-stream":
+        checksum = analyze_columnar(col_path).stats["binding_affinity"].mean
+    else:
+        raise ValueError(f"Unknown case {case!r}")
+    print(json.dumps({"seconds": time.perf_counter() - start, "checksum": checksum, "peak_rss_mb": peak_rss_mb()}))
+
+
+def peak_rss_mb() -> float:
+    # VmHWM belongs to this process image; ru_maxrss would also count the
+    # parent's memory at fork time.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(case: str, directory: str) -> dict:
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", case, "--dir", directory],
+                          stdout=subprocess.PIPE, text=True, cwd=ROOT)
+    if proc.returncode != 0:
+        # Most likely killed for running out of memory.
+        return {"case": case, "error": f"exit {proc.returncode}", "peak_rss_mb": float("nan")}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {"case": case, "seconds": round(result["seconds"], 3), "peak_rss_mb": round(result["peak_rss_mb"], 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV vs. columnar results benchmark.")
+    parser.add_argument("--rows", default="1000000,10000000,50000000", help="Comma-separated table sizes.")
+    parser.add_argument("--skip-load-above", type=int, default=None,
+                        help="Skip the whole-file CSV load above this many rows (it may not fit in memory).")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.case:
+        run_case(args.case, args.dir)
+        return
+
+    results = []
+    print(f"{'rows':>12} {'case':<16} {'seconds':>9} {'peak RSS MB':>12} {'CSV MB':>8} {'columnar MB':>12}")
+    for rows in (int(n) for n in args.rows.split(",")):
+        directory = tempfile.mkdtemp(prefix="bench_columnar_")
+        try:
+            generate(directory, rows)
+            csv_mb = os.path.getsize(os.path.join(directory, "results.csv")) / 2**20
+            col_dir = os.path.join(directory, "results.col")
+            col_mb = sum(os.path.getsize(os.path.join(col_dir, name)) for name in os.listdir(col_dir)) / 2**20
+            for case in CASES:
+                if case == "csv-load" and args.skip_load_above and rows > args.skip_load_above:
+                    continue
+                result = measure(case, directory) | {"rows": rows, "csv_mb": round(csv_mb, 1),
+                                                      "columnar_mb": round(col_mb, 1)}
+                results.append(result)
+                seconds = f"{result['seconds']:>9.3f}" if "seconds" in result else f"{result['error']:>9}"
+                print(f"{rows:>12} {case:<16} {seconds} {result['peak_rss_mb']:>12.1f} {csv_mb:>8.1f} {col_mb:>12.1f}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
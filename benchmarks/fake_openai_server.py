@@ -0,0 +1,252 @@
+# A local, OpenAI-compatible chat completions server for benchmarks: no API
+# key, no cost, and repeatable timing. Responses take `latency` seconds to the
+# first token and then arrive at `tokens_per_second` (streamed as SSE when the
+# client asks for it). What is returned comes from a script of rules, matched
+# in order against each request:
+#
+#   {"default": "text for unmatched requests",
+#    "rules": [
+#      {"tool": "search_arxiv",                   # offered in the request's tools
+#       "tool_calls": [{"name": "search_arxiv", "arguments": {"query": "GNN"}}]},
+#      {"match": "peer review", "response": "Approved."}]}   # substring of the last user message
+#
+# A rule with `tool_calls` is answered with those calls until the conversation
+# contains a tool result; then with its `response` (or the default). A rule may
+# list several `responses`, which are used in turn.
+#
+# Usage: python benchmarks/fake_openai_server.py [--port 8089] [--latency 0.2] [--tps 50] [--script rules.json]
+# then:  OPENAI_API_BASE=http://127.0.0.1:8089/v1 OPENAI_API_KEY=sk-fake python aiscientist.py
+
+import argparse
+import itertools
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE_WORDS = 150
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), enough for usage reporting."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def default_text(words: int = DEFAULT_RESPONSE_WORDS) -> str:
+    filler = ("The results indicate a consistent relationship between the proposed model and the measured "
+              "binding affinity while toxicity remains within the expected range across all tested molecules").split()
+    return " ".join(itertools.islice(itertools.cycle(filler), words)) + "."
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):  # [{"type": "text", "text": ...}, ...]
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+class FakeOpenAIServer:
+    """
+    OpenAI-compatible `/v1/chat/completions` and `/v1/models` endpoints on a
+    background thread. `url` is the API base to put in OPENAI_API_BASE; `stats`
+    counts requests and prompt/completion tokens served.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 tokens_per_second: float = 0.0, script: dict = None, model: str = "gpt-3.5-turbo"):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.model = model
+        script = script or {}
+        if isinstance(script, list):
+            script = {"rules": script}
+        self.rules = script.get("rules", [])
+        self.default = script.get("default") or default_text()
+        self.stats = {"requests": 0, "stream_requests": 0, "tool_call_responses": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0}
+        self._turns = {}  # rule index -> how many times its `responses` were used
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @classmethod
+    def from_script_file(cls, path: str = None, **kwargs):
+        script = None
+        if path:
+            with open(path) as f:
+                script = json.load(f)
+        return cls(script=script, **kwargs)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- Responses ---
+
+    def reply(self, request: dict) -> dict:
+        """The assistant message for a chat completion request: {"content": ...} or {"tool_calls": [...]}."""
+        messages = request.get("messages") or []
+        prompt = next((_message_text(m) for m in reversed(messages) if m.get("role") == "user"), "")
+        offered = {tool.get("function", {}).get("name") for tool in request.get("tools") or []}
+        has_tool_result = any(m.get("role") == "tool" for m in messages)
+        for index, rule in enumerate(self.rules):
+            if "tool" in rule and rule["tool"] not in offered:
+                continue
+            if "match" in rule and rule["match"].lower() not in prompt.lower():
+                continue
+            if rule.get("tool_calls") and not has_tool_result:
+                return {"tool_calls": [
+                    {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                     "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))}}
+                    for call in rule["tool_calls"]
+                ]}
+            if rule.get("responses"):
+                with self._lock:
+                    turn = self._turns.get(index, 0)
+                    self._turns[index] = turn + 1
+                return {"content": rule["responses"][turn % len(rule["responses"])]}
+            return {"content": rule.get("response") or self.default}
+        return {"content": self.default}
+
+    def _generation_time(self, completion_tokens: int) -> float:
+        return completion_tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json(200, {"object": "list", "data": [
+                        {"id": server.model, "object": "model", "owned_by": "fake"}]})
+                elif self.path.rstrip("/").endswith("/stats"):
+                    with server._lock:
+                        self._send_json(200, dict(server.stats))
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "Request body is not JSON."}})
+                    return
+                message = server.reply(request)
+                prompt_tokens = sum(count_tokens(_message_text(m)) for m in request.get("messages") or [])
+                completion = message.get("content") or json.dumps(message.get("tool_calls"))
+                completion_tokens = count_tokens(completion)
+                stream = bool(request.get("stream"))
+                with server._lock:
+                    server.stats["requests"] += 1
+                    server.stats["stream_requests"] += stream
+                    server.stats["tool_call_responses"] += "tool_calls" in message
+                    server.stats["prompt_tokens"] += prompt_tokens
+                    server.stats["completion_tokens"] += completion_tokens
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                         "total_tokens": prompt_tokens + completion_tokens}
+                model = request.get("model") or server.model
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+                finish_reason = "tool_calls" if "tool_calls" in message else "stop"
+                time.sleep(server.latency)
+                if stream:
+                    self._stream(completion_id, model, message, finish_reason, usage)
+                    return
+                time.sleep(server._generation_time(completion_tokens))
+                self._send_json(200, {
+                    "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "finish_reason": finish_reason,
+                                 "message": {"role": "assistant", "content": message.get("content"),
+                                             **({"tool_calls": message["tool_calls"]} if "tool_calls" in message else {})}}],
+                    "usage": usage,
+                })
+
+            def _stream(self, completion_id, model, message, finish_reason, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def chunk(delta, finish=None, **extra):
+                    body = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                            "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra}
+                    self.wfile.write(f"data: {json.dumps(body)}\n\n".encode())
+                    self.wfile.flush()
+
+                chunk({"role": "assistant", "content": ""})
+                if "tool_calls" in message:
+                    time.sleep(server._generation_time(usage["completion_tokens"]))
+                    chunk({"tool_calls": [dict(call, index=i) for i, call in enumerate(message["tool_calls"])]})
+                else:
+                    # ~4 characters per token, one chunk per token.
+                    text = message["content"]
+                    delay = server._generation_time(1)
+                    for start in range(0, len(text), 4):
+                        if delay:
+                            time.sleep(delay)
+                        chunk({"content": text[start:start + 4]})
+                chunk({}, finish_reason, usage=usage)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token.")
+    parser.add_argument("--tps", type=float, default=50.0, help="Generated tokens per second (0: instant).")
+    parser.add_argument("--script", help="JSON file of response rules (see the header of this file).")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer.from_script_file(args.script, host=args.host, port=args.port,
+                                               latency=args.latency, tokens_per_second=args.tps)
+    print(f"Fake OpenAI server listening on {server.url} (latency {args.latency}s, {args.tps} tokens/s)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        print(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()
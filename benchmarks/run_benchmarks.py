@@ -0,0 +1,302 @@
+# End-to-end and per-tool benchmark suite, runnable without a paid LLM provider.
+#
+#   pipeline  aiscientist.py as a subprocess against benchmarks/fake_openai_server.py
+#             (scripted responses that make the agents call their tools), with
+#             tracing on, so the results include p50/p95 per stage.
+#   micro     each ScientificTools function in-process: KB queries (keyword and
+#             semantic) at several KB sizes, analyze_data at several row counts,
+#             code execution, literature search and the evaluators.
+#
+# Results go to a JSON file tagged with the git commit; --compare reports the
+# cases that got slower than in an earlier results file.
+#
+# Usage: python benchmarks/run_benchmarks.py [--output bench_results.json] [--compare baseline.json]
+#            [--kb-sizes 1000,10000,50000] [--rows 10000,100000,1000000] [--latency 0.2] [--tps 50]
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+EXPERIMENT_CODE = """\
+import numpy as np
+rng = np.random.default_rng(0)
+n = 10000
+affinity = rng.random(n)
+toxicity = np.clip(0.3 * affinity + 0.7 * rng.random(n), 0.0, 1.0)
+with open("results.csv", "w") as f:
+    f.write("molecule_id,binding_affinity,toxicity_score\\n")
+    for i in range(n):
+        f.write(f"MOL-{i:06d},{affinity[i]:.6f},{toxicity[i]:.6f}\\n")
+print("wrote", n, "rows")
+"""
+
+# Every agent with a tool calls it once, then answers with the default text.
+PIPELINE_SCRIPT = {
+    "rules": [
+        {"tool": "search_arxiv",
+         "tool_calls": [{"name": "search_arxiv", "arguments": {"query": "graph neural networks binding affinity"}}]},
+        {"tool": "execute_python_code",
+         "tool_calls": [{"name": "execute_python_code", "arguments": {"code": EXPERIMENT_CODE}}]},
+        {"tool": "analyze_data", "tool_calls": [{"name": "analyze_data", "arguments": {"file_path": "results.csv"}}]},
+        {"tool": "write_latex_paper",
+         "tool_calls": [{"name": "write_latex_paper",
+                         "arguments": {"analysis_summary": "Affinity and toxicity are correlated.",
+                                       "hypothesis": "GNN-designed molecules bind better."}}]},
+    ],
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def time_call(func, repeat: int) -> dict:
+    """Median/min/max seconds of `repeat` calls after one warm-up call, with the tools' console output suppressed."""
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+    return {"median_s": round(statistics.median(samples), 6), "min_s": round(min(samples), 6),
+            "max_s": round(max(samples), 6), "repeat": repeat}
+
+
+# --- Pipeline ---
+
+def run_pipeline(args) -> dict:
+    """Runs aiscientist.py `args.pipeline_runs` times against the fake server."""
+    server = FakeOpenAIServer(latency=args.latency, tokens_per_second=args.tps, script=PIPELINE_SCRIPT).start()
+    runs = []
+    try:
+        for attempt in range(args.pipeline_runs):
+            workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+            env = dict(os.environ, LLM_PROVIDER="openai", OPENAI_API_KEY="sk-fake", OPENAI_API_BASE=server.url,
+                       OPENAI_MODEL_NAME=args.model, AISCIENTIST_TRACE=os.path.join(workdir, "trace.json"),
+                       KNOWLEDGE_BASE_PATH=os.path.join(workdir, "kb.jsonl"), LLM_CACHE="0", CODE_CACHE="0")
+            env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+            command = [sys.executable, os.path.join(ROOT, "aiscientist.py"), "--hypotheses", str(args.hypotheses),
+                       "--checkpoint-dir", os.path.join(workdir, "checkpoints")]
+            requests_before = server.stats["requests"]
+            start = time.perf_counter()
+            proc = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True,
+                                  timeout=args.pipeline_timeout)
+            run = {"attempt": attempt, "returncode": proc.returncode,
+                   "wall_s": round(time.perf_counter() - start, 3),
+                   "llm_requests": server.stats["requests"] - requests_before}
+            if proc.returncode != 0:
+                run["error"] = (proc.stderr or proc.stdout).strip().splitlines()[-1:] or ["no output"]
+            elif not run["llm_requests"]:
+                # PraisonAI reports LLM errors (e.g. a missing litellm) in the output instead of raising.
+                run["error"] = ["no LLM request reached the fake server"]
+            run["stages"] = stage_summary(os.path.join(workdir, "trace.json"))
+            runs.append(run)
+            print(f"pipeline run {attempt}: exit {proc.returncode}, {run['wall_s']:.2f}s, "
+                  f"{run['llm_requests']} LLM requests" + (f" ({run['error'][0]})" if "error" in run else ""))
+            shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        server.stop()
+    walls = [run["wall_s"] for run in runs if "error" not in run]
+    return {
+        "latency_s": args.latency, "tokens_per_second": args.tps, "hypotheses": args.hypotheses,
+        "median_s": round(statistics.median(walls), 3) if walls else None,
+        "succeeded": len(walls), "runs": runs, "server": dict(server.stats),
+    }
+
+
+def stage_summary(trace_path: str) -> dict:
+    """{task name: wall seconds} plus LLM/tool totals, from a Chrome trace written by tools.tracing."""
+    try:
+        with open(trace_path) as f:
+            events = json.load(f)["traceEvents"]
+    except (OSError, ValueError, KeyError):
+        return {}
+    stages = {}
+    for event in events:
+        if event.get("ph") != "X":
+            continue
+        stage = stages.setdefault(event["args"].get("stage") or "-", {"wall_s": 0.0, "llm_s": 0.0, "tool_s": 0.0})
+        key = {"task": "wall_s", "llm": "llm_s", "tool": "tool_s"}.get(event["cat"])
+        if key:
+            stage[key] = round(stage[key] + event["dur"] / 1e6, 4)
+    return stages
+
+
+# --- Micro-benchmarks ---
+
+def make_kb_entry(i: int) -> dict:
+    families = ("graph neural network", "transformer", "diffusion model", "random forest", "message passing")
+    return {
+        "hypothesis": f"{families[i % len(families)]} family {i} predicts binding affinity of molecule MOL-{i:06d}",
+        "conclusion": "supports" if i % 3 else "contradicts",
+        "confidence": round(0.5 + (i % 50) / 100, 2),
+    }
+
+
+def write_results_csv(path: str, rows: int):
+    import numpy as np
+    rng = np.random.default_rng(0)
+    with open(path, "w") as f:
+        f.write("molecule_id,binding_affinity,toxicity_score,molecular_weight\n")
+        for start in range(0, rows, 500_000):
+            n = min(500_000, rows - start)
+            affinity, weight = rng.random(n), rng.uniform(150, 600, n)
+            toxicity = np.clip(0.3 * affinity + 0.7 * rng.random(n), 0.0, 1.0)
+            f.write("".join(f"MOL-{start + i:09d},{a:.6f},{t:.6f},{w:.2f}\n" for i, (a, t, w)
+                            in enumerate(zip(affinity.tolist(), toxicity.tolist(), weight.tolist()))))
+
+
+def run_micro(args, workdir: str) -> list[dict]:
+    # Measure the tools themselves, not the caches in front of them.
+    os.environ.update(SEARCH_CACHE="0", CODE_CACHE="0", STREAM_ANALYSIS="0")
+    os.chdir(workdir)  # The sandbox pool and KB default to the working directory.
+    from tools.knowledge_base import get_knowledge_base
+    from tools.scientific_tools import ScientificTools as T
+
+    results = []
+    kbs = []
+
+    def record(tool: str, params: dict, func, repeat: int = args.repeat):
+        result = {"tool": tool, "params": params} | time_call(func, repeat)
+        results.append(result)
+        label = ", ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{tool:<40} {label:<28} {result['median_s'] * 1e3:>10.2f} ms")
+
+    for size in (int(n) for n in args.kb_sizes.split(",")):
+        path = os.path.join(workdir, f"kb_{size}.jsonl")
+        kb = get_knowledge_base(path)
+        kbs.append(kb)
+        for start in range(0, size, 1000):
+            kb.add_many([make_kb_entry(i) for i in range(start, min(size, start + 1000))])
+        kb.sync()
+        os.environ["KNOWLEDGE_BASE_PATH"] = path
+        for mode in ("keyword", "semantic"):
+            record("query_knowledge_base", {"entries": size, "mode": mode},
+                   lambda: T.query_knowledge_base("graph neural network binding affinity", top_k=5, mode=mode))
+        record("update_knowledge_base", {"entries": size},
+               lambda: T.update_knowledge_base(make_kb_entry(size)))
+
+    for rows in (int(n) for n in args.rows.split(",")):
+        path = os.path.join(workdir, f"results_{rows}.csv")
+        write_results_csv(path, rows)
+        record("analyze_data", {"rows": rows}, lambda: T.analyze_data(path),
+               repeat=max(1, args.repeat // 2) if rows >= 1_000_000 else args.repeat)
+
+    T.execute_python_code("print('warm-up')")  # Starts the worker pool.
+    record("execute_python_code", {"script": "print"}, lambda: T.execute_python_code("print(sum(range(1000)))"))
+    record("execute_python_code", {"script": "experiment"}, lambda: T.execute_python_code(EXPERIMENT_CODE))
+    record("search_arxiv", {"index": bool(os.environ.get("ARXIV_INDEX_DIR"))},
+           lambda: T.search_arxiv("graph neural networks for molecular binding affinity"))
+    hypothesis = "GNN-designed molecules have higher binding affinity and lower toxicity than the baseline."
+    record("write_latex_paper", {}, lambda: T.write_latex_paper("Affinity correlates with toxicity.", hypothesis))
+    record("evaluate_hypothesis_clarity", {}, lambda: T.evaluate_hypothesis_clarity(hypothesis))
+    candidates = [f"Candidate {i}: {hypothesis} We will test it against a control." for i in range(100)]
+    record("evaluate_hypothesis_clarity_batch", {"hypotheses": len(candidates)},
+           lambda: T.evaluate_hypothesis_clarity_batch(candidates, top_n=5))
+    record("evaluate_experimental_design_soundness", {},
+           lambda: T.evaluate_experimental_design_soundness("Screen 10,000 molecules with a control group.", hypothesis))
+    record("analyze_code_for_errors", {}, lambda: T.analyze_code_for_errors(EXPERIMENT_CODE, "ValueError: bad"))
+    record("compare_results_to_hypothesis", {},
+           lambda: T.compare_results_to_hypothesis("Binding affinity improved by 12%.", hypothesis))
+    from agents.context_budget import ContextBudget
+    log = "\n".join([f"epoch {i}: loss={1 / (i + 1):.4f} acc={i / 1000:.3f}" for i in range(5000)]
+                    + ["Run finished."] + [EXPERIMENT_CODE] * 20)
+    budget = ContextBudget(max_entries=0)  # Measure digesting, not the digest cache.
+    record("context_budget.fit", {"upstream_tokens": len(log) // 4},
+           lambda: budget.fit("analyze", {"execute": log}))
+    for kb in kbs:
+        kb.close()
+    return results
+
+
+# --- Comparison ---
+
+def case_key(result: dict) -> str:
+    return result["tool"] + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(current: dict, baseline_path: str, threshold: float, min_delta: float = 0.001) -> list[str]:
+    """
+    Lines describing cases that are more than `threshold` times slower than the
+    baseline. Differences under `min_delta` seconds are treated as noise.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {case_key(result): result["median_s"] for result in baseline.get("micro", [])}
+    pairs = [(case_key(r), before.get(case_key(r)), r["median_s"]) for r in current.get("micro", [])]
+    if (baseline.get("pipeline") or {}).get("median_s") and (current.get("pipeline") or {}).get("median_s"):
+        pairs.append(("pipeline", baseline["pipeline"]["median_s"], current["pipeline"]["median_s"]))
+    slower = []
+    for key, old, new in pairs:
+        if old and new > old * threshold and new - old > min_delta:
+            slower.append(f"{key}: {old * 1e3:.2f} ms -> {new * 1e3:.2f} ms ({new / old:.2f}x)")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Scientist benchmark suite (no real LLM provider needed).")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the results.")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier results file to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown factor reported by --compare.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--kb-sizes", default="1000,10000,50000", help="Comma-separated KB entry counts.")
+    parser.add_argument("--rows", default="10000,100000,1000000", help="Comma-separated analyze_data row counts.")
+    parser.add_argument("--skip-pipeline", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--pipeline-runs", type=int, default=3)
+    parser.add_argument("--pipeline-timeout", type=float, default=600)
+    parser.add_argument("--hypotheses", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM seconds to first token.")
+    parser.add_argument("--tps", type=float, default=50.0, help="Fake LLM tokens per second.")
+    parser.add_argument("--model", default="gpt-3.5-turbo", help="Model name sent to the fake server.")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    results = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+               "python": platform.python_version(), "platform": platform.platform(),
+               "args": vars(args), "pipeline": None, "micro": []}
+    if not args.skip_pipeline:
+        results["pipeline"] = run_pipeline(args)
+    if not args.skip_micro:
+        workdir = tempfile.mkdtemp(prefix="bench_micro_")
+        cwd = os.getcwd()
+        try:
+            results["micro"] = run_micro(args, workdir)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        slower = compare(results, args.compare, args.threshold)
+        print(f"{len(slower)} case(s) slower than {args.compare} by more than {args.threshold}x")
+        for line in slower:
+            print("  " + line)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
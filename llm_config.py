@@ -0,0 +1,58 @@
+# LLM provider configuration shared by aiscientist.py and batch_runner.py.
+
+import os
+
+
+def configure_llm():
+    """
+    Reads LLM_PROVIDER and the provider-specific environment variables.
+    Returns (llm_provider, agent_llm_config), where agent_llm_config is what
+    gets passed as `llm` to each agent.
+    """
+    llm_provider = os.environ.get("LLM_PROVIDER", "openai").lower()
+
+    print(f"--- Configuring LLM for provider: {llm_provider} ---")
+
+    if llm_provider == "ollama":
+        ollama_model_name = os.environ.get("OLLAMA_MODEL_NAME")
+        if not ollama_model_name:
+            raise ValueError("OLLAMA_MODEL_NAME environment variable must be set when LLM_PROVIDER is 'ollama'.")
+        if os.environ.get("OLLAMA_API_BASE"):
+            print(f"Using Ollama. Model: '{ollama_model_name}' (set via OLLAMA_MODEL_NAME env var). API Base: '{os.environ.get('OLLAMA_API_BASE')}' (set via OLLAMA_API_BASE env var).")
+        else:
+            print(f"Using Ollama. Model: '{ollama_model_name}' (set via OLLAMA_MODEL_NAME env var). OLLAMA_API_BASE not set (LiteLLM will use default).")
+
+    elif llm_provider == "openai":
+        if not os.environ.get("OPENAI_API_KEY"):
+            print("OPENAI_API_KEY not found, using placeholder key.")
+            os.environ["OPENAI_API_KEY"] = "sk-your_api_key_here" # Placeholder
+        openai_model_name = os.environ.get("OPENAI_MODEL_NAME", "gpt-3.5-turbo")
+        print(f"Using OpenAI (model specified by OPENAI_MODEL_NAME env var: {openai_model_name} or LiteLLM default)")
+    else:
+        raise ValueError(f"Unsupported LLM_PROVIDER: '{llm_provider}'. Must be 'openai' or 'ollama'.")
+
+    # Determine the LLM configuration to be passed to individual agent instances
+    agent_llm_config = None
+    if llm_provider == "ollama":
+        agent_llm_config = os.environ.get("OLLAMA_MODEL_NAME")
+        # If praisonaiagents.Agent expects a dict, this might be:
+        # agent_llm_config = {
+        #     "model": os.environ.get("OLLAMA_MODEL_NAME"),
+        #     "api_base": os.environ.get("OLLAMA_API_BASE"),
+        #     # Potentially "api_key": "not-needed" or actual key if required by specific ollama setup with LiteLLM
+        # }
+    elif llm_provider == "openai":
+        # Pass a dictionary to ensure api_key is explicitly included for LiteLLM
+        agent_llm_config = {
+            "model": os.environ.get("OPENAI_MODEL_NAME", "gpt-3.5-turbo"),
+            "api_key": os.environ.get("OPENAI_API_KEY", "not-needed") # Ensure OPENAI_API_KEY is included
+        }
+        # An OpenAI-compatible server other than api.openai.com (e.g. a local one,
+        # or benchmarks/fake_openai_server.py).
+        if os.environ.get("OPENAI_API_BASE"):
+            agent_llm_config["base_url"] = os.environ.get("OPENAI_API_BASE")
+
+    print(f"--- Agent LLM Config determined: {agent_llm_config} ---")
+    print("--- LLM Configuration for Agents Complete ---") # End of LLM config block
+
+    return llm_provider, agent_llm_config
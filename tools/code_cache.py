@@ -0,0 +1,436 @@
+import ast
+import functools
+import hashlib
+import importlib.metadata
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Files a script writes that count as experiment artifacts (stored and restored on a hit).
+ARTIFACT_SUFFIXES = (".csv", ".tsv", ".json", ".txt", ".npy", ".npz", ".parquet", ".pkl", ".png", ".svg", ".pdf")
+
+# Stores the framework itself keeps in the working directory, by environment
+# variable and default path. They and their sidecars (e.g. the knowledge
+# base's .vectors.f32.json) change independently of any script, so they are
+# never copied into a scratch directory, hashed as inputs or captured as artifacts.
+_FRAMEWORK_PATHS = {
+    "KNOWLEDGE_BASE_PATH": "mock_knowledge_base.jsonl",
+    "LLM_CACHE_PATH": "llm_cache.sqlite",
+    "JOB_QUEUE_PATH": "jobs.sqlite",
+    "CODE_CACHE_DIR": "code_cache",
+}
+
+# Errors that depend on the machine or the limits rather than on the code.
+_TRANSIENT_ERRORS = ("TimeoutError", "Crash", "SandboxError", "MemoryError")
+
+# Random sources and the calls that make each of them reproducible.
+_RANDOM_MODULES = {
+    "random": {"random.seed"},
+    "numpy.random": {"numpy.random.seed"},
+    "torch": {"torch.manual_seed"},
+}
+# Constructors that are deterministic when given a seed argument.
+_SEEDABLE_CONSTRUCTORS = {"random.Random", "numpy.random.default_rng", "numpy.random.RandomState",
+                          "numpy.random.Generator", "numpy.random.PCG64", "numpy.random.SeedSequence"}
+_ALWAYS_RANDOM = {"os.urandom", "uuid.uuid1", "uuid.uuid4", "random.SystemRandom"}
+_TORCH_RANDOM = {"torch.rand", "torch.randn", "torch.randint", "torch.randperm", "torch.bernoulli",
+                 "torch.multinomial", "torch.normal"}
+
+
+def normalize_code(code: str) -> str:
+    """
+    Canonical form of a script: its AST dump, so comments, blank lines and
+    formatting do not change it. Unparseable code is used verbatim.
+    """
+    try:
+        return ast.dump(ast.parse(code))
+    except SyntaxError:
+        return code
+
+
+def _import_aliases(tree: ast.AST) -> dict:
+    """Maps local names to the dotted names they were imported as."""
+    aliases = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    aliases[alias.asname] = alias.name
+                else:
+                    top = alias.name.split(".")[0]
+                    aliases[top] = top
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            for alias in node.names:
+                aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+    return aliases
+
+
+def _dotted_name(node: ast.AST, aliases: dict):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(aliases.get(node.id, node.id))
+    return ".".join(reversed(parts))
+
+
+def imported_modules(tree: ast.AST) -> set:
+    """Top-level names of every module the script imports."""
+    return {name.split(".")[0] for name in _import_aliases(tree).values()}
+
+
+def unseeded_randomness(code: str):
+    """
+    Returns a short reason if the script draws random numbers without seeding
+    the generator it uses (stdlib random, numpy.random, torch, os.urandom,
+    uuid4 ...), else None. Results of such scripts must not be cached.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    aliases = _import_aliases(tree)
+    calls = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            name = _dotted_name(node.func, aliases)
+            if name:
+                calls.append((name, bool(node.args or node.keywords)))
+    seeded = {module for module, seeders in _RANDOM_MODULES.items()
+              if any(name in seeders and has_args for name, has_args in calls)}
+    for name, has_args in calls:
+        if name in _ALWAYS_RANDOM:
+            return f"uses {name}()"
+        if name in _SEEDABLE_CONSTRUCTORS:
+            if not has_args:
+                return f"calls {name}() without a seed"
+            continue
+        if name in _TORCH_RANDOM:
+            if "torch" not in seeded:
+                return f"calls {name}() without torch.manual_seed()"
+            continue
+        for module in ("numpy.random", "random"):
+            if name.startswith(module + ".") and name not in _RANDOM_MODULES[module]:
+                if module not in seeded:
+                    return f"calls {name}() without {module}.seed()"
+                break
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def _distributions() -> dict:
+    return importlib.metadata.packages_distributions()
+
+
+@functools.lru_cache(maxsize=256)
+def _module_versions(modules: tuple) -> tuple:
+    versions = []
+    for module in modules:
+        for dist in _distributions().get(module, []):
+            try:
+                versions.append((module, dist, importlib.metadata.version(dist)))
+            except importlib.metadata.PackageNotFoundError:
+                pass
+    return tuple(versions)
+
+
+def environment_fingerprint(code: str) -> list:
+    """Interpreter version plus the installed versions of the packages the script imports."""
+    try:
+        modules = tuple(sorted(imported_modules(ast.parse(code))))
+    except SyntaxError:
+        modules = ()
+    return [sys.version, platform.machine(), list(_module_versions(modules))]
+
+
+def _referenced_paths(code: str) -> set:
+    """String literals in the script, i.e. candidate input file names."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return set()
+    return {node.value for node in ast.walk(tree)
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and 0 < len(node.value) < 256
+            and "\n" not in node.value}
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _framework_file(name: str) -> bool:
+    """True for the framework's own stores and their sidecars (see _FRAMEWORK_PATHS)."""
+    prefixes = tuple(os.path.basename(os.environ.get(var, default)) for var, default in _FRAMEWORK_PATHS.items())
+    return os.path.basename(name).startswith(prefixes)
+
+
+def _seed_scratch(workdir: str, scratch: str, code: str) -> dict:
+    """
+    Prepares a scratch directory for one run of `code`: the workdir files the
+    script names are copied in (so rewriting them cannot touch the originals)
+    and every other visible entry of the workdir is symlinked, so reads work
+    as before. Returns {name: sha256} of the copied inputs.
+    """
+    inputs = {}
+    for name in _referenced_paths(code):
+        path = os.path.join(workdir, name)
+        if os.path.dirname(name) or name.startswith(".") or _framework_file(name) or not os.path.isfile(path):
+            continue
+        inputs[name] = _file_sha256(path)
+        shutil.copy2(path, os.path.join(scratch, name))
+    for entry in os.scandir(workdir):
+        if entry.name.startswith(".") or entry.name in inputs:
+            continue
+        os.symlink(entry.path, os.path.join(scratch, entry.name))
+    return inputs
+
+
+def _produced_files(scratch: str, inputs: dict) -> dict:
+    """{relative path: path} of the files a run created or rewrote in its scratch directory."""
+    produced = {}
+    for root, _, files in os.walk(scratch):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, scratch)
+            if (os.path.islink(path) or _framework_file(rel)
+                    or (rel in inputs and _file_sha256(path) == inputs[rel])):
+                continue
+            produced[rel] = path
+    return produced
+
+
+def _publish(produced: dict, workdir: str):
+    """Moves a run's files from its scratch directory into the workdir."""
+    for rel, path in produced.items():
+        target = os.path.join(workdir, rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+
+
+class CodeResultCache:
+    """
+    Content-addressed cache of `execute_python_code` results.
+
+    The key hashes the AST-normalized code together with the interpreter and
+    the versions of the packages the script imports. An entry stores the
+    result dict plus the artifact files the run created or modified in the
+    working directory (results.csv etc.), which are restored on a hit. Input
+    files the script names as string literals are hashed when the result is
+    stored; a hit is only served while they are unchanged.
+
+    Scripts that use randomness without a seed are always executed, as are
+    calls with `use_cache=False`. Timeouts and crashes are never cached. When
+    the cache exceeds `max_bytes`, least recently used entries are evicted.
+    """
+
+    def __init__(self, root: str = "code_cache", max_bytes: int = 512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, "blobs")
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False,
+                                     isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY, result TEXT NOT NULL, inputs TEXT NOT NULL,
+                size INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts (key TEXT NOT NULL, name TEXT NOT NULL, sha256 TEXT NOT NULL,"
+            " PRIMARY KEY (key, name)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_blob ON artifacts (sha256)")
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds the cache from CODE_CACHE* environment variables. Enabled by
+        default; returns None when CODE_CACHE is set to 0/false/off.
+        """
+        if os.environ.get("CODE_CACHE", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        return cls(
+            root=os.environ.get("CODE_CACHE_DIR", "code_cache"),
+            max_bytes=int(float(os.environ.get("CODE_CACHE_MAX_MB", 512)) * 1024 * 1024),
+        )
+
+    @staticmethod
+    def make_key(code: str) -> str:
+        payload = json.dumps([normalize_code(code), environment_fingerprint(code)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _blob_path(self, sha: str) -> str:
+        return os.path.join(self.blob_dir, sha[:2], sha)
+
+    def _store_blob(self, path: str, sha: str):
+        target = self._blob_path(sha)
+        if os.path.exists(target):
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            for block in iter(lambda: src.read(1 << 20), b""):
+                dst.write(block)
+        os.replace(tmp_path, target)
+
+    def _restore_blob(self, sha: str, destination: str):
+        tmp_path = f"{destination}.{os.getpid()}.tmp"
+        with open(self._blob_path(sha), "rb") as src, open(tmp_path, "wb") as dst:
+            for block in iter(lambda: src.read(1 << 20), b""):
+                dst.write(block)
+        os.replace(tmp_path, destination)
+
+    def get(self, key: str, workdir: str):
+        """Returns the cached result (restoring its artifacts into workdir) or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT result, inputs FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            for name, sha in json.loads(row[1]).items():
+                path = os.path.join(workdir, name)
+                if not os.path.isfile(path) or _file_sha256(path) != sha:
+                    self.stats["misses"] += 1
+                    return None
+            artifacts = self._conn.execute("SELECT name, sha256 FROM artifacts WHERE key = ?", (key,)).fetchall()
+            try:
+                for name, sha in artifacts:
+                    self._restore_blob(sha, os.path.join(workdir, name))
+            except FileNotFoundError:
+                # A blob was removed behind our back; treat as a miss and re-run.
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.stats["hits"] += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, result: dict, inputs: dict, artifact_paths: dict):
+        """Stores a result with its input hashes and {name: path} of produced artifacts."""
+        now = time.time()
+        artifacts = {name: _file_sha256(path) for name, path in artifact_paths.items()}
+        body = json.dumps(result)
+        size = len(body) + sum(os.path.getsize(path) for path in artifact_paths.values())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            for name, path in artifact_paths.items():
+                self._store_blob(path, artifacts[name])
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                                   (key, body, json.dumps(inputs), size, now, now))
+                self._conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+                self._conn.executemany("INSERT INTO artifacts VALUES (?, ?, ?)",
+                                       [(key, name, sha) for name, sha in artifacts.items()])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.stats["stores"] += 1
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from least to most recently used until we are back under budget.
+        cursor = self._conn.execute("SELECT key, size FROM results ORDER BY last_access")
+        victims = []
+        for key, size in cursor:
+            if total <= self.max_bytes:
+                break
+            victims.append(key)
+            total -= size
+        orphans = set()
+        for key in victims:
+            shas = [row[0] for row in self._conn.execute("SELECT sha256 FROM artifacts WHERE key = ?", (key,))]
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            orphans.update(shas)
+        for sha in orphans:
+            if self._conn.execute("SELECT 1 FROM artifacts WHERE sha256 = ? LIMIT 1", (sha,)).fetchone() is None:
+                try:
+                    os.remove(self._blob_path(sha))
+                except FileNotFoundError:
+                    pass
+        self.stats["evictions"] += len(victims)
+
+    def run(self, code: str, execute, workdir: str, use_cache: bool = True) -> dict:
+        """
+        Returns the result of `execute(code, directory)`, served from the
+        cache when possible. The result dict gains a `cached` flag.
+
+        A script that is executed for the cache runs in its own scratch
+        directory under `workdir` (see _seed_scratch), so its artifacts are
+        exactly the files it wrote there, whatever else runs concurrently in
+        the workdir; they are moved into `workdir` afterwards. Bypassed
+        scripts run in `workdir` itself.
+        """
+        if not use_cache or unseeded_randomness(code):
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return dict(execute(code, workdir), cached=False)
+
+        key = self.make_key(code)
+        cached = self.get(key, workdir)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        scratch = tempfile.mkdtemp(prefix=".run-", dir=workdir)
+        try:
+            inputs = _seed_scratch(workdir, scratch, code)
+            result = execute(code, scratch)
+            produced = _produced_files(scratch, inputs)
+            error = result.get("error") or ""
+            if not error.startswith(_TRANSIENT_ERRORS):
+                # A file the script rewrote is an output, not an input.
+                inputs = {name: sha for name, sha in inputs.items() if name not in produced}
+                artifacts = {rel: path for rel, path in produced.items()
+                             if not os.path.dirname(rel) and rel.endswith(ARTIFACT_SUFFIXES)}
+                try:
+                    self.put(key, result, inputs, artifacts)
+                except OSError as e:
+                    print(f" Code cache: failed to store result: {e}")
+            _publish(produced, workdir)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        return dict(result, cached=False)
+
+    def summary(self) -> str:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        rate = self.stats["hits"] / lookups if lookups else 0.0
+        return (f"Code cache: {self.stats['hits']} hits / {self.stats['misses']} misses "
+                f"({rate:.0%} hit rate), {self.stats['bypassed']} bypassed, {self.stats['evictions']} evicted")
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_code_cache():
+    """Returns the process-wide CodeResultCache, or None when disabled via CODE_CACHE=0."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = CodeResultCache.from_env() or False
+        return _shared_cache or None
@@ -0,0 +1,242 @@
+import csv
+import itertools
+import json
+import os
+
+import numpy as np
+
+HEADER_FILE = "_header.json"
+FORMAT_VERSION = 1
+
+
+def is_columnar(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, HEADER_FILE))
+
+
+def _column_file(name: str) -> str:
+    safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+    return f"{safe}.bin"
+
+
+def _as_column(values) -> np.ndarray:
+    """Normalizes an array to a storable dtype: little-endian numbers or fixed-width UTF-8 bytes."""
+    array = np.asarray(values)
+    if array.dtype.kind == "U":
+        array = np.char.encode(array, "utf-8")
+    elif array.dtype.kind == "O":
+        array = np.char.encode(array.astype(str), "utf-8")
+    elif array.dtype.kind == "b":
+        array = array.astype(np.uint8)
+    if array.dtype.kind not in "iufS":
+        raise TypeError(f"Unsupported column dtype {array.dtype}")
+    if array.dtype.kind != "S" and array.dtype.byteorder == ">":
+        array = array.astype(array.dtype.newbyteorder("<"))
+    return array.reshape(-1)
+
+
+class ColumnarWriter:
+    """
+    Writes a results table as a directory of typed, headerless per-column
+    binary files (`<column>.bin`, raw little-endian arrays; strings as
+    fixed-width UTF-8 `S<n>`) plus `_header.json` with the row count, names
+    and dtypes. Chunks are appended as they come, so tables larger than memory
+    can be written incrementally; the header is written last, on close().
+
+    Usable from experiment scripts:
+
+        with ColumnarWriter("results.col") as out:
+            out.append({"molecule_id": ids, "binding_affinity": aff, "toxicity_score": tox})
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self.columns = {}  # name -> dtype
+        os.makedirs(path, exist_ok=True)
+        header_path = os.path.join(path, HEADER_FILE)
+        if os.path.exists(header_path):
+            os.remove(header_path)  # The directory is invalid until close() writes a new header.
+        for name in os.listdir(path):
+            if name.endswith(".bin"):
+                os.remove(os.path.join(path, name))
+
+    def _widen(self, name: str, dtype: np.dtype):
+        # A later chunk has longer strings: rewrite the column at the new width.
+        file_path = os.path.join(self.path, _column_file(name))
+        np.fromfile(file_path, dtype=self.columns[name]).astype(dtype).tofile(file_path)
+        self.columns[name] = dtype
+
+    def append(self, chunk: dict):
+        arrays = {name: _as_column(values) for name, values in chunk.items()}
+        lengths = {len(a) for a in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: { {n: len(a) for n, a in arrays.items()} }")
+        if self.columns and set(arrays) != set(self.columns):
+            raise ValueError(f"Expected columns {list(self.columns)}, got {list(arrays)}")
+        for name, array in arrays.items():
+            dtype = self.columns.get(name)
+            if dtype is None:
+                dtype = array.dtype
+                self.columns[name] = dtype
+            elif array.dtype.kind == "S" and array.dtype.itemsize > dtype.itemsize:
+                self._widen(name, array.dtype)
+                dtype = array.dtype
+            with open(os.path.join(self.path, _column_file(name)), "ab") as f:
+                array.astype(dtype, copy=False).tofile(f)
+        self.rows += lengths.pop() if lengths else 0
+
+    def close(self):
+        header = {
+            "version": FORMAT_VERSION,
+            "rows": self.rows,
+            "columns": [{"name": name, "dtype": dtype.str, "file": _column_file(name)}
+                        for name, dtype in self.columns.items()],
+        }
+        tmp_path = os.path.join(self.path, HEADER_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(header, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, HEADER_FILE))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_columnar(path: str, columns: dict):
+    """Writes a whole table ({name: array}) in one go."""
+    with ColumnarWriter(path) as writer:
+        writer.append(columns)
+
+
+class ColumnarTable:
+    """
+    Read access to a columnar results directory. Columns are np.memmap views
+    of the column files, so opening is O(1) and only the pages a computation
+    touches are read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, HEADER_FILE)) as f:
+            header = json.load(f)
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version {header.get('version')}")
+        self.rows = header["rows"]
+        self.dtypes = {c["name"]: np.dtype(c["dtype"]) for c in header["columns"]}
+        self._files = {c["name"]: os.path.join(path, c["file"]) for c in header["columns"]}
+        self._maps = {}
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self.dtypes)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._maps:
+            if self.rows == 0:
+                self._maps[name] = np.empty(0, dtype=self.dtypes[name])
+            else:
+                self._maps[name] = np.memmap(self._files[name], dtype=self.dtypes[name], mode="r",
+                                             shape=(self.rows,))
+        return self._maps[name]
+
+    def iter_chunks(self, chunk_rows: int = 1_000_000, columns=None):
+        """Yields (first_row, {name: view}) slices of the table."""
+        names = list(columns or self.columns)
+        for start in range(0, self.rows, chunk_rows):
+            yield start, {name: self[name][start:start + chunk_rows] for name in names}
+
+
+def open_columnar(path: str) -> ColumnarTable:
+    return ColumnarTable(path)
+
+
+def _infer_kind(values: list[str]) -> str:
+    """'i', 'f' or 'S' for a sample of CSV fields."""
+    kind = "i"
+    for value in values:
+        value = value.strip()
+        if not value:
+            continue
+        if kind == "i":
+            try:
+                int(value)
+                continue
+            except ValueError:
+                kind = "f"
+        try:
+            float(value)
+        except ValueError:
+            return "S"
+    return kind
+
+
+def csv_to_columnar(csv_path: str, out_path: str, chunk_rows: int = 500_000) -> ColumnarTable:
+    """
+    Converts a CSV with a header row to the columnar format, chunk by chunk.
+    Column types (int64 / float64 / string) are inferred from the first rows;
+    unparseable numeric values become NaN (float) or raise (int).
+    """
+    with open(csv_path, newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        sample = list(itertools.islice(reader, 1000))
+    kinds = [_infer_kind([row[i] for row in sample if i < len(row)]) for i in range(len(header))]
+
+    with ColumnarWriter(out_path) as writer, open(csv_path, newline="") as f:
+        next(f)
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                break
+            chunk = {}
+            rows = None
+            for i, (name, kind) in enumerate(zip(header, kinds)):
+                try:
+                    values = np.loadtxt(lines, delimiter=",", usecols=[i], quotechar='"', ndmin=1,
+                                        dtype={"i": np.int64, "f": np.float64, "S": str}[kind])
+                    chunk[name] = np.char.encode(values, "utf-8") if kind == "S" else values
+                    continue
+                except ValueError:
+                    pass  # Missing or malformed values: fall back to the csv module.
+                if rows is None:
+                    rows = list(csv.reader(lines))
+                fields = [row[i] if i < len(row) else "" for row in rows]
+                if kind == "f":
+                    chunk[name] = np.array([_parse_float(v) for v in fields], dtype=np.float64)
+                elif kind == "i":
+                    chunk[name] = np.array([int(v) for v in fields], dtype=np.int64)
+                else:
+                    chunk[name] = np.char.encode(np.array(fields, dtype=str), "utf-8")
+            writer.append(chunk)
+    return ColumnarTable(out_path)
+
+
+def _parse_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return float("nan")
+
+
+def columnar_to_csv(path: str, csv_path: str, chunk_rows: int = 500_000):
+    """Writes a columnar table back out as CSV (floats with repr precision, NaN as an empty field)."""
+    table = ColumnarTable(path)
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(table.columns)
+        for _, chunk in table.iter_chunks(chunk_rows):
+            columns = []
+            for name in table.columns:
+                values = chunk[name]
+                if values.dtype.kind == "S":
+                    columns.append([v.decode("utf-8") for v in values.tolist()])
+                elif values.dtype.kind == "f" and np.isnan(values).any():
+                    columns.append(["" if v != v else v for v in values.tolist()])  # NaN -> empty field
+                else:
+                    columns.append(values.tolist())
+            writer.writerows(zip(*columns))
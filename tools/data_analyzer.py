@@ -0,0 +1,341 @@
+import csv
+import heapq
+import io
+import itertools
+import math
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:  # pandas is optional; the csv + numpy reader is used instead.
+    pd = None
+
+AFFINITY_COLUMN = "binding_affinity"
+TOXICITY_COLUMN = "toxicity_score"
+ID_COLUMN = "molecule_id"
+DEFAULT_THRESHOLDS = {AFFINITY_COLUMN: 0.9, TOXICITY_COLUMN: 0.5}
+
+
+class RunningStats:
+    """Count, mean, variance, min and max of one column; chunks are combined with Chan's parallel update."""
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        chunk = RunningStats()
+        chunk.count = len(values)
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        self.merge(chunk)
+
+    def merge(self, other: "RunningStats"):
+        if not other.count:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class CoMoment:
+    """Running co-moment of two columns (rows where both are present), for Pearson correlation."""
+
+    __slots__ = ("count", "mean_x", "mean_y", "m2_x", "m2_y", "c")
+
+    def __init__(self):
+        self.count = 0
+        self.mean_x = self.mean_y = 0.0
+        self.m2_x = self.m2_y = self.c = 0.0
+
+    def update(self, x: np.ndarray, y: np.ndarray):
+        both = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[both], y[both]
+        if not len(x):
+            return
+        chunk = CoMoment()
+        chunk.count = len(x)
+        chunk.mean_x, chunk.mean_y = float(x.mean()), float(y.mean())
+        dx, dy = x - chunk.mean_x, y - chunk.mean_y
+        chunk.m2_x, chunk.m2_y, chunk.c = float(dx @ dx), float(dy @ dy), float(dx @ dy)
+        self.merge(chunk)
+
+    def merge(self, other: "CoMoment"):
+        if not other.count:
+            return
+        total = self.count + other.count
+        weight = self.count * other.count / total
+        dx, dy = other.mean_x - self.mean_x, other.mean_y - self.mean_y
+        self.m2_x += other.m2_x + dx * dx * weight
+        self.m2_y += other.m2_y + dy * dy * weight
+        self.c += other.c + dx * dy * weight
+        self.mean_x += dx * other.count / total
+        self.mean_y += dy * other.count / total
+        self.count = total
+
+    @property
+    def correlation(self) -> float:
+        denominator = math.sqrt(self.m2_x * self.m2_y)
+        return self.c / denominator if denominator > 0 else 0.0
+
+
+class TopK:
+    """The k rows with the highest score, as a min-heap of (score, id, values)."""
+
+    def __init__(self, k: int):
+        self.k = k
+        self.heap = []
+
+    def update(self, scores: np.ndarray, ids_for, values: dict):
+        """`ids_for(indices)` returns the ids of the given chunk rows; only top candidates are looked up."""
+        valid = np.flatnonzero(~np.isnan(scores))
+        if not len(valid) or not self.k:
+            return
+        if len(valid) > self.k:
+            valid = valid[np.argpartition(scores[valid], -self.k)[-self.k:]]
+        if len(self.heap) == self.k:
+            valid = valid[scores[valid] > self.heap[0][0]]
+        if not len(valid):
+            return
+        for i, row_id in zip(valid, ids_for(valid)):
+            item = (float(scores[i]), str(row_id), {name: float(col[i]) for name, col in values.items()})
+            if len(self.heap) < self.k:
+                heapq.heappush(self.heap, item)
+            elif item[0] > self.heap[0][0]:
+                heapq.heapreplace(self.heap, item)
+
+    def merge(self, other: "TopK"):
+        for item in other.heap:
+            if len(self.heap) < self.k:
+                heapq.heappush(self.heap, item)
+            elif item[0] > self.heap[0][0]:
+                heapq.heapreplace(self.heap, item)
+
+    def best(self) -> list:
+        return sorted(self.heap, key=lambda item: item[0], reverse=True)
+
+
+class DataAnalysis:
+    """
+    All accumulators for one results file. Every part is mergeable, so
+    memory stays bounded by the chunk size no matter how many rows are read,
+    and partial analyses (e.g. of separate files or chunk ranges) combine exactly.
+    """
+
+    def __init__(self, columns: list[str], thresholds: dict = None, top_k: int = 5, toxicity_weight: float = 1.0):
+        self.columns = list(columns)
+        self.thresholds = {c: t for c, t in (DEFAULT_THRESHOLDS if thresholds is None else thresholds).items()
+                           if c in self.columns}
+        self.toxicity_weight = toxicity_weight
+        self.rows = 0
+        self.stats = {c: RunningStats() for c in self.columns}
+        self.pairs = {(a, b): CoMoment() for a, b in itertools.combinations(self.columns, 2)}
+        self.above = {c: 0 for c in self.thresholds}
+        self.scored = AFFINITY_COLUMN in self.columns and TOXICITY_COLUMN in self.columns
+        self.top = TopK(top_k)
+
+    def update(self, chunk: dict, ids_for):
+        """Adds one chunk: {column: float array} plus an `ids_for(indices)` lookup."""
+        self.rows += len(next(iter(chunk.values()))) if chunk else 0
+        for column, stats in self.stats.items():
+            stats.update(chunk[column])
+        for (a, b), moment in self.pairs.items():
+            moment.update(chunk[a], chunk[b])
+        for column, threshold in self.thresholds.items():
+            self.above[column] += int(np.count_nonzero(chunk[column] > threshold))
+        if self.scored:
+            scores = chunk[AFFINITY_COLUMN] - self.toxicity_weight * chunk[TOXICITY_COLUMN]
+            self.top.update(scores, ids_for, {AFFINITY_COLUMN: chunk[AFFINITY_COLUMN],
+                                              TOXICITY_COLUMN: chunk[TOXICITY_COLUMN]})
+
+    def merge(self, other: "DataAnalysis"):
+        self.rows += other.rows
+        for column, stats in self.stats.items():
+            stats.merge(other.stats[column])
+        for pair, moment in self.pairs.items():
+            moment.merge(other.pairs[pair])
+        for column in self.above:
+            self.above[column] += other.above[column]
+        self.top.merge(other.top)
+
+    def summary(self) -> str:
+        lines = ["Data Analysis Summary:"]
+        if AFFINITY_COLUMN in self.above:
+            lines.append(f"- {self.above[AFFINITY_COLUMN]} out of {self.rows} tested molecules show high "
+                         f"binding affinity (>{self.thresholds[AFFINITY_COLUMN]}).")
+        for column, count in self.above.items():
+            if column != AFFINITY_COLUMN:
+                lines.append(f"- {count} out of {self.rows} rows have {column} > {self.thresholds[column]}.")
+        if not self.above:
+            lines.append(f"- {self.rows} rows analyzed.")
+        for column, stats in self.stats.items():
+            if stats.count:
+                lines.append(f"- {column}: mean {stats.mean:.4g}, variance {stats.variance:.4g} "
+                             f"(std {stats.std:.4g}, min {stats.min:.4g}, max {stats.max:.4g}, n={stats.count}).")
+        for (a, b), moment in self.pairs.items():
+            if moment.count > 2:
+                r = moment.correlation
+                strength = "strong" if abs(r) >= 0.7 else "moderate" if abs(r) >= 0.3 else "weak"
+                direction = "positive" if r > 0 else "negative"
+                lines.append(f"- A {strength} {direction} correlation (r={r:.3f}) was found between {a} and {b}.")
+        best = self.top.best()
+        if best:
+            score, molecule, values = best[0]
+            lines.append(f"- Molecule '{molecule}' shows the most promise with high affinity and low toxicity "
+                         f"(affinity {values[AFFINITY_COLUMN]:.4g}, toxicity {values[TOXICITY_COLUMN]:.4g}).")
+            ranked = ", ".join(f"'{m}' ({s:.4g})" for s, m, _ in best)
+            lines.append(f"- Top {len(best)} by affinity - toxicity: {ranked}.")
+        return "\n".join(lines)
+
+
+def sniff_columns(header: list[str], sample: list[list[str]]):
+    """Returns (numeric column names, id column name or None) from a header and sample rows."""
+
+    def numeric(i):
+        seen = False
+        for row in sample:
+            if i >= len(row) or not row[i].strip():
+                continue
+            try:
+                float(row[i])
+                seen = True
+            except ValueError:
+                return False
+        return seen
+
+    numeric_columns = [name for i, name in enumerate(header) if numeric(i)]
+    id_column = ID_COLUMN if ID_COLUMN in header else next(
+        (name for name in header if name not in numeric_columns), None)
+    return numeric_columns, id_column
+
+
+def _sniff_columns(path: str):
+    """Returns (header, numeric column names, id column name or None) from the first rows."""
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        sample = list(itertools.islice(reader, 100))
+    return (header, *sniff_columns(header, sample))
+
+
+def _to_float(values) -> np.ndarray:
+    out = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            out[i] = float(value)
+        except ValueError:
+            out[i] = np.nan
+    return out
+
+
+def _iter_chunks_pandas(path, header, numeric_columns, id_column, chunk_rows):
+    usecols = numeric_columns + ([id_column] if id_column else [])
+    for frame in pd.read_csv(path, usecols=usecols, chunksize=chunk_rows, skipinitialspace=True):
+        chunk = {c: pd.to_numeric(frame[c], errors="coerce").to_numpy(np.float64) for c in numeric_columns}
+        ids = frame[id_column].to_numpy() if id_column else None
+        yield chunk, (lambda idx, ids=ids: ids[idx] if ids is not None else [f"row-{i}" for i in idx])
+
+
+def parse_lines(lines: list[str], header: list[str], numeric_columns: list[str], id_column, first_row: int = 0):
+    """
+    Parses CSV data lines (no header) into ({column: float array}, ids_for),
+    where `ids_for(indices)` looks up the id column of just those rows.
+    """
+    lines = [line for line in lines if line.strip()]  # loadtxt skips blank lines; keep ids aligned.
+    numeric_idx = [header.index(c) for c in numeric_columns]
+    id_idx = header.index(id_column) if id_column else None
+    try:
+        # C parser; fine as long as the numeric columns hold plain numbers.
+        data = np.loadtxt(lines, delimiter=",", usecols=numeric_idx, dtype=np.float64, ndmin=2, quotechar='"')
+    except ValueError:
+        rows = list(csv.reader(lines))
+        data = np.column_stack([_to_float([row[i] if i < len(row) else "" for row in rows])
+                                for i in numeric_idx])
+    chunk = {c: data[:, j] for j, c in enumerate(numeric_columns)}
+
+    def ids_for(idx):
+        if id_idx is None:
+            return [f"row-{first_row + i}" for i in idx]
+        return [next(csv.reader(io.StringIO(lines[i])))[id_idx] for i in idx]
+
+    return chunk, ids_for
+
+
+def _iter_chunks_numpy(path, header, numeric_columns, id_column, chunk_rows):
+    first_row = 0
+    with open(path, newline="") as f:
+        next(f)
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                break
+            yield parse_lines(lines, header, numeric_columns, id_column, first_row)
+            first_row += len(lines)
+
+
+def analyze_csv(path: str, chunk_rows: int = 500_000, thresholds: dict = None, top_k: int = 5,
+                toxicity_weight: float = 1.0) -> DataAnalysis:
+    """
+    Streams a results CSV in chunks of `chunk_rows` rows, using pandas when
+    installed and csv + NumPy otherwise. Non-numeric values count as missing.
+    """
+    header, numeric_columns, id_column = _sniff_columns(path)
+    analysis = DataAnalysis(numeric_columns, thresholds, top_k, toxicity_weight)
+    reader = _iter_chunks_pandas if pd is not None else _iter_chunks_numpy
+    for chunk, ids_for in reader(path, header, numeric_columns, id_column, chunk_rows):
+        analysis.update(chunk, ids_for)
+    return analysis
+
+
+def analyze_columnar(path: str, chunk_rows: int = 1_000_000, thresholds: dict = None, top_k: int = 5,
+                     toxicity_weight: float = 1.0) -> DataAnalysis:
+    """Same analysis over a tools.columnar results directory, reading the memory-mapped columns directly."""
+    from tools.columnar import open_columnar
+
+    table = open_columnar(path)
+    numeric_columns = [c for c, dtype in table.dtypes.items() if dtype.kind in "iuf"]
+    id_column = ID_COLUMN if ID_COLUMN in table.dtypes else next(
+        (c for c, dtype in table.dtypes.items() if dtype.kind == "S"), None)
+    analysis = DataAnalysis(numeric_columns, thresholds, top_k, toxicity_weight)
+    for start, views in table.iter_chunks(chunk_rows, numeric_columns):
+        chunk = {c: np.asarray(views[c], dtype=np.float64) for c in numeric_columns}
+
+        def ids_for(idx, start=start):
+            if id_column is None:
+                return [f"row-{start + i}" for i in idx]
+            return [v.decode("utf-8", errors="replace") for v in table[id_column][start + np.asarray(idx)]]
+
+        analysis.update(chunk, ids_for)
+    return analysis
+
+
+def analyze_path(path: str, **kwargs) -> DataAnalysis:
+    """Analyzes either a results CSV or a columnar results directory."""
+    from tools.columnar import is_columnar
+
+    if is_columnar(path):
+        return analyze_columnar(path, **kwargs)
+    return analyze_csv(path, **kwargs)
@@ -0,0 +1,161 @@
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Deterministic, offline text embedder based on the hashing trick.
+
+    Word unigrams, word bigrams and character trigrams are hashed (crc32, so
+    vectors are stable across processes and runs) into `dim` signed buckets,
+    weighted with sublinear term frequency and L2-normalised. Texts that share
+    vocabulary or word fragments ("toxic" / "toxicity") end up close in cosine
+    distance without any model download or network access.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str):
+        words = _WORD_RE.findall(text.lower())
+        for word in words:
+            yield "w:" + word
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i:i + 3]
+        for first, second in zip(words, words[1:]):
+            yield f"b:{first} {second}"
+
+    def embed(self, text: str) -> np.ndarray:
+        counts = {}
+        for feature in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            bucket = h % self.dim
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            counts[bucket] = counts.get(bucket, 0.0) + sign
+        vec = np.zeros(self.dim, dtype=np.float32)
+        if counts:
+            buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            vec[buckets] = np.sign(values) * np.log1p(np.abs(values))
+            norm = np.linalg.norm(vec)
+            if norm > 0:
+                vec /= norm
+        return vec
+
+    def embed_many(self, texts) -> np.ndarray:
+        return np.stack([self.embed(text) for text in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+
+class EmbeddingIndex:
+    """
+    Contiguous float32 matrix of entry embeddings stored next to the KB.
+
+    Row i holds the vector of KB entry i. The matrix file is append-only and is
+    opened with np.memmap, so a multi-GB matrix is paged in by the OS on demand
+    instead of being loaded into RAM. Queries score it in fixed-size row blocks
+    and keep the best candidates with argpartition.
+    """
+
+    def __init__(self, path: str, dim: int = 512, block_rows: int = 65536):
+        self.path = path
+        self.meta_path = path + ".json"
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                dim = json.load(f)["dim"]
+        else:
+            self._write_meta(dim, 0)
+        self.embedder = HashingEmbedder(dim)
+        self.dim = dim
+        self.block_rows = block_rows
+        self._row_bytes = dim * 4
+        self._lock = threading.Lock()
+        self._matrix = None
+
+    def _write_meta(self, dim: int, generation: int):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": dim, "dtype": "float32", "generation": generation}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def ensure_generation(self, generation: int):
+        """
+        Discards all rows if they were computed for another KB generation
+        (compaction renumbers entries, so row i no longer matches entry i).
+        """
+        with open(self.meta_path) as f:
+            if json.load(f).get("generation", 0) == generation:
+                return
+        with self._lock:
+            with open(self.path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                with open(self.meta_path) as meta:
+                    if json.load(meta).get("generation", 0) == generation:
+                        return
+                f.truncate(0)
+                self._matrix = None
+                self._write_meta(self.dim, generation)
+
+    def __len__(self) -> int:
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return size // self._row_bytes
+
+    def _map(self):
+        rows = len(self)
+        if rows == 0:
+            return None
+        if self._matrix is None or self._matrix.shape[0] != rows:
+            self._matrix = np.memmap(self.path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._matrix
+
+    def append_from(self, first_row: int, texts: list[str]) -> int:
+        """
+        Appends vectors for rows first_row.. unless another process already did.
+        Returns the number of rows written.
+        """
+        with self._lock:
+            with open(self.path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                # Re-check under the lock: a concurrent process may have caught up.
+                rows = os.fstat(f.fileno()).st_size // self._row_bytes
+                skip = rows - first_row
+                if skip >= len(texts):
+                    return 0
+                f.truncate(rows * self._row_bytes)  # Drop any torn trailing row.
+                f.write(self.embedder.embed_many(texts[max(skip, 0):]).tobytes())
+                return len(texts) - max(skip, 0)
+
+    def search(self, query: str, top_k: int = 3) -> list[tuple[int, float]]:
+        """Returns up to top_k (row, cosine_similarity) pairs, best first."""
+        with self._lock:
+            matrix = self._map()
+        if matrix is None or top_k <= 0:
+            return []
+        q = self.embedder.embed(query)
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, matrix.shape[0], self.block_rows):
+            scores = matrix[start:start + self.block_rows] @ q
+            k = min(top_k, scores.shape[0])
+            top = np.argpartition(-scores, k - 1)[:k]
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if best_scores.shape[0] > top_k:
+                keep = np.argpartition(-best_scores, top_k - 1)[:top_k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        order = np.argsort(-best_scores)
+        return [(int(best_rows[i]), float(best_scores[i])) for i in order if best_scores[i] > 0]
@@ -0,0 +1,357 @@
+import bisect
+import contextlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+FSYNC_POLICIES = ("none", "batch", "entry")
+
+# One sidecar index record per entry: byte offset and length in the segment data file.
+_IDX = struct.Struct("<QQ")
+
+
+def dedup_key(entry: dict):
+    """
+    Compaction key: entries about the same hypothesis supersede each other
+    (the newest conclusion wins); anything else only collapses exact duplicates.
+    """
+    hypothesis = entry.get("hypothesis") if isinstance(entry, dict) else None
+    if isinstance(hypothesis, str) and hypothesis.strip():
+        return ("hypothesis", " ".join(hypothesis.lower().split()))
+    return ("entry", json.dumps(entry, sort_keys=True))
+
+
+class Segment:
+    """A JSONL data file plus its fixed-width offset index, both read through mmap."""
+
+    def __init__(self, directory: str, name: str):
+        self.name = name
+        self.data_path = os.path.join(directory, name + ".jsonl")
+        self.idx_path = os.path.join(directory, name + ".idx")
+        self._data = None
+        self._idx = None
+
+    def count(self) -> int:
+        try:
+            return os.path.getsize(self.idx_path) // _IDX.size
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _remap(current, path: str, needed: int):
+        if current is not None and len(current) >= needed:
+            return current
+        if current is not None:
+            current.close()
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, i: int) -> bytes:
+        self._idx = self._remap(self._idx, self.idx_path, (i + 1) * _IDX.size)
+        offset, length = _IDX.unpack_from(self._idx, i * _IDX.size)
+        self._data = self._remap(self._data, self.data_path, offset + length)
+        return self._data[offset:offset + length]
+
+    def close(self):
+        for m in (self._data, self._idx):
+            if m is not None:
+                m.close()
+        self._data = self._idx = None
+
+    def remove(self):
+        self.close()
+        for path in (self.data_path, self.idx_path):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+
+class SegmentStore:
+    """
+    Segmented, append-only storage for knowledge base entries.
+
+    Entries are appended to the active segment; once it grows past
+    `segment_bytes` it is sealed (immutable) and a new active segment starts.
+    Entry ids are global positions across segments, and each segment's sidecar
+    offset index makes reading any id O(1) through mmap. MANIFEST.json lists
+    the segments in order and a `generation` that changes whenever compaction
+    renumbers entries, so derived indexes know to rebuild.
+
+    Writers serialise on an flock over the LOCK file, so several processes can
+    share one store.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.manifest_path = os.path.join(directory, "MANIFEST.json")
+        self._lock_path = os.path.join(directory, "LOCK")
+        self._thread_lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._manifest_stat = None
+        self._segments = {}
+        self._compactor = None
+        self._compactor_stop = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        with self._locked():
+            if not os.path.exists(self.manifest_path):
+                self._write_manifest({"generation": 0, "next_segment": 2, "sealed": [], "active": "seg-000001"})
+            self._refresh()
+
+    # --- Manifest handling ---
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            with open(self._lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                yield
+
+    def _write_manifest(self, manifest: dict):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _refresh(self):
+        """Reloads the manifest if another writer (or compaction) replaced it."""
+        stat = os.stat(self.manifest_path)
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self._manifest_stat:
+            return
+        with open(self.manifest_path) as f:
+            self.manifest = json.load(f)
+        self._manifest_stat = key
+        names = [s["name"] for s in self.manifest["sealed"]] + [self.manifest["active"]]
+        self._segments = {name: self._segments.get(name) or Segment(self.directory, name) for name in names}
+        self._bases = []
+        base = 0
+        for sealed in self.manifest["sealed"]:
+            self._bases.append(base)
+            base += sealed["count"]
+        self._bases.append(base)  # Base id of the active segment.
+
+    @property
+    def generation(self) -> int:
+        with self._thread_lock:
+            self._refresh()
+            return self.manifest["generation"]
+
+    def _active(self) -> Segment:
+        return self._segments[self.manifest["active"]]
+
+    def __len__(self) -> int:
+        with self._thread_lock:
+            self._refresh()
+            return self._bases[-1] + self._active().count()
+
+    def sealed_count(self) -> int:
+        with self._thread_lock:
+            self._refresh()
+            return len(self.manifest["sealed"])
+
+    # --- Writes ---
+
+    def append(self, lines: list[str], fsync: str = "batch"):
+        """Appends serialised entries (one JSON document per line, newline-terminated)."""
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy: '{fsync}'. Must be one of {FSYNC_POLICIES}.")
+        if not lines:
+            return
+        with self._locked():
+            self._refresh()
+            segment = self._active()
+            data_fd = os.open(segment.data_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            idx_fd = os.open(segment.idx_path, os.O_WRONLY | os.O_CREAT, 0o644)
+            try:
+                # Drop a torn index record left by a crashed writer.
+                idx_size = os.fstat(idx_fd).st_size
+                if idx_size % _IDX.size:
+                    os.ftruncate(idx_fd, idx_size - idx_size % _IDX.size)
+                os.lseek(idx_fd, 0, os.SEEK_END)
+                offset = os.fstat(data_fd).st_size
+                payloads = [line.encode("utf-8") for line in lines]
+                records = []
+                for payload in payloads:
+                    records.append(_IDX.pack(offset, len(payload)))
+                    offset += len(payload)
+                # Data is always written before its index record, so a reader
+                # never sees an id whose bytes are not on disk yet.
+                if fsync == "entry":
+                    for payload, record in zip(payloads, records):
+                        _write_all(data_fd, payload)
+                        os.fsync(data_fd)
+                        _write_all(idx_fd, record)
+                        os.fsync(idx_fd)
+                else:
+                    _write_all(data_fd, b"".join(payloads))
+                    if fsync == "batch":
+                        os.fsync(data_fd)
+                    _write_all(idx_fd, b"".join(records))
+                    if fsync == "batch":
+                        os.fsync(idx_fd)
+            finally:
+                os.close(data_fd)
+                os.close(idx_fd)
+            if offset >= self.segment_bytes:
+                self._seal_active()
+
+    def _seal_active(self):
+        manifest = dict(self.manifest)
+        manifest["sealed"] = manifest["sealed"] + [{"name": manifest["active"], "count": self._active().count()}]
+        manifest["active"] = f"seg-{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+        self._write_manifest(manifest)
+        self._refresh()
+
+    # --- Reads ---
+
+    def read(self, entry_id: int) -> dict:
+        with self._thread_lock:
+            self._refresh()
+            if entry_id < 0 or entry_id >= len(self):
+                raise KeyError(entry_id)
+            pos = bisect.bisect_right(self._bases, entry_id) - 1
+            names = [s["name"] for s in self.manifest["sealed"]] + [self.manifest["active"]]
+            return json.loads(self._segments[names[pos]].read(entry_id - self._bases[pos]))
+
+    def iter_entries(self, start: int = 0, stop: int = None):
+        """Yields (entry_id, entry) for ids in [start, stop)."""
+        stop = len(self) if stop is None else stop
+        for entry_id in range(start, stop):
+            yield entry_id, self.read(entry_id)
+
+    # --- Compaction ---
+
+    def compact(self, key=dedup_key) -> dict:
+        """
+        Merges all sealed segments into one, dropping entries whose key reappears
+        later (duplicates and superseded entries). The active segment keeps
+        accepting appends meanwhile; its entries count as "later" when deciding
+        what is superseded. Bumps the generation if anything was rewritten.
+        """
+        with self._compact_lock:
+            with self._locked():
+                self._refresh()
+                sealed = list(self.manifest["sealed"])
+                generation = self.manifest["generation"]
+                if not sealed:
+                    return {"merged_segments": 0, "dropped": 0}
+                active = self._active()
+                active_count = active.count()
+                manifest = dict(self.manifest)
+                target_name = f"seg-{manifest['next_segment']:06d}"
+                manifest["next_segment"] += 1
+                self._write_manifest(manifest)
+                self._refresh()
+
+            def read_raw(segment, i):
+                # Readers may remap segments concurrently; take the lock per entry only.
+                with self._thread_lock:
+                    return segment.read(i)
+
+            # Newest-first pass: the first time a key is seen is its latest version.
+            seen = {key(json.loads(read_raw(active, i))) for i in range(active_count)}
+            keep = []
+            for pos in range(len(sealed) - 1, -1, -1):
+                segment = self._segments[sealed[pos]["name"]]
+                for i in range(sealed[pos]["count"] - 1, -1, -1):
+                    entry_key = key(json.loads(read_raw(segment, i)))
+                    if entry_key not in seen:
+                        seen.add(entry_key)
+                        keep.append((pos, i))
+            keep.reverse()
+
+            target = Segment(self.directory, target_name)
+            with open(target.data_path, "wb") as data_file, open(target.idx_path, "wb") as idx_file:
+                offset = 0
+                for pos, i in keep:
+                    payload = read_raw(self._segments[sealed[pos]["name"]], i)
+                    data_file.write(payload)
+                    idx_file.write(_IDX.pack(offset, len(payload)))
+                    offset += len(payload)
+                for f in (data_file, idx_file):
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            with self._locked():
+                self._refresh()
+                if self.manifest["generation"] != generation or self.manifest["sealed"][:len(sealed)] != sealed:
+                    target.remove()  # Someone else compacted first.
+                    return {"merged_segments": 0, "dropped": 0}
+                manifest = dict(self.manifest)
+                manifest["sealed"] = [{"name": target_name, "count": len(keep)}] + manifest["sealed"][len(sealed):]
+                manifest["generation"] = generation + 1
+                self._write_manifest(manifest)
+                old = [self._segments[s["name"]] for s in sealed]
+                self._refresh()
+            for segment in old:
+                # Open mmaps in other readers stay valid after unlink on POSIX.
+                segment.remove()
+            dropped = sum(s["count"] for s in sealed) - len(keep)
+            return {"merged_segments": len(sealed), "dropped": dropped}
+
+    def start_compactor(self, interval: float = 300.0, min_sealed: int = 4):
+        """Starts a daemon thread that compacts once `min_sealed` sealed segments pile up."""
+        if self._compactor is not None:
+            return
+
+        def loop():
+            while not self._compactor_stop.wait(interval):
+                if self.sealed_count() >= min_sealed:
+                    try:
+                        self.compact()
+                    except Exception as e:
+                        print(f" KB COMPACTION ERROR: {e}")
+
+        self._compactor = threading.Thread(target=loop, name="kb-compactor", daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor_stop.set()
+            self._compactor.join()
+            self._compactor = None
+        with self._thread_lock:
+            for segment in self._segments.values():
+                segment.close()
+
+
+def migrate_jsonl(jsonl_path: str, store: SegmentStore, batch: int = 10000) -> int:
+    """
+    Copies every well-formed line of a legacy JSONL knowledge base into the
+    store, then renames the old file to `<path>.migrated`. Returns the count.
+    """
+    migrated = 0
+    lines = []
+    with open(jsonl_path) as f:
+        for line in f:
+            try:
+                json.loads(line)
+            except ValueError:
+                continue
+            lines.append(line if line.endswith("\n") else line + "\n")
+            if len(lines) >= batch:
+                store.append(lines, fsync="none")
+                migrated += len(lines)
+                lines = []
+    store.append(lines, fsync="batch")
+    migrated += len(lines)
+    os.replace(jsonl_path, jsonl_path + ".migrated")
+    return migrated
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
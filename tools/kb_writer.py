@@ -0,0 +1,116 @@
+import atexit
+import json
+import threading
+import time
+
+from tools.kb_segments import FSYNC_POLICIES, SegmentStore
+
+
+class KnowledgeBaseWriter:
+    """
+    Group-commit writer for the knowledge base segment store.
+
+    Entries are queued in memory and written as a single append once
+    `max_batch` entries are pending or `max_delay` seconds have passed since
+    the oldest pending entry. The store holds an exclusive flock for every
+    append, so several processes can write to one KB without interleaving.
+
+    fsync policy:
+      - "none":  leave durability to the OS page cache.
+      - "batch": fsync once after each group write (default).
+      - "entry": write and fsync entries one at a time (slowest, strictest).
+
+    A failed background write keeps its entries queued for the next flush and
+    is raised by the next append()/extend() call, unless a later flush has
+    written them by then; flush() raises its own failures directly.
+    """
+
+    def __init__(self, store: SegmentStore, max_batch: int = 64, max_delay: float = 0.5, fsync: str = "batch"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy: '{fsync}'. Must be one of {FSYNC_POLICIES}.")
+        self.store = store
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self._pending = []
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()  # Keeps flushes ordered within this process.
+        self._closed = False
+        self._error = None  # A background write failure not yet reported to a caller.
+        self._flusher = threading.Thread(target=self._flush_loop, name="kb-writer", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def append(self, entry: dict):
+        """Queues an entry; it is written at the next size- or time-triggered flush."""
+        self.extend([entry])
+
+    def extend(self, entries):
+        lines = [json.dumps(entry) + "\n" for entry in entries]
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("KnowledgeBaseWriter is closed.")
+            error, self._error = self._error, None
+            if error is not None:
+                raise RuntimeError(f"A deferred knowledge base write failed: {error}") from error
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.extend(lines)
+            full = len(self._pending) >= self.max_batch
+            self._cond.notify()
+        if full:
+            self.flush()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Writes all queued entries now. Returns the number of entries written."""
+        with self._write_lock:
+            with self._cond:
+                lines, self._pending, self._oldest = self._pending, [], None
+            if lines:
+                try:
+                    self._write(lines)
+                except BaseException:
+                    with self._cond:
+                        # Keep them, ahead of anything queued since, for the next flush.
+                        self._pending[:0] = lines
+                        self._oldest = time.monotonic()
+                    raise
+                with self._cond:
+                    self._error = None
+            return len(lines)
+
+    def _write(self, lines: list[str]):
+        self.store.append(lines, fsync=self.fsync)
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._pending:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                remaining = self._oldest + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+            try:
+                self.flush()
+            except Exception as e:
+                with self._cond:
+                    self._error = e
+
+    def close(self):
+        """Flushes anything still queued and stops the background flusher."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._flusher.join()
+        self.flush()
+
@@ -0,0 +1,268 @@
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+from tools.kb_segments import SegmentStore, migrate_jsonl
+from tools.kb_writer import KnowledgeBaseWriter
+
+try:
+    from tools.kb_embeddings import EmbeddingIndex
+except ImportError:  # NumPy not installed: keyword search only.
+    EmbeddingIndex = None
+
+# Very common words carry no ranking signal but have huge posting lists.
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it of on or that the this to was were with".split()
+)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cases and splits text into alphanumeric tokens, dropping stopwords."""
+    return [tok for tok in _TOKEN_RE.findall(text.lower()) if tok not in _STOPWORDS]
+
+
+def _iter_text(value):
+    """Yields every scalar value of a (possibly nested) KB entry as text."""
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _iter_text(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _iter_text(item)
+    elif value is not None:
+        yield str(value)
+
+
+def entry_tokens(entry: dict) -> list[str]:
+    return tokenize(" ".join(_iter_text(entry)))
+
+
+class KnowledgeBase:
+    """
+    Segmented knowledge base with a persistent inverted index.
+
+    Entries live in a SegmentStore (`<path>.segments/`), which gives O(1)
+    reads by entry id and supports compaction. A sidecar SQLite database holds
+    the token postings and remembers how many entries (and which store
+    generation) it has indexed. On open (and before every query) the index
+    catches up with whatever was appended since; after a compaction renumbers
+    entries it is rebuilt. A legacy `<path>` JSONL file is migrated into the
+    store the first time it is opened.
+
+    New entries go through a group-commit KnowledgeBaseWriter; queries flush it
+    first, so a process always reads its own writes.
+
+    When NumPy is available, every entry also gets a hashed n-gram embedding in
+    a memory-mapped matrix (`<path>.vectors.f32`) for offline semantic search.
+    """
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path: str = "mock_knowledge_base.jsonl", index_path: str = None,
+                 k1: float = 1.5, b: float = 0.75, max_batch: int = 64,
+                 max_delay: float = 0.5, fsync: str = "batch", embeddings: bool = True,
+                 segment_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.index_path = index_path or path + ".index.sqlite"
+        self.k1 = k1
+        self.b = b
+        segments_dir = path + ".segments"
+        needs_migration = os.path.exists(path) and not os.path.exists(segments_dir)
+        self.store = SegmentStore(segments_dir, segment_bytes=segment_bytes)
+        if needs_migration:
+            migrated = migrate_jsonl(path, self.store)
+            print(f" KB: Migrated {migrated} entries from '{path}' into '{segments_dir}'.")
+            # Vectors built from the JSONL line order may not match the migrated ids.
+            for sidecar in (path + ".vectors.f32", path + ".vectors.f32.json"):
+                if os.path.exists(sidecar):
+                    os.remove(sidecar)
+        self.writer = KnowledgeBaseWriter(self.store, max_batch=max_batch, max_delay=max_delay, fsync=fsync)
+        self.embeddings = None
+        if embeddings and EmbeddingIndex is not None:
+            self.embeddings = EmbeddingIndex(path + ".vectors.f32")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, doc_id INTEGER NOT NULL, tf INTEGER NOT NULL,
+                doc_len INTEGER NOT NULL, PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            """
+        )
+        self.sync()
+
+    # --- Index maintenance ---
+
+    def _meta(self, key: str) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_meta(self, key: str, value: int):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _index_current(self, doc_count: int, generation: int) -> bool:
+        return (self._meta("schema_version") == self.SCHEMA_VERSION
+                and self._meta("generation") == generation
+                and self._meta("doc_count") == doc_count)
+
+    def sync(self) -> int:
+        """
+        Indexes any entries appended to the store since the last sync.
+        Returns the number of newly indexed entries.
+        """
+        self.writer.flush()
+        doc_count, generation = len(self.store), self.store.generation
+        with self._lock:
+            if not self._index_current(doc_count, generation):
+                # BEGIN IMMEDIATE serialises concurrent catch-ups from several processes.
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    added = 0
+                    if not self._index_current(doc_count, generation):
+                        if (self._meta("schema_version") != self.SCHEMA_VERSION
+                                or self._meta("generation") != generation):
+                            # Compaction renumbered entries (or the index predates
+                            # segments); start over.
+                            self._conn.execute("DROP TABLE IF EXISTS docs")
+                            self._conn.execute("DELETE FROM postings")
+                            self._conn.execute("DELETE FROM meta")
+                            self._set_meta("schema_version", self.SCHEMA_VERSION)
+                            self._set_meta("generation", generation)
+                        added = self._index_until(doc_count)
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            else:
+                added = 0
+            self._sync_embeddings(generation)
+            return added
+
+    def _index_until(self, stop: int) -> int:
+        start = self._meta("doc_count")
+        total_tokens = self._meta("total_tokens")
+        posting_rows = []
+        for doc_id, entry in self.store.iter_entries(start, stop):
+            tokens = entry_tokens(entry) if isinstance(entry, dict) else []
+            posting_rows.extend(
+                (term, doc_id, tf, len(tokens)) for term, tf in Counter(tokens).items()
+            )
+            total_tokens += len(tokens)
+        self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", posting_rows)
+        self._set_meta("doc_count", stop)
+        self._set_meta("total_tokens", total_tokens)
+        return stop - start
+
+    def _sync_embeddings(self, generation: int, batch: int = 4096):
+        """Appends embeddings for indexed entries that do not have a vector row yet."""
+        if self.embeddings is None:
+            return
+        self.embeddings.ensure_generation(generation)
+        doc_count = self._meta("doc_count")
+        rows = len(self.embeddings)
+        while rows < doc_count:
+            stop = min(rows + batch, doc_count)
+            texts = [" ".join(_iter_text(entry)) for _, entry in self.store.iter_entries(rows, stop)]
+            self.embeddings.append_from(rows, texts)
+            rows = stop
+
+    def compact(self) -> dict:
+        """Compacts the segment store (dropping duplicate/superseded entries) and reindexes."""
+        self.writer.flush()
+        stats = self.store.compact()
+        self.sync()
+        return stats
+
+    # --- Public API ---
+
+    def add(self, entry: dict):
+        """
+        Queues an entry for the next group commit; it is indexed on the next
+        sync. Raises if an earlier deferred write failed (see KnowledgeBaseWriter).
+        """
+        self.writer.append(entry)
+
+    def add_many(self, entries: list[dict]):
+        self.writer.extend(entries)
+
+    def __len__(self) -> int:
+        self.writer.flush()
+        return len(self.store)
+
+    def get(self, doc_id: int) -> dict:
+        return self.store.read(doc_id)
+
+    def search(self, query: str, top_k: int = 3) -> list[tuple[int, float]]:
+        """Returns up to top_k (doc_id, bm25_score) pairs, best first."""
+        self.sync()
+        terms = set(tokenize(query))
+        scores = Counter()
+        with self._lock:
+            n_docs = self._meta("doc_count")
+            if not terms or n_docs == 0:
+                return []
+            avg_len = self._meta("total_tokens") / n_docs or 1.0
+            for term in terms:
+                postings = self._conn.execute(
+                    "SELECT doc_id, tf, doc_len FROM postings WHERE term = ?", (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf, doc_len in postings:
+                    norm = self.k1 * (1 - self.b + self.b * doc_len / avg_len)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def semantic_search(self, query: str, top_k: int = 3) -> list[tuple[int, float]]:
+        """Returns up to top_k (doc_id, cosine_similarity) pairs, best first."""
+        if self.embeddings is None:
+            raise RuntimeError("Semantic search requires NumPy.")
+        self.sync()
+        return self.embeddings.search(query, top_k)
+
+    def query(self, query: str, top_k: int = 3, mode: str = "keyword") -> list[dict]:
+        """
+        Returns up to top_k entries, ranked by BM25 relevance (mode="keyword")
+        or by embedding cosine similarity (mode="semantic").
+        """
+        if mode == "keyword":
+            hits = self.search(query, top_k)
+        elif mode == "semantic":
+            hits = self.semantic_search(query, top_k)
+        else:
+            raise ValueError(f"Unsupported query mode: '{mode}'. Must be 'keyword' or 'semantic'.")
+        return [self.get(doc_id) for doc_id, _ in hits]
+
+    def close(self):
+        self.writer.close()
+        self.store.close()
+        with self._lock:
+            self._conn.close()
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_knowledge_base(path: str = None) -> KnowledgeBase:
+    """
+    Returns the process-wide KnowledgeBase for a path (default: KNOWLEDGE_BASE_PATH).
+    The writer's fsync policy is taken from KNOWLEDGE_BASE_FSYNC (none / batch / entry).
+    """
+    path = path or os.environ.get("KNOWLEDGE_BASE_PATH", "mock_knowledge_base.jsonl")
+    with _instances_lock:
+        if path not in _instances:
+            kb = KnowledgeBase(path, fsync=os.environ.get("KNOWLEDGE_BASE_FSYNC", "batch"))
+            kb.store.start_compactor()
+            _instances[path] = kb
+        return _instances[path]
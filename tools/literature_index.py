@@ -0,0 +1,382 @@
+# Offline BM25 index over an arXiv metadata dump (JSON lines with at least
+# `title` and `abstract`; `id`, `versions`/`update_date` or `year` are used
+# when present).
+#
+# Build (one streaming pass, split across processes by byte range):
+#   python -m tools.literature_index build arxiv-metadata.json arxiv_index --workers 8
+# Search:
+#   python -m tools.literature_index search arxiv_index "graph neural networks molecules" --year-from 2020
+
+import argparse
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from tools.knowledge_base import tokenize
+
+INDEX_VERSION = 1
+_YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")
+
+
+def term_hash(term: str) -> int:
+    """Stable 64-bit hash of a token (shards store hashes, not strings)."""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def record_year(record: dict) -> int:
+    """Publication year of an arXiv metadata record, 0 if unknown."""
+    if record.get("year"):
+        try:
+            return int(record["year"])
+        except (TypeError, ValueError):
+            pass
+    versions = record.get("versions") or []
+    if versions and isinstance(versions[0], dict):
+        match = _YEAR_RE.search(versions[0].get("created", ""))
+        if match:
+            return int(match.group(0))
+    match = _YEAR_RE.search(str(record.get("update_date") or ""))
+    return int(match.group(0)) if match else 0
+
+
+def _clean(text) -> str:
+    return " ".join(str(text or "").split())
+
+
+class _ShardBuilder:
+    """Accumulates documents in compact arrays and writes them as one shard directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.terms = array("Q")
+        self.docs = array("I")
+        self.tfs = array("H")
+        self.doc_lengths = array("I")
+        self.years = array("H")
+        self.titles = []
+        self.hash_cache = {}
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, record: dict):
+        title = _clean(record.get("title"))
+        counts = Counter(tokenize(f"{title} {record.get('abstract') or ''}"))
+        doc = len(self.doc_lengths)
+        cache = self.hash_cache
+        for term, tf in counts.items():
+            h = cache.get(term)
+            if h is None:
+                h = cache[term] = term_hash(term)
+            self.terms.append(h)
+            self.docs.append(doc)
+            self.tfs.append(min(tf, 65535))
+        self.doc_lengths.append(sum(counts.values()))
+        self.years.append(record_year(record))
+        self.titles.append(json.dumps([title, record.get("id") or ""]))
+        if len(cache) > 2_000_000:
+            cache.clear()
+
+    def write(self) -> dict:
+        os.makedirs(self.path, exist_ok=True)
+        terms = np.frombuffer(self.terms, dtype=np.uint64)
+        # Documents were added in order, so a stable sort keeps each posting list sorted by doc.
+        order = np.argsort(terms, kind="stable")
+        sorted_terms = terms[order]
+        unique_terms, starts = np.unique(sorted_terms, return_index=True)
+        offsets = np.append(starts, len(sorted_terms)).astype(np.uint64)
+        unique_terms.astype("<u8").tofile(os.path.join(self.path, "terms.u64"))
+        offsets.astype("<u8").tofile(os.path.join(self.path, "offsets.u64"))
+        np.frombuffer(self.docs, dtype=np.uint32)[order].astype("<u4").tofile(os.path.join(self.path, "postings.u32"))
+        np.frombuffer(self.tfs, dtype=np.uint16)[order].astype("<u2").tofile(os.path.join(self.path, "tfs.u16"))
+        np.frombuffer(self.doc_lengths, dtype=np.uint32).astype("<u4").tofile(os.path.join(self.path, "doclen.u32"))
+        np.frombuffer(self.years, dtype=np.uint16).astype("<u2").tofile(os.path.join(self.path, "years.u16"))
+        title_offsets = array("Q", [0])
+        with open(os.path.join(self.path, "titles.jsonl"), "wb") as f:
+            for line in self.titles:
+                data = (line + "\n").encode("utf-8")
+                f.write(data)
+                title_offsets.append(title_offsets[-1] + len(data))
+        np.frombuffer(title_offsets, dtype=np.uint64).astype("<u8").tofile(os.path.join(self.path, "titles.idx"))
+        return {
+            "name": os.path.basename(self.path),
+            "docs": len(self),
+            "terms": int(len(unique_terms)),
+            "total_length": int(np.frombuffer(self.doc_lengths, dtype=np.uint32).sum()),
+        }
+
+
+def _byte_ranges(path: str, parts: int) -> list[tuple[int, int]]:
+    """Splits a file into about `parts` byte ranges that start and end on line boundaries."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, bounds[-1]))
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _build_range(job) -> list[dict]:
+    """Worker: indexes one byte range of the dump into one or more shards."""
+    dump_path, out_dir, part, start, end, shard_docs = job
+    shards = []
+    builder = _ShardBuilder(os.path.join(out_dir, f"shard-{part:04d}-{len(shards):03d}"))
+    with open(dump_path, "rb") as f:
+        f.seek(start)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or not (record.get("title") or record.get("abstract")):
+                continue
+            builder.add(record)
+            if len(builder) >= shard_docs:
+                shards.append(builder.write())
+                builder = _ShardBuilder(os.path.join(out_dir, f"shard-{part:04d}-{len(shards):03d}"))
+    if len(builder):
+        shards.append(builder.write())
+    return shards
+
+
+def build_index(dump_path: str, out_dir: str, workers: int = None, shard_docs: int = 100_000,
+                k1: float = 1.5, b: float = 0.75) -> dict:
+    """
+    Builds the index with `workers` processes and swaps it into `out_dir`
+    atomically (a previous index stays readable until the new one is ready).
+    """
+    workers = workers or os.cpu_count() or 1
+    tmp_dir = f"{out_dir.rstrip(os.sep)}.building-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    ranges = _byte_ranges(dump_path, workers * 4)  # Several ranges per worker evens out skew.
+    jobs = [(dump_path, tmp_dir, part, start, end, shard_docs) for part, (start, end) in enumerate(ranges)]
+    started = time.perf_counter()
+    if workers > 1 and len(jobs) > 1:
+        with multiprocessing.Pool(workers) as pool:
+            shard_lists = pool.map(_build_range, jobs, chunksize=1)
+    else:
+        shard_lists = [_build_range(job) for job in jobs]
+    shards = [shard for shard_list in shard_lists for shard in shard_list]
+    docs = sum(s["docs"] for s in shards)
+    manifest = {
+        "version": INDEX_VERSION,
+        "source": os.path.abspath(dump_path),
+        "docs": docs,
+        "avg_doc_length": sum(s["total_length"] for s in shards) / docs if docs else 0.0,
+        "k1": k1,
+        "b": b,
+        "shards": shards,
+        "build_seconds": round(time.perf_counter() - started, 3),
+    }
+    with open(os.path.join(tmp_dir, "index.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    if os.path.exists(out_dir):
+        old_dir = f"{out_dir.rstrip(os.sep)}.old-{os.getpid()}"
+        os.rename(out_dir, old_dir)
+        os.rename(tmp_dir, out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.rename(tmp_dir, out_dir)
+    return manifest
+
+
+class _Shard:
+    """Memory-mapped view of one shard; nothing is read until first use."""
+
+    def __init__(self, path: str, docs: int):
+        self.path = path
+        self.docs = docs
+        self._arrays = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._arrays is None:
+                def mapped(name, dtype):
+                    file_path = os.path.join(self.path, name)
+                    if os.path.getsize(file_path) == 0:
+                        return np.empty(0, dtype=dtype)
+                    return np.memmap(file_path, dtype=dtype, mode="r")
+                self._arrays = {
+                    "terms": mapped("terms.u64", "<u8"),
+                    "offsets": mapped("offsets.u64", "<u8"),
+                    "postings": mapped("postings.u32", "<u4"),
+                    "tfs": mapped("tfs.u16", "<u2"),
+                    "doclen": mapped("doclen.u32", "<u4"),
+                    "years": mapped("years.u16", "<u2"),
+                    "titles_idx": mapped("titles.idx", "<u8"),
+                }
+        return self._arrays
+
+    def lookup(self, hashes: np.ndarray) -> list:
+        """(docs, tfs) posting slices for each hash (None where the term is absent)."""
+        arrays = self._arrays or self._load()
+        terms = arrays["terms"]
+        positions = np.searchsorted(terms, hashes)
+        result = []
+        for h, pos in zip(hashes, positions):
+            if pos < len(terms) and terms[pos] == h:
+                start, end = int(arrays["offsets"][pos]), int(arrays["offsets"][pos + 1])
+                result.append((arrays["postings"][start:end], arrays["tfs"][start:end]))
+            else:
+                result.append(None)
+        return result
+
+    def title(self, doc: int) -> tuple[str, str]:
+        arrays = self._arrays or self._load()
+        start, end = int(arrays["titles_idx"][doc]), int(arrays["titles_idx"][doc + 1])
+        with open(os.path.join(self.path, "titles.jsonl"), "rb") as f:
+            f.seek(start)
+            title, arxiv_id = json.loads(f.read(end - start))
+        return title, arxiv_id
+
+
+class LiteratureIndex:
+    """
+    Read side of the sharded BM25 index. Shards are opened lazily and read
+    through mmap, so opening the index is cheap and only the posting lists of
+    the query terms are touched. IDF uses global document frequencies summed
+    over all shards, so ranking does not depend on how the index was split.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "index.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported literature index version {manifest.get('version')}")
+        self.docs = manifest["docs"]
+        self.avg_doc_length = manifest["avg_doc_length"] or 1.0
+        self.k1 = manifest["k1"]
+        self.b = manifest["b"]
+        self.shards = [_Shard(os.path.join(path, s["name"]), s["docs"]) for s in manifest["shards"]]
+
+    def __len__(self):
+        return self.docs
+
+    def search(self, query: str, top_k: int = 5, year_from: int = None, year_to: int = None) -> list[dict]:
+        """Top-k papers by BM25 as [{title, year, id, score}], optionally within [year_from, year_to]."""
+        terms = sorted(set(tokenize(query)))
+        if not terms or not self.docs or top_k <= 0:
+            return []
+        hashes = np.array([term_hash(t) for t in terms], dtype=np.uint64)
+        postings = [shard.lookup(hashes) for shard in self.shards]
+        df = np.zeros(len(terms))
+        for shard_postings in postings:
+            for i, hit in enumerate(shard_postings):
+                if hit is not None:
+                    df[i] += len(hit[0])
+        idf = np.log(1 + (self.docs - df + 0.5) / (df + 0.5))
+
+        best = []  # min-heap of (score, shard index, doc)
+        for shard_index, (shard, shard_postings) in enumerate(zip(self.shards, postings)):
+            hits = [(i, hit) for i, hit in enumerate(shard_postings) if hit is not None]
+            if not hits:
+                continue
+            arrays = shard._arrays
+            docs = np.concatenate([np.asarray(hit[0]) for _, hit in hits])
+            tfs = np.concatenate([np.asarray(hit[1], dtype=np.float64) for _, hit in hits])
+            weights = np.concatenate([np.full(len(hit[0]), idf[i]) for i, hit in hits])
+            lengths = arrays["doclen"][docs].astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * lengths / self.avg_doc_length)
+            contributions = weights * tfs * (self.k1 + 1) / (tfs + norm)
+            # Dense per-shard accumulator: O(postings) with no sort.
+            scores = np.bincount(docs, weights=contributions, minlength=shard.docs)
+            if year_from is not None or year_to is not None:
+                years = arrays["years"]
+                if year_from is not None:
+                    scores[years < year_from] = 0.0
+                if year_to is not None:
+                    scores[years > year_to] = 0.0
+            candidates = np.flatnonzero(scores > 0)
+            scores = scores[candidates]
+            if len(candidates) > top_k:
+                top = np.argpartition(scores, -top_k)[-top_k:]
+                candidates, scores = candidates[top], scores[top]
+            for doc, score in zip(candidates.tolist(), scores.tolist()):
+                item = (score, shard_index, doc)
+                if len(best) < top_k:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+
+        results = []
+        for score, shard_index, doc in sorted(best, reverse=True):
+            shard = self.shards[shard_index]
+            title, arxiv_id = shard.title(doc)
+            results.append({"title": title, "year": int(shard._arrays["years"][doc]) or None,
+                            "id": arxiv_id, "score": round(score, 4)})
+        return results
+
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def get_literature_index():
+    """The LiteratureIndex at ARXIV_INDEX_DIR, or None if that is unset or not built."""
+    global _shared_index
+    path = os.environ.get("ARXIV_INDEX_DIR")
+    if not path or not os.path.isfile(os.path.join(path, "index.json")):
+        return None
+    with _shared_index_lock:
+        if _shared_index is None or _shared_index.path != path:
+            _shared_index = LiteratureIndex(path)
+        return _shared_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline arXiv BM25 index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index an arXiv metadata dump (JSON lines).")
+    build.add_argument("dump")
+    build.add_argument("out_dir")
+    build.add_argument("--workers", type=int, default=None)
+    build.add_argument("--shard-docs", type=int, default=100_000)
+    search = sub.add_parser("search", help="Run a query against a built index.")
+    search.add_argument("index_dir")
+    search.add_argument("query")
+    search.add_argument("--top-k", type=int, default=5)
+    search.add_argument("--year-from", type=int)
+    search.add_argument("--year-to", type=int)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        manifest = build_index(args.dump, args.out_dir, args.workers, args.shard_docs)
+        print(f"Indexed {manifest['docs']} papers into {len(manifest['shards'])} shards "
+              f"in {manifest['build_seconds']:.1f}s.")
+    else:
+        index = LiteratureIndex(args.index_dir)
+        start = time.perf_counter()
+        results = index.search(args.query, args.top_k, args.year_from, args.year_to)
+        elapsed = (time.perf_counter() - start) * 1000
+        for r in results:
+            print(f"{r['score']:8.3f}  {r['year'] or '????'}  {r['id']:<16} {r['title']}")
+        print(f"{len(results)} results in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import ast
+import builtins
+import hashlib
+import importlib.machinery
+import importlib.util
+import os
+import symtable
+import sys
+import threading
+from collections import OrderedDict
+
+# Exceptions whose handlers make an import optional (`try: import x / except ImportError`).
+_IMPORT_GUARDS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+_EXIT_CALLS = {"exit", "quit", "sys.exit", "os._exit", "os.abort"}
+_BUILTINS = frozenset(dir(builtins))
+
+# What the sandbox provides besides builtins (see tools.sandbox_pool: the
+# script runs in a fresh namespace, so there is no __file__).
+_SCRIPT_GLOBALS = frozenset({"__name__", "__builtins__"})
+
+
+def _issue(kind: str, message: str, node=None, severity: str = "error", line=None, col=None) -> dict:
+    if node is not None:
+        line, col = getattr(node, "lineno", line), getattr(node, "col_offset", col)
+    return {"kind": kind, "severity": severity, "message": message, "line": line, "col": col}
+
+
+def _dotted(node: ast.AST):
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        base = _dotted(node.value)
+        return f"{base}.{node.attr}" if base else None
+    return None
+
+
+def _parents(tree: ast.AST) -> dict:
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+    return parents
+
+
+def _import_guarded(node: ast.AST, parents: dict) -> bool:
+    """True if `node` sits in the body of a try whose handlers catch import errors."""
+    child, parent = node, parents.get(node)
+    while parent is not None:
+        if isinstance(parent, ast.Try) and child in parent.body:
+            for handler in parent.handlers:
+                if handler.type is None:
+                    return True
+                types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+                if any((_dotted(t) or "").split(".")[-1] in _IMPORT_GUARDS for t in types):
+                    return True
+        child, parent = parent, parents.get(parent)
+    return False
+
+
+def module_exists(name: str) -> bool:
+    """
+    Whether a dotted module name can be imported in this environment. Parent
+    packages that are not imported yet are searched on disk instead of being
+    imported, so checking never runs package code.
+    """
+    if name in sys.modules:
+        return True
+    parent = name.rpartition(".")[0]
+    if not parent or parent in sys.modules:
+        try:
+            return importlib.util.find_spec(name) is not None
+        except (ImportError, ValueError):
+            return False
+    parts = name.split(".")
+    try:
+        spec = importlib.util.find_spec(parts[0])
+    except (ImportError, ValueError):
+        return False
+    for part in parts[1:]:
+        if spec is None or spec.submodule_search_locations is None:
+            return False  # A plain module has no submodules.
+        spec = importlib.machinery.PathFinder.find_spec(part, list(spec.submodule_search_locations))
+    return spec is not None
+
+
+def check_imports(tree: ast.AST) -> list[dict]:
+    issues, parents, seen = [], _parents(tree), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            if name in seen or _import_guarded(node, parents):
+                continue
+            seen.add(name)
+            if not module_exists(name):
+                top = name.split(".")[0]
+                if module_exists(top):
+                    # The package may create the submodule at import time; only warn.
+                    issues.append(_issue("import", f"Module '{name}' not found in package '{top}'.",
+                                         node, severity="warning"))
+                else:
+                    issues.append(_issue("import", f"No module named '{top}' is installed.", node))
+    return issues
+
+
+def _bound_names(table: symtable.SymbolTable) -> set:
+    return {symbol.get_name() for symbol in table.get_symbols()
+            if symbol.is_assigned() or symbol.is_imported() or symbol.is_namespace() or symbol.is_parameter()}
+
+
+def _walk_tables(table: symtable.SymbolTable):
+    yield table
+    for child in table.get_children():
+        yield from _walk_tables(child)
+
+
+def check_names(code: str, tree: ast.AST) -> list[dict]:
+    """Names that are read but never bound in any scope that could provide them, nor builtins."""
+    if any(isinstance(node, ast.ImportFrom) and any(a.name == "*" for a in node.names) for node in ast.walk(tree)):
+        return []  # A star import can define anything.
+    module = symtable.symtable(code, "<experiment>", "exec")
+    defined = _bound_names(module) | _BUILTINS | _SCRIPT_GLOBALS
+    # `global x` in a function followed by an assignment also defines x.
+    for table in _walk_tables(module):
+        if table is not module:
+            defined |= {s.get_name() for s in table.get_symbols() if s.is_declared_global() and s.is_assigned()}
+    undefined = set()
+    for table in _walk_tables(module):
+        for symbol in table.get_symbols():
+            name = symbol.get_name()
+            if not symbol.is_referenced() or name in defined:
+                continue
+            if table is module or symbol.is_global():
+                undefined.add(name)
+    issues, reported = [], set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in undefined \
+                and node.id not in reported:
+            reported.add(node.id)
+            issues.append(_issue("undefined_name", f"Name '{node.id}' is not defined.", node))
+    return sorted(issues, key=lambda issue: (issue["line"], issue["col"]))
+
+
+def _exits(body: list[ast.stmt], in_function: bool) -> bool:
+    """Whether a loop body contains a break (of this loop), return, raise or exit call."""
+    stack = [(node, False) for node in body]  # (node, inside a nested loop)
+    while stack:
+        node, nested = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            continue
+        if isinstance(node, ast.Break) and not nested:
+            return True
+        if isinstance(node, ast.Raise) or (in_function and isinstance(node, ast.Return)):
+            return True
+        if isinstance(node, ast.Call) and _dotted(node.func) in _EXIT_CALLS:
+            return True
+        # A break in a nested loop body only leaves that loop (but one in its else clause leaves ours).
+        loop = isinstance(node, (ast.For, ast.AsyncFor, ast.While))
+        for child in ast.iter_child_nodes(node):
+            stack.append((child, nested or (loop and child in node.body)))
+    return False
+
+
+def _always_true(test: ast.AST) -> bool:
+    return isinstance(test, ast.Constant) and bool(test.value)
+
+
+def check_loops(tree: ast.AST) -> list[dict]:
+    issues = []
+
+    def visit(node, in_function):
+        for child in ast.iter_child_nodes(node):
+            child_in_function = in_function or isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda))
+            if isinstance(child, ast.While) and _always_true(child.test) and not _exits(child.body, child_in_function):
+                issues.append(_issue("unbounded_loop", "'while True' loop has no break, return or raise.", child))
+            elif (isinstance(child, ast.For) and isinstance(child.iter, ast.Call)
+                  and _dotted(child.iter.func) in ("itertools.count", "count")
+                  and not _exits(child.body, child_in_function)):
+                issues.append(_issue("unbounded_loop", "Loop over itertools.count() has no break, return or raise.",
+                                     child))
+            visit(child, child_in_function)
+
+    visit(tree, False)
+    return issues
+
+
+def preflight(code: str) -> list[dict]:
+    """
+    Static checks of a script before it is executed: syntax errors, imports
+    that are not installed, names that are never defined, and loops that
+    cannot terminate. Returns issues ({kind, severity, message, line, col});
+    any issue with severity "error" means the script would fail.
+    """
+    try:
+        tree = ast.parse(code, "<experiment>")
+    except SyntaxError as e:
+        return [_issue("syntax", f"{type(e).__name__}: {e.msg}", line=e.lineno, col=(e.offset or 1) - 1)]
+    except ValueError as e:  # e.g. null bytes
+        return [_issue("syntax", f"SyntaxError: {e}", line=None, col=None)]
+    return check_imports(tree) + check_names(code, tree) + check_loops(tree)
+
+
+def format_issues(issues: list[dict]) -> str:
+    return "\n".join(
+        f"line {issue['line']}: {issue['message']}" + (" (warning)" if issue["severity"] != "error" else "")
+        if issue["line"] is not None else issue["message"]
+        for issue in issues
+    )
+
+
+class PreflightChecker:
+    """
+    Caches preflight() verdicts by code hash (an LRU of `max_entries`), so a
+    script that is retried or re-submitted is not analyzed again. Import
+    checks resolve against this interpreter, which is also the one the
+    sandbox workers run (tools.sandbox_pool).
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "rejected": 0}
+        self._verdicts = OrderedDict()  # sha256 -> issues
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Returns None when PREFLIGHT is set to 0/false/off; PREFLIGHT_CACHE_SIZE sets max_entries."""
+        if os.environ.get("PREFLIGHT", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        return cls(max_entries=int(os.environ.get("PREFLIGHT_CACHE_SIZE", 1024)))
+
+    @staticmethod
+    def make_key(code: str) -> str:
+        return hashlib.sha256(code.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def check(self, code: str, enforce: bool = False) -> dict:
+        """
+        {ok, issues, cached}: ok is False when any issue is an error. With
+        enforce=True the caller will not run failing code, and counts it as rejected.
+        """
+        key = self.make_key(code)
+        with self._lock:
+            issues = self._verdicts.get(key)
+            if issues is not None:
+                self._verdicts.move_to_end(key)
+                self.stats["hits"] += 1
+        cached = issues is not None
+        if not cached:
+            issues = preflight(code)
+            with self._lock:
+                self.stats["misses"] += 1
+                self._verdicts[key] = issues
+                while len(self._verdicts) > self.max_entries:
+                    self._verdicts.popitem(last=False)
+        ok = not any(issue["severity"] == "error" for issue in issues)
+        if not ok and enforce:
+            with self._lock:
+                self.stats["rejected"] += 1
+        return {"ok": ok, "issues": [dict(issue) for issue in issues], "cached": cached}
+
+    def summary(self) -> str:
+        return (f"Preflight: {self.stats['misses']} scripts checked, {self.stats['hits']} cached verdicts, "
+                f"{self.stats['rejected']} rejected")
+
+
+_checker = None
+_checker_lock = threading.Lock()
+
+
+def get_preflight():
+    """The process-wide PreflightChecker, or None when disabled via PREFLIGHT=0."""
+    global _checker
+    with _checker_lock:
+        if _checker is None:
+            _checker = PreflightChecker.from_env() or False
+        return _checker or None
@@ -0,0 +1,340 @@
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import queue
+import select
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Repository root, so worker processes can import `tools.sandbox_pool`.
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PRELOAD = ("numpy", "pandas")
+
+# Share of the memory limit a killed child's peak RSS must reach to count as a memory kill.
+_MEMORY_KILL_FRACTION = 0.9
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+# The count_runs() counters active in the current context. A context
+# variable rather than a thread-local: PraisonAI runs tools on executor
+# threads with a copy of the calling context, so a tool's runs still reach
+# the counters of the task that called it, and never those of another task.
+_run_counters = contextvars.ContextVar("sandbox_run_counters", default=())
+_run_counters_lock = threading.Lock()
+
+
+class SandboxPool:
+    """
+    Pool of pre-warmed Python worker processes for running experiment code.
+
+    Each worker is a long-lived interpreter that has already imported the
+    heavy scientific packages (numpy, pandas). For every script it forks a
+    fresh child -- which inherits those imports copy-on-write -- applies
+    per-execution rlimits (CPU seconds, address space), runs the code in a
+    brand-new namespace and reports stdout/stderr, timing and peak RSS. Workers
+    are recycled after `max_runs_per_worker` scripts or if they die.
+
+    This gives resource isolation and crash containment, not a security
+    boundary: LLM-generated code still runs as the current user.
+    """
+
+    def __init__(self, size: int = 2, max_runs_per_worker: int = 50, cpu_seconds: float = 30,
+                 wall_seconds: float = 60, memory_mb: int = 2048, preload=DEFAULT_PRELOAD,
+                 workdir: str = None, max_output_bytes: int = 64 * 1024):
+        self.size = size
+        self.max_runs_per_worker = max_runs_per_worker
+        self.cpu_seconds = cpu_seconds
+        self.wall_seconds = wall_seconds
+        self.memory_mb = memory_mb
+        self.preload = tuple(preload)
+        self.workdir = workdir or os.getcwd()
+        self.max_output_bytes = max_output_bytes
+        self.stats = {"runs": 0, "worker_failures": 0, "recycled": 0}
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(self._spawn())
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            size=int(os.environ.get("SANDBOX_WORKERS", 2)),
+            max_runs_per_worker=int(os.environ.get("SANDBOX_MAX_RUNS", 50)),
+            cpu_seconds=float(os.environ.get("SANDBOX_CPU_SECONDS", 30)),
+            wall_seconds=float(os.environ.get("SANDBOX_WALL_SECONDS", 60)),
+            memory_mb=int(os.environ.get("SANDBOX_MEMORY_MB", 2048)),
+        )
+
+    def _spawn(self) -> "_Worker":
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [_REPO_ROOT, env.get("PYTHONPATH")]))
+        proc = subprocess.Popen(
+            [sys.executable, "-u", "-m", "tools.sandbox_pool", ",".join(self.preload)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=_REPO_ROOT, env=env, text=True, bufsize=1,
+        )
+        worker = _Worker(proc)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _retire(self, worker: "_Worker"):
+        worker.stop()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+    def execute(self, code: str, cpu_seconds: float = None, wall_seconds: float = None,
+                memory_mb: int = None, workdir: str = None) -> dict:
+        """
+        Runs `code` in a fresh child of a warm worker, in `workdir` (default:
+        the pool's). Returns a dict with success, output, error, wall_time,
+        cpu_time and peak_rss_kb.
+        """
+        if self._closed:
+            raise RuntimeError("SandboxPool is closed.")
+        job = {
+            "code": code,
+            "workdir": workdir or self.workdir,
+            "cpu_seconds": cpu_seconds or self.cpu_seconds,
+            "wall_seconds": wall_seconds or self.wall_seconds,
+            "memory_mb": memory_mb or self.memory_mb,
+            "max_output_bytes": self.max_output_bytes,
+        }
+        worker = self._idle.get()
+        with self._lock:
+            self.stats["runs"] += 1
+        _count("runs")
+        try:
+            result = worker.run(job, timeout=job["wall_seconds"] + 10)
+        except (OSError, ValueError, TimeoutError) as e:
+            # The worker itself crashed or hung; replace it.
+            with self._lock:
+                self.stats["worker_failures"] += 1
+            self._retire(worker)
+            self._idle.put(self._spawn())
+            return {"success": False, "output": None, "error": f"SandboxError: worker failed ({e})",
+                    "wall_time": None, "cpu_time": None, "peak_rss_kb": None}
+        if worker.runs >= self.max_runs_per_worker:
+            with self._lock:
+                self.stats["recycled"] += 1
+            self._retire(worker)
+            worker = self._spawn()
+        self._idle.put(worker)
+        return result
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+
+
+@contextlib.contextmanager
+def count_runs():
+    """
+    Counts the scripts run (and refused by preflight, see note_rejected) in
+    this context, including tool calls it makes on other threads:
+    `with count_runs() as counts: ...` then counts["runs"], counts["rejected"].
+    """
+    counts = {"runs": 0, "rejected": 0}
+    token = _run_counters.set(_run_counters.get() + (counts,))
+    try:
+        yield counts
+    finally:
+        _run_counters.reset(token)
+
+
+def _count(key: str):
+    with _run_counters_lock:
+        for counts in _run_counters.get():
+            counts[key] += 1
+
+
+def note_rejected():
+    """Records a script that preflight refused to run, for the active count_runs() counters."""
+    _count("rejected")
+
+
+def sandbox_stats() -> dict:
+    """Counters of the process-wide pool (all zero if it has not been started)."""
+    with _shared_pool_lock:
+        pool = _shared_pool
+    if pool is None:
+        return {"runs": 0, "worker_failures": 0, "recycled": 0}
+    with pool._lock:
+        return dict(pool.stats)
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """
+    Returns the process-wide SandboxPool, starting it on first use. Sizes and
+    limits come from SANDBOX_WORKERS, SANDBOX_MAX_RUNS, SANDBOX_CPU_SECONDS,
+    SANDBOX_WALL_SECONDS and SANDBOX_MEMORY_MB.
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SandboxPool.from_env()
+        return _shared_pool
+
+
+class _Worker:
+    """Parent-side handle of one warm worker process (JSON lines over stdin/stdout)."""
+
+    def __init__(self, proc: subprocess.Popen):
+        self.proc = proc
+        self.runs = 0
+
+    def run(self, job: dict, timeout: float) -> dict:
+        self.proc.stdin.write(json.dumps(job) + "\n")
+        self.proc.stdin.flush()
+        ready, _, _ = select.select([self.proc.stdout], [], [], timeout)
+        if not ready:
+            raise TimeoutError(f"no response within {timeout:.0f}s")
+        line = self.proc.stdout.readline()
+        if not line:
+            raise OSError(f"worker exited with code {self.proc.poll()}")
+        self.runs += 1
+        return json.loads(line)
+
+    def stop(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+
+
+# --- Worker process side ---
+
+def _apply_limits(cpu_seconds: float, memory_mb: int):
+    import resource
+    cpu = max(1, int(cpu_seconds))
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    if memory_mb:
+        limit = int(memory_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _run_child(job: dict, output_fd: int, status_fd: int):
+    """Runs in the forked child: never returns."""
+    error = None
+    try:
+        os.setsid()  # Own process group, so a wall-clock kill also reaches its subprocesses.
+        os.chdir(job["workdir"])
+        os.dup2(output_fd, 1)
+        os.dup2(output_fd, 2)
+        _apply_limits(job["cpu_seconds"], job["memory_mb"])
+        namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+        exec(compile(job["code"], "<experiment>", "exec"), namespace)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            error = f"SystemExit: {e.code}"
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.write(status_fd, json.dumps({"error": error}).encode("utf-8"))
+    finally:
+        os._exit(0)
+
+
+def _signal_error(sig: int, job: dict, cpu_time: float, peak_rss_kb: int) -> str:
+    """
+    Why a child was killed by `sig`. RLIMIT_CPU sends SIGXCPU and then
+    SIGKILL, but so do the OOM killer and external kills, so SIGKILL only
+    counts as a CPU timeout when the child actually used up its CPU limit.
+    """
+    cpu_limit = max(1, int(job["cpu_seconds"]))  # As applied by _apply_limits.
+    if sig == signal.SIGXCPU or (sig == signal.SIGKILL and cpu_time >= cpu_limit):
+        return f"TimeoutError: exceeded CPU time limit of {job['cpu_seconds']}s"
+    name = signal.Signals(sig).name
+    # RSS stays somewhat below the address-space limit (which also counts
+    # reserved, unmapped memory), so "near the limit" counts as reaching it.
+    if job["memory_mb"] and peak_rss_kb >= _MEMORY_KILL_FRACTION * job["memory_mb"] * 1024:
+        return (f"MemoryError: process killed by {name} at a peak RSS of {peak_rss_kb // 1024} MB "
+                f"(memory limit {job['memory_mb']} MB)")
+    return f"Crash: process terminated by signal {name} (CPU time {cpu_time:.1f}s, peak RSS {peak_rss_kb // 1024} MB)"
+
+
+def _execute_job(job: dict) -> dict:
+    with tempfile.TemporaryFile() as output_file:
+        status_read, status_write = os.pipe()
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(status_read)
+            _run_child(job, output_file.fileno(), status_write)
+        os.close(status_write)
+
+        deadline = start + job["wall_seconds"]
+        timed_out = False
+        while True:
+            waited_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+            if waited_pid:
+                break
+            if time.perf_counter() > deadline:
+                timed_out = True
+                os.killpg(pid, signal.SIGKILL)
+                _, status, rusage = os.wait4(pid, 0)
+                break
+            time.sleep(0.005)
+        wall_time = time.perf_counter() - start
+        cpu_time = rusage.ru_utime + rusage.ru_stime
+
+        with os.fdopen(status_read, "rb") as status_pipe:
+            raw_status = status_pipe.read()
+        output_file.seek(0)
+        output = output_file.read().decode("utf-8", errors="replace")
+
+    if len(output) > job["max_output_bytes"]:
+        output = "[... output truncated ...]\n" + output[-job["max_output_bytes"]:]
+    if timed_out:
+        error = f"TimeoutError: exceeded wall-clock limit of {job['wall_seconds']}s"
+    elif raw_status:
+        error = json.loads(raw_status)["error"]
+    elif os.WIFSIGNALED(status):
+        error = _signal_error(os.WTERMSIG(status), job, cpu_time, rusage.ru_maxrss)
+    else:
+        error = f"Crash: process exited with status {os.WEXITSTATUS(status)}"
+
+    return {
+        "success": error is None,
+        "output": output,
+        "error": error,
+        "wall_time": round(wall_time, 4),
+        "cpu_time": round(cpu_time, 4),
+        "peak_rss_kb": rusage.ru_maxrss,  # Kilobytes on Linux.
+    }
+
+
+def _worker_main(preload: list[str]):
+    # Keep a private copy of stdout for the protocol and point fd 1 at stderr,
+    # so stray prints from preloaded packages cannot corrupt responses.
+    protocol = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    for module in preload:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+    for line in sys.stdin:
+        protocol.write(json.dumps(_execute_job(json.loads(line))) + "\n")
+
+
+if __name__ == "__main__":
+    _worker_main([m for m in (sys.argv[1] if len(sys.argv) > 1 else "").split(",") if m])
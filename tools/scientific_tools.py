@@ -1,17 +1,143 @@
-import json
-import random # For execute_python_code simulation
-import os # For query_knowledge_base
+import os
+import random
+import re
+import threading
+import time
+
+from tools.code_cache import get_code_cache
+from tools.preflight import PreflightChecker, format_issues, get_preflight
+from tools.sandbox_pool import get_sandbox_pool, note_rejected
+from tools.search_cache import SearchCache
+from tools.tracing import get_tracer, instrument_tools
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+
+class _NoLiteratureIndex(Exception):
+    """No arXiv index is configured (ARXIV_INDEX_DIR); search_arxiv answers with its mock list."""
+
+
+def get_search_cache():
+    """The process-wide SearchCache in front of search_arxiv, or None when disabled via SEARCH_CACHE=0."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache.from_env(ScientificTools._search_arxiv_backend) or False
+        return _search_cache or None
+
+
+class KeywordMatcher:
+    """
+    Finds which of a fixed set of keywords occur in a text, with the same
+    result as `keyword in text.lower()` for each of them, in a single pass of
+    one precompiled regex. The pattern is a lookahead, so overlapping matches
+    ("testeps" holds both "test" and "steps") are all seen.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(keywords))
+        # Longest first; a match also implies every keyword that is a prefix of it.
+        alternatives = sorted(self.keywords, key=len, reverse=True)
+        self._pattern = re.compile("(?=(" + "|".join(map(re.escape, alternatives)) + "))")
+        self._implied = {k: frozenset(p for p in self.keywords if k.startswith(p)) for k in self.keywords}
+
+    def find(self, text: str) -> set:
+        found = set()
+        for match in self._pattern.finditer(text.lower()):
+            found |= self._implied[match.group(1)]
+            if len(found) == len(self.keywords):
+                break
+        return found
+
+
+_CLARITY_KEYWORDS = KeywordMatcher(("complex", "evaluate", "test"))
+_DESIGN_KEYWORDS = KeywordMatcher(("hypothesis", "test", "steps", "control"))
+
+
+# analyze_code_for_errors() answers per tools.preflight issue kind.
+_ISSUE_FIXES = {
+    "syntax": "Fix the syntax at the reported location (colons, brackets, indentation, unterminated strings).",
+    "import": "Use a package that is installed in the sandbox (e.g. numpy, pandas) or guard the import with try/except ImportError.",
+    "undefined_name": "Define or import the name before it is used, or fix its spelling.",
+    "unbounded_loop": "Add a break condition or iterate over a bounded range.",
+}
+_ISSUE_CONFIDENCE = {"syntax": 0.95, "import": 0.9, "undefined_name": 0.85, "unbounded_loop": 0.7}
+
+
+# The mock paper's layout: the preamble, each section in order, then the end.
+LATEX_PREAMBLE = """
+\\documentclass{article}
+\\title{A Study on Novel Molecules for Drug Discovery}
+\\author{AI Scientist Framework}
+\\begin{document}
+\\maketitle
+
+"""
+LATEX_SECTIONS = {
+    "Abstract": (
+        "\\section*{{Abstract}}\n"
+        "This paper investigates novel molecular structures based on the hypothesis that {hypothesis}. "
+        "Our computational analysis reveals several promising candidates for further study.\n"
+    ),
+    "Introduction": (
+        "\\section{{Introduction}}\n"
+        "The search for effective and non-toxic drugs is a significant challenge in modern medicine. "
+        "This work explores...\n"
+    ),
+    "Methodology": (
+        "\\section{{Methodology}}\n"
+        "We designed a computational experiment to generate and evaluate 100 novel molecules based on our "
+        "initial hypothesis.\n"
+    ),
+    "Results": (
+        "\\section{{Results}}\n"
+        "Our analysis of the experimental data reveals the following key findings:\n"
+        "{analysis_summary}\n"
+    ),
+    "Conclusion": (
+        "\\section{{Conclusion}}\n"
+        "The results support our initial hypothesis. Specifically, molecule 'MOL-012' warrants further "
+        "in-vitro testing.\n"
+    ),
+}
+LATEX_SECTION_NAMES = tuple(LATEX_SECTIONS)
+LATEX_END = "\\end{document}\n"
+
+
+def latex_section(name: str, analysis_summary: str, hypothesis: str) -> str:
+    """One section of the mock paper, followed by a blank line."""
+    return LATEX_SECTIONS[name].format(analysis_summary=analysis_summary, hypothesis=hypothesis) + "\n"
+
+
+def _ranked(scores: list[float], top_n: int = None) -> list[int]:
+    """Indices by descending score; ties keep input order."""
+    ranking = sorted(range(len(scores)), key=lambda i: -scores[i])
+    return ranking if top_n is None else ranking[:top_n]
+
 
 class ScientificTools:
     """A collection of mock tools for our AI Scientist agents."""
 
     @staticmethod
-    def search_arxiv(query: str) -> str:
+    def search_arxiv(query: str, top_k: int = 3, year_from: int = None, year_to: int = None) -> str:
         """
-        Simulates searching the arXiv database for a given query.
-        Returns a mock list of relevant papers.
+        Searches the offline arXiv index (ARXIV_INDEX_DIR, see tools.literature_index)
+        for a query, optionally restricted to publication years [year_from, year_to].
+        Returns a list of relevant papers; falls back to a mock list without an index.
         """
         print(f"\n MOCK TOOL: Searching ArXiv for '{query}'...")
+        cache = get_search_cache()
+        try:
+            if cache is None:
+                return ScientificTools._search_arxiv_backend(query, top_k=top_k, year_from=year_from, year_to=year_to)
+            return cache.search(query, top_k=top_k, year_from=year_from, year_to=year_to)
+        except _NoLiteratureIndex:
+            pass
+        except Exception as e:
+            print(f" MOCK TOOL ERROR: Failed to search the arXiv index: {e}")
+
+        # Fallback mock response; never cached, since the backend raised instead of returning it.
         return (
             "Found Papers:\n"
             "- 'The role of Graph Neural Networks in molecular design' (2023)\n"
@@ -20,29 +146,109 @@ class ScientificTools:
         )
 
     @staticmethod
-    def execute_python_code(code: str) -> dict:
+    def _search_arxiv_backend(query: str, top_k: int = 3, year_from: int = None, year_to: int = None) -> str:
+        """The index's answer; raises when there is none, so failures are never cached as results."""
+        from tools.literature_index import get_literature_index  # Needs NumPy; loaded on first search.
+        index = get_literature_index()
+        if index is None:
+            raise _NoLiteratureIndex()
+        papers = index.search(query, top_k=top_k, year_from=year_from, year_to=year_to)
+        if not papers:
+            return f"Found Papers:\n(no papers matched '{query}')"
+        return "Found Papers:\n" + "\n".join(
+            f"- '{paper['title']}' ({paper['year'] or 'n.d.'})" for paper in papers
+        )
+
+    @staticmethod
+    def execute_python_code(code: str, use_cache: bool = True) -> dict:
         """
-        Simulates executing Python code in a sandboxed environment.
-        Returns a mock result of the execution, including success/failure.
+        Executes Python code in a warm, resource-limited worker process.
+        Returns success/output/error plus wall_time, cpu_time and peak_rss_kb.
+        Deterministic scripts that already ran are served from the code result
+        cache (`cached` is True); pass use_cache=False to force a fresh run.
+        Scripts that fail static checks (syntax, missing imports, undefined
+        names, endless loops) are rejected without running; see `preflight`.
         """
         print(f"\n MOCK TOOL: Executing Python code in a sandbox...")
+        rejected = ScientificTools._preflight_rejection(code)
+        if rejected is not None:
+            note_rejected()
+            return rejected
         # print("--- CODE ---\n" + code + "\n------------")
-        # In a real implementation, NEVER use exec() on LLM-generated code
-        # without extreme sandboxing and security measures.
+        # The pool only limits CPU time, wall-clock time and memory; it is not a
+        # security boundary, so only run it where LLM-generated code is trusted.
+        pool = get_sandbox_pool()
+        cache = get_code_cache()
+
+        def execute(code: str, workdir: str) -> dict:
+            # The cache may run the script in a scratch directory; stream its results.csv from there.
+            stream = ScientificTools._start_results_stream(code, workdir)
+            try:
+                return pool.execute(code, workdir=workdir)
+            finally:
+                if stream is not None:
+                    stream.finish()
 
-        # Simulate potential failure
-        if "error" in code.lower() or random.random() < 0.1: # 10% chance of mock error
-            return {"success": False, "output": None, "error": "SyntaxError: Invalid syntax on mock line 5 (simulated)"}
+        if cache is None:
+            return execute(code, pool.workdir)
+        return cache.run(code, execute, pool.workdir, use_cache=use_cache)
 
-        return {"success": True, "output": "Execution successful. Data saved to 'results.csv'.\nColumns: 'molecule_id', 'binding_affinity', 'toxicity_score'", "error": None}
+    @staticmethod
+    def _preflight_rejection(code: str):
+        """The result for a script that fails tools.preflight, or None if it may run (or PREFLIGHT=0)."""
+        checker = get_preflight()
+        if checker is None:
+            return None
+        start = time.perf_counter()
+        verdict = checker.check(code, enforce=True)
+        if verdict["ok"]:
+            return None
+        errors = [issue for issue in verdict["issues"] if issue["severity"] == "error"]
+        print(f" MOCK TOOL: Preflight rejected the script ({len(errors)} error(s)).")
+        return {
+            "success": False, "output": "",
+            "error": "PreflightError: script not run, fix these first:\n" + format_issues(errors),
+            "wall_time": time.perf_counter() - start, "cpu_time": 0.0, "peak_rss_kb": 0,
+            "preflight": verdict["issues"], "cached": False,
+        }
+
+    @staticmethod
+    def _start_results_stream(code: str, workdir: str):
+        """
+        Starts analyzing results.csv while the experiment writes it (see
+        tools.streaming_analysis), so analyze_data() can return as soon as
+        execution ends. Disabled with STREAM_ANALYSIS=0.
+        """
+        if "results.csv" not in code or os.environ.get("STREAM_ANALYSIS", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        try:
+            from tools.streaming_analysis import start_stream  # Needs NumPy.
+            return start_stream(os.path.join(workdir, "results.csv"))
+        except ImportError:
+            return None
 
     @staticmethod
     def analyze_data(file_path: str) -> str:
         """
-        Simulates analyzing a data file.
-        Returns a mock summary of the analysis.
+        Analyzes a results CSV (molecule_id, binding_affinity, toxicity_score, ...)
+        or a columnar results directory (tools.columnar) in bounded memory and
+        returns a summary: threshold counts, mean/variance, correlations and the
+        most promising molecules.
         """
         print(f"\n MOCK TOOL: Analyzing data from '{file_path}'...")
+        if os.path.exists(file_path):
+            try:
+                from tools.data_analyzer import analyze_path  # Needs NumPy.
+                from tools.streaming_analysis import finished_summary
+                # Analyzed while the experiment was running, and unchanged since.
+                streamed = finished_summary(file_path)
+                if streamed is not None:
+                    return streamed
+                return analyze_path(file_path).summary()
+            except Exception as e:
+                print(f" MOCK TOOL ERROR: Failed to analyze '{file_path}': {e}")
+
+        # Fallback mock response
         return (
             "Data Analysis Summary:\n"
             "- 25 out of 100 tested molecules show high binding affinity (>0.9).\n"
@@ -56,31 +262,17 @@ class ScientificTools:
         Simulates writing a scientific paper in LaTeX format.
         """
         print("\n MOCK TOOL: Compiling analysis into a LaTeX paper draft...")
-        return f"""
-\\documentclass{{article}}
-\\title{{A Study on Novel Molecules for Drug Discovery}}
-\\author{{AI Scientist Framework}}
-\\begin{document}
-\\maketitle
-
-\\section*{{Abstract}}
-This paper investigates novel molecular structures based on the hypothesis that {hypothesis}. Our computational analysis reveals several promising candidates for further study.
-
-\\section{{Introduction}}
-The search for effective and non-toxic drugs is a significant challenge in modern medicine. This work explores...
-
-\\section{{Methodology}}
-We designed a computational experiment to generate and evaluate 100 novel molecules based on our initial hypothesis.
-
-\\section{{Results}}
-Our analysis of the experimental data reveals the following key findings:
-{analysis_summary}
+        sections = "".join(latex_section(name, analysis_summary, hypothesis) for name in LATEX_SECTION_NAMES)
+        return LATEX_PREAMBLE + sections + LATEX_END
 
-\\section{{Conclusion}}
-The results support our initial hypothesis. Specifically, molecule 'MOL-012' warrants further in-vitro testing.
-
-\\end{{document}}
-"""
+    @staticmethod
+    def write_latex_section(section: str, analysis_summary: str, hypothesis: str) -> str:
+        """
+        Simulates writing one section of the LaTeX paper (Abstract, Introduction,
+        Methodology, Results or Conclusion), as laid out by write_latex_paper.
+        """
+        print(f"\n MOCK TOOL: Drafting the {section} section...")
+        return latex_section(section, analysis_summary, hypothesis)
 
     # --- New Mock Tools for Closed-Loop System ---
 
@@ -90,9 +282,29 @@ The results support our initial hypothesis. Specifically, molecule 'MOL-012' war
         Simulates evaluating the clarity and testability of a hypothesis.
         """
         print(f"\n MOCK TOOL: Evaluating hypothesis clarity for: '{hypothesis[:50]}...'")
-        # Simulate some basic checks
-        is_clear = "complex" not in hypothesis.lower()
-        is_testable = "evaluate" in hypothesis.lower() or "test" in hypothesis.lower()
+        return ScientificTools._clarity(hypothesis)
+
+    @staticmethod
+    def evaluate_hypothesis_clarity_batch(hypotheses: list[str], top_n: int = None) -> dict:
+        """
+        Evaluates the clarity and testability of many candidate hypotheses in one call.
+        Returns per-hypothesis `scores`, `proceed` flags and `feedback` (in input order),
+        plus `ranking`: indices from best to worst score. With top_n, also a `shortlist`
+        of the best top_n hypotheses.
+        """
+        print(f"\n MOCK TOOL: Evaluating hypothesis clarity for {len(hypotheses)} hypotheses...")
+        results = [ScientificTools._clarity(hypothesis) for hypothesis in hypotheses]
+        batch = ScientificTools._batch_result(results)
+        if top_n is not None:
+            batch["shortlist"] = [{"index": i, "hypothesis": hypotheses[i], "score": batch["scores"][i]}
+                                  for i in _ranked(batch["scores"], top_n)]
+        return batch
+
+    @staticmethod
+    def _clarity(hypothesis: str) -> dict:
+        found = _CLARITY_KEYWORDS.find(hypothesis)
+        is_clear = "complex" not in found
+        is_testable = "evaluate" in found or "test" in found
         score = (0.7 if is_clear else 0.3) + (0.3 if is_testable else 0.0)
 
         feedback_msg = "Mock: Hypothesis seems "
@@ -121,9 +333,29 @@ The results support our initial hypothesis. Specifically, molecule 'MOL-012' war
         Simulates evaluating the soundness of an experimental design.
         """
         print(f"\n MOCK TOOL: Evaluating experimental design soundness for design: '{design_description[:50]}...' related to hypothesis: '{hypothesis[:50]}...'")
-        # Simulate basic checks
-        aligns = "hypothesis" in design_description.lower() or "test" in design_description.lower()
-        is_sound = "steps" in design_description.lower() and "control" in design_description.lower()
+        return ScientificTools._design_soundness(design_description)
+
+    @staticmethod
+    def evaluate_experimental_design_soundness_batch(pairs: list[list[str]], top_n: int = None) -> dict:
+        """
+        Evaluates many [design_description, hypothesis] pairs in one call.
+        Returns per-pair `scores`, `proceed` flags and `feedback` (in input order),
+        plus `ranking`: indices from best to worst score. With top_n, also a
+        `shortlist` of the best top_n designs.
+        """
+        print(f"\n MOCK TOOL: Evaluating experimental design soundness for {len(pairs)} designs...")
+        designs = [pair["design_description"] if isinstance(pair, dict) else pair[0] for pair in pairs]
+        batch = ScientificTools._batch_result([ScientificTools._design_soundness(d) for d in designs])
+        if top_n is not None:
+            batch["shortlist"] = [{"index": i, "design_description": designs[i], "score": batch["scores"][i]}
+                                  for i in _ranked(batch["scores"], top_n)]
+        return batch
+
+    @staticmethod
+    def _design_soundness(design_description: str) -> dict:
+        found = _DESIGN_KEYWORDS.find(design_description)
+        aligns = "hypothesis" in found or "test" in found
+        is_sound = "steps" in found and "control" in found
         score = (0.5 if aligns else 0.2) + (0.5 if is_sound else 0.2)
 
         feedback_msg = "Mock: Design "
@@ -144,26 +376,45 @@ The results support our initial hypothesis. Specifically, molecule 'MOL-012' war
             "proceed": aligns and is_sound
         }
 
+    @staticmethod
+    def _batch_result(results: list[dict]) -> dict:
+        scores = [result["score"] for result in results]
+        return {
+            "scores": scores,
+            "ranking": _ranked(scores),
+            "proceed": [result["proceed"] for result in results],
+            "feedback": [result["feedback"] for result in results],
+        }
+
     @staticmethod
     def analyze_code_for_errors(code: str, error_message: str = None) -> dict:
         """
-        Simulates analyzing code for errors, optionally with a reported error message.
+        Statically analyzes code for errors (syntax, missing imports, undefined
+        names, endless loops; see tools.preflight), optionally with a reported
+        error message. Returns a diagnosis, a suggested fix, a confidence and
+        the list of issues found (with line numbers).
         """
         if error_message:
             print(f"\n MOCK TOOL: Analyzing code for errors, focusing on reported error: {error_message}")
-            # Simulate more targeted analysis
-            if "syntax" in error_message.lower():
-                 return {"diagnosis": "Mock: Likely a syntax error based on report.", "suggested_fix": "Mock: Double-check syntax, colons, parentheses, and indentation around the reported error location.", "confidence": 0.85}
-            return {"diagnosis": "Mock: Error type unclear from message.", "suggested_fix": "Mock: General debugging steps: print statements, simplify code.", "confidence": 0.4}
-
-        print(f"\n MOCK TOOL: Analyzing code for potential errors: '{code[:100]}...'")
-        # Simulate generic analysis
-        if "import non_existent_module" in code:
-            return {"diagnosis": "Mock: Identified an import error.", "suggested_fix": "Mock: Ensure 'non_existent_module' is installed and correctly named.", "confidence": 0.9}
-        if "print(variable_not_defined)" in code:
-            return {"diagnosis": "Mock: Identified a NameError.", "suggested_fix": "Mock: Ensure 'variable_not_defined' is defined before use.", "confidence": 0.8}
+        else:
+            print(f"\n MOCK TOOL: Analyzing code for potential errors: '{code[:100]}...'")
+        checker = get_preflight() or PreflightChecker()
+        issues = checker.check(code)["issues"]
+        errors = [issue for issue in issues if issue["severity"] == "error"]
+        if errors:
+            first = errors[0]
+            diagnosis = (f"Line {first['line']}: " if first["line"] is not None else "") + first["message"]
+            if len(errors) > 1:
+                diagnosis += f" ({len(errors) - 1} more error(s) found)"
+            return {"diagnosis": diagnosis, "suggested_fix": _ISSUE_FIXES[first["kind"]],
+                    "confidence": _ISSUE_CONFIDENCE[first["kind"]], "issues": issues}
 
-        return {"diagnosis": "Mock: No obvious errors found in this simple scan.", "suggested_fix": "Mock: If issues persist, try manual debugging or more detailed static analysis.", "confidence": 0.6}
+        if error_message:
+            # Nothing wrong statically, so the failure happened at run time.
+            if "syntax" in error_message.lower():
+                return {"diagnosis": "Mock: Likely a syntax error based on report.", "suggested_fix": "Mock: Double-check syntax, colons, parentheses, and indentation around the reported error location.", "confidence": 0.85, "issues": issues}
+            return {"diagnosis": "Mock: Error type unclear from message.", "suggested_fix": "Mock: General debugging steps: print statements, simplify code.", "confidence": 0.4, "issues": issues}
+        return {"diagnosis": "No errors found by static analysis.", "suggested_fix": "If issues persist, check run-time behaviour: inputs, data shapes and numerical edge cases.", "confidence": 0.6, "issues": issues}
 
     @staticmethod
     def compare_results_to_hypothesis(results_summary: str, hypothesis: str) -> dict:
@@ -190,38 +441,39 @@ The results support our initial hypothesis. Specifically, molecule 'MOL-012' war
     @staticmethod
     def update_knowledge_base(entry: dict) -> bool:
         """
-        Simulates updating a knowledge base with a new entry.
+        Appends a new entry to the knowledge base and indexes it. Writes are
+        group-committed, so True means the entry was queued; a deferred write
+        that failed is reported by the next call, which returns False.
         """
         print(f"\n MOCK TOOL: Updating knowledge base with entry: {str(entry)[:100]}...")
         try:
-            with open("mock_knowledge_base.jsonl", "a") as f:
-                f.write(json.dumps(entry) + '\n')
+            from tools.knowledge_base import get_knowledge_base
+            get_knowledge_base().add(entry)
             return True
         except Exception as e:
-            print(f" MOCK TOOL ERROR: Failed to write to mock_knowledge_base.jsonl: {e}")
+            print(f" MOCK TOOL ERROR: Failed to update the knowledge base: {e}")
             return False
 
     @staticmethod
-    def query_knowledge_base(query: str) -> list[dict]:
+    def query_knowledge_base(query: str, top_k: int = 3, mode: str = "keyword") -> list[dict]:
         """
-        Simulates querying a knowledge base.
+        Queries the knowledge base, returning up to top_k entries ranked by BM25
+        relevance (mode="keyword") or offline embedding similarity (mode="semantic").
         """
-        print(f"\n MOCK TOOL: Querying knowledge base for: '{query}'")
-        # Simulate reading from the mock KB for more dynamic results if it exists
-        mock_kb_path = "mock_knowledge_base.jsonl"
-        found_entries = []
+        print(f"\n MOCK TOOL: Querying knowledge base ({mode}) for: '{query}'")
         try:
-            if os.path.exists(mock_kb_path): # Need to import os for this
-                with open(mock_kb_path, "r") as f:
-                    for line in f:
-                        entry = json.loads(line)
-                        # Simple text matching for query simulation
-                        if query.lower() in str(entry.values()).lower():
-                            found_entries.append(entry)
+            from tools.knowledge_base import get_knowledge_base
+            found_entries = get_knowledge_base().query(query, top_k=top_k, mode=mode)
             if found_entries:
-                 return found_entries[:3] # Return up to 3 matches
+                return found_entries
         except Exception as e:
-            print(f" MOCK TOOL ERROR: Failed to read or parse mock_knowledge_base.jsonl: {e}")
+            print(f" MOCK TOOL ERROR: Failed to query the knowledge base: {e}")
 
         # Fallback mock response
         return [{"mock_entry_id": random.randint(1, 1000), "text": f"Mock KB entry related to '{query}'. No dynamic matches found or KB empty/error."}]
+
+
+# With AISCIENTIST_TRACE set, every tool call is recorded as a span (see tools.tracing).
+# This has to run before the agents are built, since they keep references to the methods.
+if get_tracer() is not None:
+    instrument_tools(ScientificTools, get_tracer())
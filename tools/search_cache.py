@@ -0,0 +1,122 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case-, width- and whitespace-insensitive form of a search query."""
+    query = unicodedata.normalize("NFKC", query).casefold()
+    return _SPACE_RE.sub(" ", query).strip(" \t\n\"'.,;:")
+
+
+class _Flight:
+    """One in-progress backend call that concurrent identical requests wait on."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SearchCache:
+    """
+    Front-end for a literature search backend (`backend(query, **params)`).
+
+    Queries are normalized (see normalize_query) and, together with the other
+    parameters, used as the cache key. Results are kept for `ttl` seconds in an
+    LRU of at most `max_entries`. Concurrent identical requests are coalesced
+    into a single backend call (single-flight): the first caller runs it and
+    the others wait for its result. Backend errors are raised to every waiter
+    and are not cached.
+    """
+
+    def __init__(self, backend, ttl: float = 3600, max_entries: int = 1024):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "evictions": 0, "backend_calls": 0}
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, backend):
+        """
+        Builds the cache from SEARCH_CACHE_TTL (seconds, default 3600) and
+        SEARCH_CACHE_SIZE (entries, default 1024), or returns None when
+        SEARCH_CACHE is set to 0/false/off.
+        """
+        if os.environ.get("SEARCH_CACHE", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        return cls(
+            backend,
+            ttl=float(os.environ.get("SEARCH_CACHE_TTL", 3600)),
+            max_entries=int(os.environ.get("SEARCH_CACHE_SIZE", 1024)),
+        )
+
+    @staticmethod
+    def make_key(query: str, params: dict) -> tuple:
+        return (normalize_query(query),) + tuple(sorted(params.items()))
+
+    def search(self, query: str, **params):
+        key = self.make_key(query, params)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+                self.stats["expired"] += 1
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                flight = self._in_flight[key] = _Flight()
+                self.stats["misses"] += 1
+                self.stats["backend_calls"] += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self.backend(normalize_query(query), **params)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if flight.error is None:
+                    self._entries[key] = (time.monotonic() + self.ttl, flight.result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.stats["evictions"] += 1
+            flight.done.set()
+        return flight.result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self) -> str:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        rate = (self.stats["hits"] + self.stats["coalesced"]) / lookups if lookups else 0.0
+        return (f"Search cache: {self.stats['hits']} hits / {self.stats['misses']} misses / "
+                f"{self.stats['coalesced']} coalesced ({rate:.0%} served without the backend), "
+                f"{self.stats['expired']} expired, {self.stats['evictions']} evicted")
@@ -0,0 +1,225 @@
+import csv
+import os
+import threading
+import time
+
+from tools.data_analyzer import DataAnalysis, parse_lines, sniff_columns
+
+# Finished streams are kept (oldest dropped first) so analyze_data() can reuse their summaries.
+MAX_STREAMS = 64
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+def _file_state(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class StreamingAnalysis:
+    """
+    Analyzes a results CSV while the experiment is still writing it.
+
+    A background thread tails the file, parses complete lines as they appear
+    and feeds them into the same mergeable accumulators as analyze_data
+    (tools.data_analyzer.DataAnalysis). Every `publish_interval` seconds the
+    current summary is published to `on_partial(summary, rows)`; finish()
+    drains whatever is left once execution has ended and returns the final
+    summary, so nothing has to be re-read afterwards.
+
+    A file that already exists when the stream starts is treated as stale
+    until it changes (the experiment will usually overwrite it); if it never
+    changes it is analyzed as-is. Truncation or replacement of the file
+    restarts the analysis.
+    """
+
+    def __init__(self, path: str, publish_interval: float = 5.0, poll_interval: float = 0.2,
+                 chunk_rows: int = 200_000, on_partial=None, thresholds: dict = None, top_k: int = 5):
+        self.path = path
+        self.publish_interval = publish_interval
+        self.poll_interval = poll_interval
+        self.chunk_rows = chunk_rows
+        self.on_partial = on_partial
+        self.thresholds = thresholds
+        self.top_k = top_k
+        self.analysis = None
+        self.latest_summary = None
+        self.partials = 0
+        self.final_state = None
+        self._baseline = _file_state(path)
+        self._done = threading.Event()
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="stream-analysis", daemon=True)
+        self._error = None
+
+    def start(self) -> "StreamingAnalysis":
+        self._thread.start()
+        return self
+
+    @property
+    def rows(self) -> int:
+        return self.analysis.rows if self.analysis else 0
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def finish(self, timeout: float = None):
+        """Signals that the producer is done; returns the final summary (None if there is no data)."""
+        self._done.set()
+        self._thread.join(timeout)
+        if self._error is not None:
+            raise self._error
+        return self.latest_summary
+
+    def matches_file(self) -> bool:
+        """True if the file is still exactly what the final summary describes."""
+        return self.finished and self.final_state is not None and _file_state(self.path) == self.final_state
+
+    def _reset(self):
+        self._header = None
+        self._numeric = None
+        self._id_column = None
+        self._buffer = b""
+        self._pending = []
+        self._position = 0
+        self._identity = None
+        self.analysis = None
+
+    def _flush(self, final: bool = False):
+        if self._header is None or not self._pending:
+            return
+        if self._numeric is None:
+            if not final and len(self._pending) < 100:
+                return  # Wait for a few rows before deciding which columns are numeric.
+            sample = list(csv.reader(self._pending[:100]))
+            self._numeric, self._id_column = sniff_columns(self._header, sample)
+            self.analysis = DataAnalysis(self._numeric, self.thresholds, self.top_k)
+        lines, self._pending = self._pending, []
+        chunk, ids_for = parse_lines(lines, self._header, self._numeric, self._id_column, self.rows)
+        with self._lock:
+            self.analysis.update(chunk, ids_for)
+
+    def _read_available(self, f) -> bool:
+        data = f.read(8 << 20)
+        if not data:
+            return False
+        self._position += len(data)
+        data = self._buffer + data
+        lines = data.split(b"\n")
+        self._buffer = lines.pop()  # Incomplete last line, if any.
+        for raw in lines:
+            line = raw.decode("utf-8", errors="replace")
+            if self._header is None:
+                self._header = [name.strip() for name in next(csv.reader([line]))]
+            elif line.strip():
+                self._pending.append(line + "\n")
+        if len(self._pending) >= self.chunk_rows:
+            self._flush()
+        return True
+
+    def _publish(self):
+        if self.analysis is None:
+            return
+        with self._lock:
+            summary = self.analysis.summary()
+        self.latest_summary = summary
+        self.partials += 1
+        if self.on_partial is not None:
+            self.on_partial(summary, self.rows)
+
+    def _run(self):
+        try:
+            self._tail()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._finished.set()
+
+    def _tail(self):
+        self._reset()
+        f = None
+        next_publish = time.monotonic() + self.publish_interval
+        try:
+            while True:
+                done = self._done.is_set()
+                state = _file_state(self.path)
+                stale = state is not None and state == self._baseline and not done
+                if state is not None and not stale:
+                    self._baseline = None
+                    if f is not None and (state[0] != self._identity or state[1] < self._position):
+                        f.close()  # Replaced or truncated: start over.
+                        f = None
+                        self._reset()
+                    if f is None:
+                        f = open(self.path, "rb")
+                        self._identity = os.fstat(f.fileno()).st_ino
+                    while self._read_available(f):
+                        pass
+                if done:
+                    if self._buffer.strip():
+                        self._pending.append(self._buffer.decode("utf-8", errors="replace") + "\n")
+                        self._buffer = b""
+                    self._flush(final=True)
+                    self.final_state = _file_state(self.path)
+                    if self.analysis is not None:
+                        with self._lock:
+                            self.latest_summary = self.analysis.summary()
+                    return
+                if time.monotonic() >= next_publish:
+                    self._flush(final=True)
+                    self._publish()
+                    next_publish = time.monotonic() + self.publish_interval
+                self._done.wait(self.poll_interval)
+        finally:
+            if f is not None:
+                f.close()
+
+
+def _print_partial(path: str):
+    def publish(summary: str, rows: int):
+        print(f"\n STREAM: Partial analysis of '{path}' ({rows} rows so far):\n{summary}")
+    return publish
+
+
+def start_stream(path: str, **kwargs) -> StreamingAnalysis:
+    """
+    Starts tailing `path` and registers the stream, so a later analyze_data()
+    of the same file can use the final summary. The publish interval defaults
+    to STREAM_ANALYSIS_INTERVAL (seconds, default 5).
+    """
+    path = os.path.abspath(path)
+    kwargs.setdefault("publish_interval", float(os.environ.get("STREAM_ANALYSIS_INTERVAL", 5)))
+    kwargs.setdefault("on_partial", _print_partial(path))
+    stream = StreamingAnalysis(path, **kwargs).start()
+    with _streams_lock:
+        previous = _streams.pop(path, None)
+        _streams[path] = stream
+        while len(_streams) > MAX_STREAMS:
+            _streams.pop(next(iter(_streams)))
+    if previous is not None and not previous.finished:
+        previous.finish()
+    return stream
+
+
+def finished_summary(path: str):
+    """
+    The final streamed summary of `path`, if one exists and the file is
+    unchanged since. A file that was streamed elsewhere and then moved here
+    (e.g. out of a code cache scratch directory) is found by its identity.
+    """
+    path = os.path.abspath(path)
+    state = _file_state(path)
+    with _streams_lock:
+        stream = _streams.get(path)
+        candidates = [stream] if stream is not None else []
+        candidates += [s for s in reversed(_streams.values()) if s is not stream]
+    for stream in candidates:
+        if stream.finished and state is not None and stream.final_state == state:
+            return stream.latest_summary
+    return None
@@ -0,0 +1,253 @@
+import contextlib
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+from agents.chat_hooks import ChatMiddleware, agent_key, wrap_chat
+
+_tracer = None
+_tracer_lock = threading.Lock()
+_current = threading.local()  # .stage: name of the DAG task / agent running on this thread
+
+
+def _size(value) -> int:
+    """Approximate payload size in characters (strings and bytes by length, anything else by repr)."""
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return len(repr(value))
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+class Span:
+    __slots__ = ("name", "category", "stage", "start", "end", "cpu", "thread", "args")
+
+    def __init__(self, name, category, stage, start, end, cpu, thread, args):
+        self.name = name
+        self.category = category
+        self.stage = stage
+        self.start = start
+        self.end = end
+        self.cpu = cpu
+        self.thread = thread
+        self.args = args
+
+    @property
+    def wall(self) -> float:
+        return self.end - self.start
+
+
+class Tracer:
+    """
+    Collects timed spans for agent tasks ("task"), LLM round-trips ("llm") and
+    ScientificTools calls ("tool").
+
+    Each span records wall time, the CPU time of its thread, and whatever the
+    caller adds to its args (input/output sizes, token counts, errors). Spans
+    opened while a task runs on the same thread are attributed to that task's
+    stage. Export with `export()` (Chrome trace-event JSON, viewable in
+    chrome://tracing or Perfetto) and `summary()` (p50/p95 per stage).
+
+    Tracing is off unless AISCIENTIST_TRACE is set; nothing is wrapped then,
+    so a disabled tracer costs one `get_tracer()` check per task.
+    """
+
+    def __init__(self, path: str = "trace.json"):
+        self.path = path
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds a tracer when AISCIENTIST_TRACE is set: to an output path, or
+        to 1/true/on for `trace.json`. Returns None otherwise.
+        """
+        value = os.environ.get("AISCIENTIST_TRACE", "").strip()
+        if value.lower() in ("", "0", "false", "no", "off"):
+            return None
+        return cls("trace.json" if value.lower() in ("1", "true", "yes", "on") else value)
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, stage: str = None, **args):
+        """Times the body; yields the span's args dict so the body can add to it."""
+        outer_stage = getattr(_current, "stage", None)
+        if stage is None:
+            stage = outer_stage
+        else:
+            _current.stage = stage
+        start = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            span = Span(name, category, stage, start, time.perf_counter(), time.thread_time() - cpu,
+                        threading.current_thread(), args)
+            _current.stage = outer_stage
+            with self._lock:
+                self.spans.append(span)
+
+    def wrap(self, func, name: str, category: str = "tool"):
+        """`func` with every call recorded as a span (keeps its signature and docstring)."""
+        @functools.wraps(func)
+        def traced(*args, **kwargs):
+            in_bytes = sum(map(_size, args)) + sum(map(_size, kwargs.values()))
+            with self.span(name, category, in_bytes=in_bytes) as span_args:
+                result = func(*args, **kwargs)
+                span_args["out_bytes"] = _size(result)
+                return result
+        return traced
+
+    def chrome_trace(self) -> dict:
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events, threads = [], {}
+        for span in spans:
+            threads.setdefault(span.thread.ident, span.thread.name)
+            events.append({
+                "name": span.name, "cat": span.category, "ph": "X", "pid": pid, "tid": span.thread.ident,
+                "ts": round((span.start - self._origin) * 1e6, 1), "dur": round(span.wall * 1e6, 1),
+                "args": dict(span.args, stage=span.stage, cpu_ms=round(span.cpu * 1e3, 3)),
+            })
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                   for tid, name in threads.items()]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str = None) -> str:
+        path = path or self.path
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+    def rows(self) -> list[dict]:
+        """One row per (stage, category, span name): count, p50/p95/total wall, CPU, sizes, tokens."""
+        groups = {}
+        with self._lock:
+            for span in self.spans:
+                groups.setdefault((span.stage or "-", span.category, span.name), []).append(span)
+        rows = []
+        for (stage, category, name), spans in groups.items():
+            walls = [span.wall for span in spans]
+            total = lambda key: sum(span.args.get(key, 0) or 0 for span in spans)
+            rows.append({
+                "stage": stage, "category": category, "name": name, "count": len(spans),
+                "p50_ms": _percentile(walls, 50) * 1e3, "p95_ms": _percentile(walls, 95) * 1e3,
+                "wall_s": sum(walls), "cpu_s": sum(span.cpu for span in spans),
+                "in_bytes": total("in_bytes"), "out_bytes": total("out_bytes"),
+                "tokens_in": total("tokens_in"), "tokens_out": total("tokens_out"),
+            })
+        return rows
+
+    def summary(self) -> str:
+        rows = sorted(self.rows(), key=lambda row: (row["stage"], row["category"] != "task", -row["wall_s"]))
+        lines = [f"{'stage':<20} {'span':<54} {'n':>4} {'p50 ms':>9} {'p95 ms':>9} {'cpu s':>7} "
+                 f"{'in B':>9} {'out B':>9} {'tok in':>7} {'tok out':>7}"]
+        for row in rows:
+            lines.append(
+                f"{row['stage'][:20]:<20} {row['name'][:54]:<54} {row['count']:>4} {row['p50_ms']:>9.1f} "
+                f"{row['p95_ms']:>9.1f} {row['cpu_s']:>7.2f} {row['in_bytes']:>9} {row['out_bytes']:>9} "
+                f"{row['tokens_in']:>7} {row['tokens_out']:>7}"
+            )
+        return "Trace summary:\n" + "\n".join(lines)
+
+
+class TracingMiddleware(ChatMiddleware):
+    """
+    Records each chat() round-trip of an agent as an "llm" span with prompt and
+    response sizes and token counts. Tokens come from the PraisonAI agent's
+    cumulative `cost_summary` (so they are approximate when one agent runs
+    several tasks at once); without it they are estimated at 4 chars/token.
+    """
+
+    def __init__(self, tracer: Tracer, agent, name: str):
+        self.tracer = tracer
+        self.agent = agent
+        self.name = name
+
+    def _usage(self):
+        try:
+            usage = self.agent.cost_summary
+            return usage["tokens_in"], usage["tokens_out"]
+        except Exception:
+            return None
+
+    def _record(self, args, prompt, response, before):
+        args["out_bytes"] = _size(response)
+        after = self._usage()
+        if before is not None and after is not None and after != (0, 0):
+            args["tokens_in"], args["tokens_out"] = after[0] - before[0], after[1] - before[1]
+        else:
+            args["tokens_in"], args["tokens_out"] = _size(prompt) // 4, _size(response) // 4
+            args["tokens_estimated"] = True
+
+    def _stage(self):
+        # Outside a scheduler task (e.g. PraisonAIAgents.start()), attribute the call to the agent.
+        return None if getattr(_current, "stage", None) else self.name
+
+    def __call__(self, call_next, prompt, *args, **kwargs):
+        before = self._usage()
+        with self.tracer.span(f"chat:{self.name}", "llm", self._stage(), in_bytes=_size(prompt)) as span_args:
+            response = call_next(prompt, *args, **kwargs)
+            self._record(span_args, prompt, response, before)
+            return response
+
+    async def acall(self, call_next, prompt, *args, **kwargs):
+        before = self._usage()
+        with self.tracer.span(f"chat:{self.name}", "llm", self._stage(), in_bytes=_size(prompt)) as span_args:
+            response = await call_next(prompt, *args, **kwargs)
+            self._record(span_args, prompt, response, before)
+            return response
+
+
+def install_tracing(agent_wrapper, tracer: Tracer):
+    """Records the LLM round-trips of one of our agent wrappers (ResearcherAgent etc.)."""
+    wrap_chat(agent_wrapper.agent, TracingMiddleware(tracer, agent_wrapper.agent, agent_key(agent_wrapper)))
+
+
+def instrument_tools(cls, tracer: Tracer):
+    """Replaces every public staticmethod of `cls` (e.g. ScientificTools) with a traced one."""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("_") or not isinstance(attr, staticmethod):
+            continue
+        func = attr.__func__
+        if getattr(func, "_traced", False):
+            continue
+        traced = tracer.wrap(func, f"{cls.__name__}.{name}")
+        traced._traced = True
+        setattr(cls, name, staticmethod(traced))
+
+
+def get_tracer():
+    """The process-wide Tracer, or None when AISCIENTIST_TRACE is unset."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer.from_env() or False
+        return _tracer or None
+
+
+def enable_tracing(path: str = "trace.json") -> Tracer:
+    """Turns tracing on for this process (e.g. from a --trace flag) and returns the tracer."""
+    global _tracer
+    with _tracer_lock:
+        if not _tracer:
+            _tracer = Tracer(path)
+        else:
+            _tracer.path = path
+        return _tracer
@@ -1,6 +1,7 @@
 from agents.analyst_agent import AnalystAgent
 from agents.writer_agent import WriterAgent
 from praisonaiagents import Task # Needed for type hinting
+from workflows.scheduler import TaskNode
 
 class AnalysisAndWritingWorkflow:
     def __init__(self, analyst_agent: AnalystAgent, writer_agent: WriterAgent):
@@ -14,7 +15,17 @@ class AnalysisAndWritingWorkflow:
         task_analyze = self.analyst_agent.get_task()
         task_write = self.writer_agent.get_task()
 
-        # PraisonAI handles dependencies based on task order and agent outputs.
         # task_write will use the output of task_analyze.
+        task_write.context = [task_analyze]
 
         return [task_analyze, task_write]
+
+    def get_nodes(self, execute_node: str = "execute", hypothesis_nodes=("hypothesis",)) -> list[TaskNode]:
+        """
+        Generates the task graph for analysis and writing. The analyst needs the
+        execution report; the writer needs the analysis and the hypothesis.
+        """
+        return [
+            TaskNode("analyze", self.analyst_agent.get_task(), depends_on=[execute_node]),
+            TaskNode("write", self.writer_agent.get_task(), depends_on=["analyze", *hypothesis_nodes]),
+        ]
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from workflows.scheduler import TaskNode
+
+
+def new_run_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+class CheckpointStore:
+    """
+    Saves each task's output under `<root>/<run_id>/<stage>.json`, together
+    with a fingerprint of its inputs and its timing.
+
+    The fingerprint covers the task description, the agent's role, the model
+    and the exact upstream outputs. A checkpoint is only reused when the
+    fingerprint still matches, so re-running a stage whose output changed
+    invalidates everything downstream of it, while unchanged stages are skipped.
+    Empty outputs are never saved nor restored, so a failed stage always runs
+    again. The run directory is only created by the first save.
+    """
+
+    def __init__(self, root: str = "checkpoints", run_id: str = None, model: str = ""):
+        self.run_id = run_id or new_run_id()
+        self.run_dir = os.path.join(root, self.run_id)
+        self.model = model
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.run_dir) and any(name.endswith(".json") for name in os.listdir(self.run_dir))
+
+    def fingerprint(self, node: TaskNode, upstream: dict) -> str:
+        agent = node.task.agent
+        payload = {
+            "stage": node.name,
+            "description": node.task.description,
+            "role": getattr(agent, "role", None),
+            "model": self.model,
+            "upstream": {name: hashlib.sha256(str(upstream[name]).encode("utf-8")).hexdigest()
+                         for name in sorted(upstream)},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, stage: str) -> str:
+        return os.path.join(self.run_dir, f"{stage}.json")
+
+    def load(self, stage: str, fingerprint: str):
+        """Returns the saved output if the stage completed with the same inputs, else None."""
+        try:
+            with open(self._path(stage)) as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if record.get("fingerprint") != fingerprint or not str(record.get("output") or "").strip():
+            return None
+        return record["output"]
+
+    def latest_output(self, stage: str):
+        """The last saved output of a stage regardless of its inputs, or None."""
+        try:
+            with open(self._path(stage)) as f:
+                output = json.load(f)["output"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        return output if str(output or "").strip() else None
+
+    def save(self, stage: str, fingerprint: str, output: str, started_at: float, duration: float) -> bool:
+        """Checkpoints a stage's output; returns False (and saves nothing) if the output is empty."""
+        if not str(output or "").strip():
+            print(f"--- Not checkpointing '{stage}': its output is empty ---")
+            return False
+        os.makedirs(self.run_dir, exist_ok=True)
+        record = {
+            "run_id": self.run_id,
+            "stage": stage,
+            "fingerprint": fingerprint,
+            "output": output,
+            "started_at": started_at,
+            "duration_seconds": round(duration, 3),
+        }
+        tmp_path = self._path(stage) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp_path, self._path(stage))
+        return True
@@ -0,0 +1,409 @@
+import json
+import os
+import re
+import threading
+import time
+
+from tools.sandbox_pool import count_runs
+from tools.scientific_tools import ScientificTools
+from workflows.scheduler import DAGScheduler, TaskNode, topological_order
+
+_CODE_BLOCK_RE = re.compile(r"```(?:python|py)?[ \t]*\n(.*?)```", re.DOTALL)
+# Signs that the technician's report describes a failed run: execute_python_code's
+# success/error fields (as a dict or JSON), an actual traceback, or a line
+# starting with one of the tool's own error prefixes. A mere mention of an
+# exception class ("no ValueError was raised") is not a failure.
+_RUN_FAILURE_RE = re.compile(
+    r"""["']success["']\s*:\s*(False|false)\b|["']error["']\s*:\s*["']\S"""
+    r"|Traceback \(most recent call last\)|^\s*(PreflightError|SandboxError):",
+    re.M,
+)
+
+
+def fenced_code(text: str) -> str:
+    """The fenced code blocks in an agent's answer, joined; "" when it has none."""
+    return "\n\n".join(_CODE_BLOCK_RE.findall(text or ""))
+
+
+def extract_code(text: str) -> str:
+    """The Python code in an agent's answer: its fenced code blocks, or the whole text."""
+    return fenced_code(text) or (text or "")
+
+
+def _hypothesis(upstream: dict) -> str:
+    return "\n\n".join(output for name, output in upstream.items() if name.startswith("hypothesis"))
+
+
+# --- Gates: (output, upstream outputs, all accepted outputs) -> verdict ---
+# A verdict is {"proceed", "score", "feedback"} plus, to loop back further than
+# the stage itself, "retry": the name of the stage to run again.
+
+def hypothesis_gate(output: str, upstream: dict, accepted: dict) -> dict:
+    result = ScientificTools.evaluate_hypothesis_clarity(output)
+    return {"proceed": result["proceed"], "score": result["score"], "feedback": result["feedback"]}
+
+
+def design_gate(output: str, upstream: dict, accepted: dict) -> dict:
+    """
+    The design must be sound and its code must pass the static checks. Only
+    fenced code is checked: a design without code blocks is prose, not a
+    script with syntax errors.
+    """
+    soundness = ScientificTools.evaluate_experimental_design_soundness(output, _hypothesis(upstream))
+    source = fenced_code(output)
+    code = ScientificTools.analyze_code_for_errors(source) if source else {"issues": []}
+    errors = [issue for issue in code["issues"] if issue["severity"] == "error"]
+    feedback = [soundness["feedback"]]
+    if errors:
+        feedback.append(f"Code: {code['diagnosis']} {code['suggested_fix']}")
+    score = soundness["score"] * (0.5 if errors else 1.0)
+    return {"proceed": soundness["proceed"] and not errors, "score": round(score, 2), "feedback": " ".join(feedback)}
+
+
+def execution_gate(output: str, upstream: dict, accepted: dict) -> dict:
+    """A failed run sends the error back to the designer."""
+    match = _RUN_FAILURE_RE.search(output or "")
+    if match is None:
+        return {"proceed": True, "score": 1.0, "feedback": "Experiment ran successfully."}
+    report = output[max(0, match.start() - 200):match.end() + 800]
+    design = upstream.get("design") or accepted.get("design", "")
+    diagnosis = ScientificTools.analyze_code_for_errors(extract_code(design), error_message=report)
+    return {
+        "proceed": False, "score": 0.0, "retry": "design",
+        "feedback": (f"The experiment failed when run: {diagnosis['diagnosis']} {diagnosis['suggested_fix']}\n"
+                     f"Execution report excerpt:\n{report}"),
+    }
+
+
+def analysis_gate(output: str, upstream: dict, accepted: dict) -> dict:
+    """
+    Inconclusive results send the experiment back to the designer. Results that
+    contradict the hypothesis are a finding, not a failure, so they proceed.
+    """
+    hypothesis = _hypothesis(accepted) or accepted.get("design", "")
+    result = ScientificTools.compare_results_to_hypothesis(output, hypothesis)
+    if result["conclusion"] == "inconclusive":
+        return {"proceed": False, "score": result["confidence"], "retry": "design",
+                "feedback": "The results were inconclusive; design a stronger experiment (more samples, "
+                            "clearer controls and effect sizes)."}
+    return {"proceed": True, "score": result["confidence"], "feedback": result["summary"]}
+
+
+# Keyed by stage name; "hypothesis" also covers the hypothesis_<i> candidates.
+DEFAULT_GATES = {
+    "hypothesis": hypothesis_gate,
+    "design": design_gate,
+    "execute": execution_gate,
+    "analyze": analysis_gate,
+}
+
+
+class BudgetExhausted(RuntimeError):
+    """The closed loop's global time, LLM call or token budget ran out."""
+
+
+class _RetryStage(Exception):
+    """Raised by a gate to loop back to an upstream stage."""
+
+    def __init__(self, stage: str):
+        super().__init__(stage)
+        self.stage = stage
+
+
+class Budget:
+    """
+    Global limits for one closed-loop run; None means unlimited. LLM calls are
+    completion requests, so a chat() that calls tools counts several times.
+    """
+
+    def __init__(self, max_seconds: float = None, max_llm_calls: int = None, max_tokens: int = None):
+        self.max_seconds = max_seconds
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+
+    def exceeded(self, seconds: float, llm_calls: int, tokens: int):
+        """Why the budget is used up, or None."""
+        if self.max_seconds is not None and seconds >= self.max_seconds:
+            return f"time budget of {self.max_seconds:.0f}s used up"
+        if self.max_llm_calls is not None and llm_calls >= self.max_llm_calls:
+            return f"budget of {self.max_llm_calls} LLM calls used up"
+        if self.max_tokens is not None and tokens >= self.max_tokens:
+            return f"budget of {self.max_tokens} tokens used up"
+        return None
+
+
+def _agent_tokens(agent) -> int:
+    try:
+        usage = agent.cost_summary
+        return usage["tokens_in"] + usage["tokens_out"]
+    except Exception:
+        return 0
+
+
+def _agent_llm_calls(agent):
+    """Completion requests the agent has made (a chat() with tool calls makes several), or None if unknown."""
+    try:
+        return agent.cost_summary["llm_calls"]
+    except Exception:
+        return None
+
+
+class _GatedScheduler(DAGScheduler):
+    """DAGScheduler whose tasks are checked by the engine's gates after every attempt."""
+
+    def __init__(self, engine: "ClosedLoopEngine", max_workers: int, checkpoints):
+        super().__init__(max_workers=max_workers, checkpoints=checkpoints)
+        self.engine = engine
+
+    def restore(self, node: TaskNode, fingerprint: str):
+        # A stage sent back by a gate must run again, not come back from its checkpoint.
+        if node.name in self.engine.feedback:
+            return None
+        return super().restore(node, fingerprint)
+
+    def run_node(self, node: TaskNode, upstream: dict) -> str:
+        output = self.engine.run_gated(node, upstream, self.build_prompt)
+        self.engine.accept(node.name, output)
+        return output
+
+
+class ClosedLoopEngine:
+    """
+    Runs the task graph like DAGScheduler, but checks each stage's output with
+    its evaluator (`gates`, see DEFAULT_GATES) before anything downstream
+    consumes it. A failed check re-runs only the offending stage -- the stage
+    itself, or the upstream stage the gate names (e.g. a failed execution goes
+    back to the designer) -- with the evaluator's feedback in its prompt; the
+    outputs downstream of a re-run stage are discarded and recomputed.
+
+    Each stage may be retried `max_retries` times (or per stage via a dict);
+    when that is used up, the best attempt proceeds and the metrics say so. When
+    the global `budget` (time, LLM calls, tokens) runs out, the run stops with
+    status "budget_exhausted" and returns the outputs accepted so far.
+
+    `metrics` records every attempt (timing, tokens, sandbox runs, verdict)
+    and `saved` estimates the LLM calls and sandbox runs the gates avoided: a
+    rejected output would otherwise have flowed through every downstream task,
+    and preflight-rejected scripts never took a sandbox slot.
+    """
+
+    def __init__(self, gates: dict = None, max_retries=2, budget: Budget = None, max_workers: int = 4,
+                 checkpoints=None):
+        self.gates = DEFAULT_GATES if gates is None else gates
+        self.max_retries = max_retries
+        self.budget = budget or Budget()
+        self.max_workers = max_workers
+        self.checkpoints = checkpoints
+        self.metrics = []
+        self.saved = {"llm_calls": 0, "sandbox_runs": 0}
+        self.restored = set()
+        self.feedback = {}  # stage -> {"feedback", "previous"} for its next attempt
+        self.status = "pending"
+        self.rounds = 0
+        self._retries = {}
+        self._accepted = {}
+        self._descendants = {}
+        self._llm_calls = 0
+        self._tokens = 0
+        self._started = None
+        self._lock = threading.Lock()
+
+    def gate_for(self, name: str):
+        return self.gates.get(name) or self.gates.get(name.split("_")[0])
+
+    def retry_limit(self, stage: str) -> int:
+        if isinstance(self.max_retries, dict):
+            default = self.max_retries.get("default", 2)
+            return self.max_retries.get(stage, self.max_retries.get(stage.split("_")[0], default))
+        return self.max_retries
+
+    def accept(self, name: str, output: str):
+        with self._lock:
+            self._accepted[name] = output
+
+    def _take_retry(self, stage: str) -> bool:
+        with self._lock:
+            used = self._retries.get(stage, 0)
+            if used >= self.retry_limit(stage):
+                return False
+            self._retries[stage] = used + 1
+            return True
+
+    def _charge(self, node: TaskNode):
+        with self._lock:
+            reason = self.budget.exceeded(time.perf_counter() - self._started, self._llm_calls, self._tokens)
+            if reason is not None:
+                raise BudgetExhausted(f"Stopped before '{node.name}': {reason}.")
+
+    @staticmethod
+    def retry_prompt(prompt: str, feedback: dict) -> str:
+        return (f"{prompt}\n\nAn automatic check rejected a previous attempt at this task:\n{feedback['feedback']}\n\n"
+                f"Previous attempt:\n{feedback['previous']}\n\nRevise it to address the feedback.")
+
+    def run_gated(self, node: TaskNode, upstream: dict, build_prompt) -> str:
+        """Runs a node until its gate passes or its retries run out; returns the output to accept."""
+        gate = self.gate_for(node.name)
+        attempts = []  # (score, output)
+        while True:
+            self._charge(node)
+            feedback = self.feedback.get(node.name)
+            prompt = build_prompt(node, upstream)
+            if feedback is not None:
+                prompt = self.retry_prompt(prompt, feedback)
+            agent = node.task.agent
+            tokens_before, calls_before = _agent_tokens(agent), _agent_llm_calls(agent)
+            start = time.perf_counter()
+            try:
+                # Counted per attempt: the process-wide counters also see concurrent branches' runs.
+                with count_runs() as runs:
+                    response = agent.chat(prompt)
+            finally:
+                calls_after = _agent_llm_calls(agent)
+                llm_calls = calls_after - calls_before if calls_before is not None and calls_after is not None else 1
+                with self._lock:
+                    self._llm_calls += llm_calls
+            if response is None:
+                raise RuntimeError(f"Task '{node.name}': the agent returned no response (LLM error).")
+            output = str(response)
+            with self._lock:
+                accepted = dict(self._accepted)
+            verdict = gate(output, upstream, accepted) if gate is not None else None
+            tokens = max(0, _agent_tokens(agent) - tokens_before)
+            with self._lock:
+                attempt = sum(1 for m in self.metrics if m["stage"] == node.name) + 1
+            record = {
+                "stage": node.name, "attempt": attempt,
+                "seconds": round(time.perf_counter() - start, 3), "llm_calls": llm_calls, "tokens": tokens,
+                "sandbox_runs": runs["runs"],
+                "preflight_rejections": runs["rejected"],
+            }
+            with self._lock:
+                self._tokens += tokens
+                self.saved["sandbox_runs"] += record["preflight_rejections"]
+            if verdict is not None:
+                record.update(proceed=verdict["proceed"], score=verdict.get("score"), feedback=verdict.get("feedback"))
+            if verdict is None or verdict["proceed"]:
+                self._record(record)
+                with self._lock:
+                    self.feedback.pop(node.name, None)
+                return output
+
+            target = verdict.get("retry") or node.name
+            if target not in self._descendants:
+                target = node.name
+            attempts.append((verdict.get("score") or 0.0, output))
+            if not self._take_retry(target):
+                record["gate_overridden"] = f"retries of '{target}' used up"
+                self._record(record)
+                with self._lock:
+                    self.feedback.pop(node.name, None)
+                # Proceed with the best attempt at this stage.
+                return max(attempts, key=lambda attempt: attempt[0])[1] if target == node.name else output
+            record["retry"] = target
+            self._record(record)
+            self._count_saved(node.name)
+            if target == node.name:
+                with self._lock:
+                    self.feedback[node.name] = {"feedback": verdict.get("feedback", ""), "previous": output}
+                continue
+            previous = accepted.get(target, "")
+            with self._lock:
+                self.feedback[target] = {"feedback": verdict.get("feedback", ""), "previous": previous}
+            raise _RetryStage(target)
+
+    def _record(self, record: dict):
+        with self._lock:
+            self.metrics.append(record)
+        verdict = "" if "proceed" not in record else ("passed" if record["proceed"] else "failed")
+        suffix = f", retrying '{record['retry']}'" if "retry" in record else ""
+        suffix += f" ({record['gate_overridden']}; proceeding)" if "gate_overridden" in record else ""
+        if verdict:
+            print(f"--- Gate for '{record['stage']}' (attempt {record['attempt']}) {verdict}{suffix} ---")
+
+    def _count_saved(self, stage: str):
+        # Without the gate, the rejected output would have gone through everything downstream.
+        downstream = self._descendants.get(stage, set())
+        with self._lock:
+            self.saved["llm_calls"] += len(downstream)
+            self.saved["sandbox_runs"] += 1 if "execute" in downstream else 0
+
+    def _compute_descendants(self, nodes: list[TaskNode]):
+        children = {node.name: [] for node in nodes}
+        for node in nodes:
+            for dep in node.depends_on:
+                if dep in children:
+                    children[dep].append(node.name)
+        for name in children:
+            seen, stack = set(), list(children[name])
+            while stack:
+                child = stack.pop()
+                if child not in seen:
+                    seen.add(child)
+                    stack.extend(children[child])
+            self._descendants[name] = seen
+
+    def run(self, nodes: list[TaskNode], inputs: dict = None) -> dict:
+        """
+        Runs the graph to completion (or until the budget runs out) and returns
+        {name: output} of the accepted outputs, including `inputs`.
+        """
+        inputs = dict(inputs or {})
+        topological_order(nodes, external=inputs)  # Validate the graph up front.
+        self._compute_descendants(nodes)
+        self._started = time.perf_counter()
+        self.status = "running"
+        while True:
+            with self._lock:
+                pending = [node for node in nodes if node.name not in self._accepted]
+                known = dict(self._accepted)
+            if not pending:
+                self.status = "complete"
+                break
+            self.rounds += 1
+            scheduler = _GatedScheduler(self, self.max_workers, self.checkpoints)
+            try:
+                outputs = scheduler.run(pending, inputs={**inputs, **known})
+                with self._lock:
+                    self._accepted.update((name, outputs[name]) for name in (n.name for n in pending))
+            except _RetryStage as retry:
+                with self._lock:
+                    for name in {retry.stage} | self._descendants[retry.stage]:
+                        self._accepted.pop(name, None)
+                print(f"--- Looping back to '{retry.stage}' ---")
+            except BudgetExhausted as e:
+                self.status = "budget_exhausted"
+                print(f"--- {e} ---")
+                break
+            finally:
+                self.restored |= scheduler.restored
+        with self._lock:
+            return {**inputs, **self._accepted}
+
+    def report(self) -> dict:
+        with self._lock:
+            metrics = list(self.metrics)
+        return {
+            "status": self.status,
+            "rounds": self.rounds,
+            "attempts": len(metrics),
+            "llm_calls": sum(m["llm_calls"] for m in metrics),
+            "tokens": sum(m["tokens"] for m in metrics),
+            "sandbox_runs": sum(m["sandbox_runs"] for m in metrics),
+            "gate_failures": sum(1 for m in metrics if m.get("proceed") is False),
+            "retries": dict(self._retries),
+            "saved": dict(self.saved),
+            "seconds": round(time.perf_counter() - self._started, 3) if self._started else 0.0,
+            "iterations": metrics,
+        }
+
+    def summary(self) -> str:
+        report = self.report()
+        return (f"Closed loop: {report['status']} after {report['attempts']} attempts in {report['rounds']} rounds, "
+                f"{report['gate_failures']} gate failures, {report['llm_calls']} LLM calls, "
+                f"{report['sandbox_runs']} sandbox runs; gating saved ~{report['saved']['llm_calls']} LLM calls "
+                f"and ~{report['saved']['sandbox_runs']} sandbox runs")
+
+    def save_report(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
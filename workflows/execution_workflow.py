@@ -1,5 +1,6 @@
 from agents.technician_agent import TechnicianAgent
 from praisonaiagents import Task # Needed for type hinting
+from workflows.scheduler import TaskNode
 
 class ExecutionWorkflow:
     def __init__(self, technician_agent: TechnicianAgent):
@@ -16,3 +17,9 @@ class ExecutionWorkflow:
         # when tasks are added to the main list in the correct order.
 
         return [task_execute]
+
+    def get_nodes(self, design_node: str = "design") -> list[TaskNode]:
+        """
+        Generates the task graph for experiment execution; it needs the designed code.
+        """
+        return [TaskNode("execute", self.technician_agent.get_task(), depends_on=[design_node])]
@@ -1,11 +1,18 @@
 from agents.researcher_agent import ResearcherAgent
 from agents.designer_agent import DesignerAgent
 from praisonaiagents import Task # Needed for type hinting if we add it
+from workflows.scheduler import TaskNode
 
 class HypothesisDesignWorkflow:
-    def __init__(self, researcher_agent: ResearcherAgent, designer_agent: DesignerAgent):
+    def __init__(self, researcher_agent: ResearcherAgent, designer_agent: DesignerAgent, researcher_factory=None):
+        """
+        `researcher_factory(task_name)` builds the researcher for each extra
+        candidate (hypothesis_2, ...), e.g. with the caller's cache, tracing
+        and routing installed; by default a plain copy of `researcher_agent`.
+        """
         self.researcher_agent = researcher_agent
         self.designer_agent = designer_agent
+        self.researcher_factory = researcher_factory or (lambda task_name: type(researcher_agent)(llm=researcher_agent.llm))
 
     def get_tasks(self, research_topic: str) -> list[Task]:
         """
@@ -15,10 +22,27 @@ class HypothesisDesignWorkflow:
         task_design = self.designer_agent.get_task()
 
         # The design task depends on the output of the hypothesis task.
-        # PraisonAI handles this dependency automatically if tasks are correctly defined
-        # and their agents are part of the same crew.
-        # If explicit dependency management is needed, it would be set here.
-        # For example: task_design.context = [task_hypothesis]
-        # However, PraisonAI usually infers this from task order and agent outputs.
+        task_design.context = [task_hypothesis]
 
         return [task_hypothesis, task_design]
+
+    def get_nodes(self, research_topic: str, num_hypotheses: int = 1) -> list[TaskNode]:
+        """
+        Generates the task graph for hypothesis formulation and experiment design.
+        With num_hypotheses > 1, that many candidate hypotheses are researched in
+        parallel and the design task receives all of them.
+        """
+        if num_hypotheses <= 1:
+            return [
+                TaskNode("hypothesis", self.researcher_agent.get_task(research_topic)),
+                TaskNode("design", self.designer_agent.get_task(num_hypotheses=1), depends_on=["hypothesis"]),
+            ]
+
+        nodes = []
+        for i in range(1, num_hypotheses + 1):
+            # Each candidate gets its own agent so parallel chats do not share history.
+            researcher = self.researcher_agent if i == 1 else self.researcher_factory(f"hypothesis_{i}")
+            nodes.append(TaskNode(f"hypothesis_{i}", researcher.get_task(research_topic, candidate=i, num_candidates=num_hypotheses)))
+        nodes.append(TaskNode("design", self.designer_agent.get_task(num_hypotheses=num_hypotheses),
+                              depends_on=[node.name for node in nodes]))
+        return nodes
@@ -0,0 +1,329 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from workflows.scheduler import TaskNode, topological_order
+
+# Job states: queued -> leased -> done | failed. A leased job whose lease
+# expires (its worker died or hung) goes back to queued, or to failed once it
+# has used up its attempts.
+TERMINAL = ("done", "failed")
+
+
+class JobQueue:
+    """
+    Durable queue of pipeline tasks in a SQLite file shared by every process
+    on a machine (enqueuers and workers).
+
+    Each job is one task of a run, tagged with its stage group (see
+    workflows.research_pipeline.STAGES) and the names of the tasks it depends
+    on. A job can be claimed once all of its dependencies are done. Claiming
+    takes a lease for `lease_seconds`, which the worker extends with
+    heartbeats while it works; a job whose lease runs out is handed to another
+    worker. Failed jobs are retried with a backoff until `max_attempts`; a job
+    that fails for good fails everything downstream of it.
+
+    SQLite's file locking makes this safe for several processes on one box;
+    across machines the file must be on a filesystem with working POSIX locks.
+    """
+
+    def __init__(self, path: str = "jobs.sqlite", lease_seconds: float = 60, max_attempts: int = 3,
+                 retry_backoff: float = 5.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY, run_id TEXT NOT NULL, name TEXT NOT NULL, stage TEXT NOT NULL,
+                payload TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL, not_before REAL NOT NULL DEFAULT 0,
+                lease_owner TEXT, lease_expires REAL, output TEXT, error TEXT,
+                created REAL NOT NULL, updated REAL NOT NULL, UNIQUE (run_id, name)
+            );
+            CREATE TABLE IF NOT EXISTS job_deps (
+                job_id INTEGER NOT NULL, run_id TEXT NOT NULL, dep TEXT NOT NULL, PRIMARY KEY (job_id, dep)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, stage, not_before);
+            """
+        )
+
+    @classmethod
+    def from_env(cls, path: str = None):
+        """Queue at `path` or JOB_QUEUE_PATH (default jobs.sqlite); JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS."""
+        return cls(
+            path=path or os.environ.get("JOB_QUEUE_PATH", "jobs.sqlite"),
+            lease_seconds=float(os.environ.get("JOB_LEASE_SECONDS", 60)),
+            max_attempts=int(os.environ.get("JOB_MAX_ATTEMPTS", 3)),
+        )
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    # --- Producers ---
+
+    def enqueue_run(self, jobs: list[dict], inputs: dict = None, run_id: str = None) -> str:
+        """
+        Adds the tasks of one run: `jobs` are {name, stage, depends_on, payload}
+        dicts; `inputs` are outputs of tasks outside the run (stored as done
+        jobs so dependents can read them). Returns the run id.
+        """
+        run_id = run_id or time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        inputs = inputs or {}
+        nodes = [TaskNode(job["name"], None, job.get("depends_on", ())) for job in jobs]
+        topological_order(nodes, external=inputs)  # Reject unknown dependencies and cycles up front.
+        now = time.time()
+        with self._transaction() as conn:
+            for name, output in inputs.items():
+                conn.execute(
+                    "INSERT INTO jobs (run_id, name, stage, payload, status, max_attempts, output, created, updated)"
+                    " VALUES (?, ?, 'input', '{}', 'done', 0, ?, ?, ?)", (run_id, name, output, now, now))
+            for job in jobs:
+                cursor = conn.execute(
+                    "INSERT INTO jobs (run_id, name, stage, payload, status, max_attempts, created, updated)"
+                    " VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (run_id, job["name"], job["stage"], json.dumps(job.get("payload", {})),
+                     job.get("max_attempts", self.max_attempts), now, now))
+                conn.executemany("INSERT INTO job_deps (job_id, run_id, dep) VALUES (?, ?, ?)",
+                                 [(cursor.lastrowid, run_id, dep) for dep in job.get("depends_on", ())])
+        return run_id
+
+    # --- Workers ---
+
+    def _recover_expired(self, conn, now: float) -> list:
+        """Requeues (or fails) leased jobs whose lease has run out; returns the ids that failed."""
+        expired = conn.execute(
+            "SELECT id, attempts, max_attempts FROM jobs WHERE status = 'leased' AND lease_expires < ?", (now,)
+        ).fetchall()
+        failed = []
+        for job_id, attempts, max_attempts in expired:
+            if attempts >= max_attempts:
+                conn.execute("UPDATE jobs SET status = 'failed', lease_owner = NULL, updated = ?, "
+                             "error = 'lease expired on the last attempt (worker died or hung)' WHERE id = ?",
+                             (now, job_id))
+                failed.append(job_id)
+            else:
+                conn.execute("UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires = NULL, "
+                             "updated = ?, error = 'lease expired (worker died or hung)' WHERE id = ?",
+                             (now, job_id))
+        return failed
+
+    def claim(self, stages, worker_id: str):
+        """
+        Leases the oldest runnable job of one of `stages` (all dependencies
+        done) to `worker_id`. Returns the job dict with its upstream outputs
+        under "upstream", or None if there is nothing to do.
+        """
+        stages = list(stages)
+        now = time.time()
+        with self._transaction() as conn:
+            for job_id in self._recover_expired(conn, now):
+                self._fail_downstream(conn, job_id, now)
+            row = conn.execute(
+                f"""
+                SELECT j.id FROM jobs j
+                WHERE j.status = 'queued' AND j.not_before <= ? AND j.stage IN ({','.join('?' * len(stages))})
+                  AND NOT EXISTS (
+                    SELECT 1 FROM job_deps d JOIN jobs p ON p.run_id = d.run_id AND p.name = d.dep
+                    WHERE d.job_id = j.id AND p.status != 'done')
+                ORDER BY j.id LIMIT 1
+                """, (now, *stages)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                         "attempts = attempts + 1, updated = ? WHERE id = ?",
+                         (worker_id, now + self.lease_seconds, now, row[0]))
+            job = self._job(conn, row[0])
+            job["upstream"] = dict(conn.execute(
+                "SELECT p.name, p.output FROM job_deps d JOIN jobs p ON p.run_id = d.run_id AND p.name = d.dep "
+                "WHERE d.job_id = ?", (row[0],)).fetchall())
+        return job
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """Extends the lease; False means it was lost (expired and taken over) and the result will be discarded."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, time.time(), job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, output: str) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', output = ?, error = NULL, lease_owner = NULL, updated = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'", (output, time.time(), job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> str:
+        """Records a failed attempt; returns the job's new status ('queued' to retry, or 'failed')."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ? "
+                               "AND status = 'leased'", (job_id, worker_id)).fetchone()
+            if row is None:
+                return "lost"
+            attempts, max_attempts = row
+            if attempts < max_attempts:
+                conn.execute("UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires = NULL, "
+                             "not_before = ?, error = ?, updated = ? WHERE id = ?",
+                             (now + self.retry_backoff * attempts, error, now, job_id))
+                return "queued"
+            conn.execute("UPDATE jobs SET status = 'failed', lease_owner = NULL, error = ?, updated = ? "
+                         "WHERE id = ?", (error, now, job_id))
+            self._fail_downstream(conn, job_id, now)
+            return "failed"
+
+    def release(self, job_id: int, worker_id: str):
+        """Gives a leased job back without counting the attempt (e.g. the worker is shutting down)."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires = NULL, "
+                         "attempts = attempts - 1, updated = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                         (time.time(), job_id, worker_id))
+
+    def _fail_downstream(self, conn, job_id: int, now: float):
+        run_id, name = conn.execute("SELECT run_id, name FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        failed = [name]
+        while failed:
+            dep = failed.pop()
+            for child_id, child in conn.execute(
+                    "SELECT j.id, j.name FROM job_deps d JOIN jobs j ON j.id = d.job_id "
+                    "WHERE d.run_id = ? AND d.dep = ? AND j.status = 'queued'", (run_id, dep)).fetchall():
+                conn.execute("UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ?",
+                             (f"upstream task '{dep}' failed", now, child_id))
+                failed.append(child)
+
+    # --- Inspection ---
+
+    @staticmethod
+    def _job(conn, job_id: int) -> dict:
+        cursor = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        columns = [column[0] for column in cursor.description]
+        job = dict(zip(columns, cursor.fetchone()))
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def jobs(self, run_id: str) -> list[dict]:
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT id FROM jobs WHERE run_id = ? AND stage != 'input' ORDER BY id", (run_id,))]
+            return [self._job(self._conn, job_id) for job_id in ids]
+
+    def pending(self, stages=None) -> int:
+        """Jobs not yet finished (queued or leased), optionally only of some stages."""
+        query = "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'leased')"
+        params = []
+        if stages:
+            query += f" AND stage IN ({','.join('?' * len(stages))})"
+            params = list(stages)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def pending_run(self, run_id: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE run_id = ? AND status IN ('queued', 'leased')",
+                                      (run_id,)).fetchone()[0]
+
+    def run_status(self, run_id: str) -> dict:
+        """{status: count} for a run's jobs."""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE run_id = ? AND stage != 'input' GROUP BY status", (run_id,)))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, so a claim never races another process's claim."""
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+
+
+class JobWorker:
+    """
+    Claims jobs of some stage groups from a JobQueue and runs them with
+    `execute(job, upstream) -> output`, heartbeating the lease from a
+    background thread. With `exit_when_idle`, stops once no job of its stages
+    is queued or running; otherwise polls until interrupted.
+    """
+
+    def __init__(self, queue: JobQueue, stages, execute, worker_id: str = None, poll_interval: float = 1.0,
+                 exit_when_idle: bool = False):
+        self.queue = queue
+        self.stages = list(stages)
+        self.execute = execute
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:4]}"
+        self.poll_interval = poll_interval
+        self.exit_when_idle = exit_when_idle
+        self.stats = {"done": 0, "failed": 0, "retried": 0, "lost_leases": 0}
+
+    def _heartbeat(self, job_id: int, stop: threading.Event, lost: threading.Event):
+        interval = max(0.5, self.queue.lease_seconds / 3)
+        while not stop.wait(interval):
+            if not self.queue.heartbeat(job_id, self.worker_id):
+                lost.set()
+                return
+
+    def run_one(self) -> bool:
+        """Claims and runs one job; returns False if there was nothing to claim."""
+        job = self.queue.claim(self.stages, self.worker_id)
+        if job is None:
+            return False
+        print(f"--- [{self.worker_id}] {job['run_id']}/{job['name']} (attempt {job['attempts']}) ---")
+        stop, lost = threading.Event(), threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job["id"], stop, lost), daemon=True)
+        beat.start()
+        try:
+            output = self.execute(job, job["upstream"])
+        except KeyboardInterrupt:
+            self.queue.release(job["id"], self.worker_id)
+            raise
+        except Exception as e:
+            status = self.queue.fail(job["id"], self.worker_id, f"{type(e).__name__}: {e}")
+            self.stats["retried" if status == "queued" else "failed"] += 1
+            print(f"--- [{self.worker_id}] {job['name']} failed ({type(e).__name__}: {e}); now {status} ---")
+            return True
+        finally:
+            stop.set()
+            beat.join()
+        if lost.is_set() or not self.queue.complete(job["id"], self.worker_id, output):
+            self.stats["lost_leases"] += 1
+            print(f"--- [{self.worker_id}] lease on {job['name']} was lost; result discarded ---")
+        else:
+            self.stats["done"] += 1
+        return True
+
+    def run(self):
+        while True:
+            if self.run_one():
+                continue
+            if self.exit_when_idle and not self.queue.pending(self.stages):
+                return self.stats
+            time.sleep(self.poll_interval)
@@ -0,0 +1,199 @@
+import contextlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+from tools.scientific_tools import LATEX_END, LATEX_PREAMBLE, LATEX_SECTION_NAMES, latex_section
+from tools.tracing import get_tracer
+
+_FENCE_RE = re.compile(r"^```[a-z]*\s*\n|\n?```\s*$", re.I)
+_REVISED_RE = re.compile(r"^\s*REVISED( SECTION)?:\s*$", re.I | re.M)
+_DONE = object()
+
+
+def _write_file(path: str, text: str):
+    """Replaces `path` atomically, so readers of the progressive files never see half a section."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def clean_section(name: str, text: str, template: str) -> str:
+    """An agent's answer as a LaTeX section: code fences removed, heading added if it is missing."""
+    text = _FENCE_RE.sub("", (text or "").strip()).strip()
+    if not text:
+        return template
+    if "\\section" not in text:
+        text = template.split("\n", 1)[0] + "\n" + text
+    return text + "\n\n"
+
+
+def split_review(text: str, section: str):
+    """(feedback, revised section) from a reviewer's answer; without a REVISED: line the section is kept."""
+    match = _REVISED_RE.search(text or "")
+    if match is None:
+        return (text or "").strip(), section
+    return text[:match.start()].strip(), text[match.end():]
+
+
+class ManuscriptStream:
+    """
+    Writes the paper one section at a time (LATEX_SECTION_NAMES, the layout of
+    ScientificTools.write_latex_paper) and reviews each section as soon as it
+    is written, instead of reviewing the finished draft.
+
+    `write(prompt)` is the writer's chat; `review` is one reviewer chat or a
+    list of them, each served by its own thread (an agent's chat history is
+    not shared between threads). Progress is written to `out_dir` as it
+    happens: sections/ and reviewed/ hold one file per section, draft.tex and
+    manuscript.tex are rewritten after every section, reviews.md collects the
+    feedback and progress.json the timings. A section the writer answers
+    with an empty text falls back to its write_latex_paper template; a failed
+    LLM call (None) fails the run, so it is never saved as a finished draft.
+    """
+
+    def __init__(self, write, review, out_dir: str, sections=LATEX_SECTION_NAMES):
+        self.write = write
+        self.reviews = list(review) if isinstance(review, (list, tuple)) else [review]
+        self.out_dir = out_dir
+        self.sections = list(sections)
+        self.drafts = {}  # section -> LaTeX as written
+        self.revised = {}  # section -> LaTeX after review
+        self.feedback = {}
+        self.timings = {}  # section -> {"written": s, "reviewed": s} since the start
+        self.stats = {"time_to_first_section": None, "time_to_first_review": None, "wall_seconds": None,
+                      "fallbacks": 0}
+        self._lock = threading.Lock()
+        self._start = None
+        for sub in ("sections", "reviewed"):
+            os.makedirs(os.path.join(out_dir, sub), exist_ok=True)
+
+    # --- Prompts ---
+
+    def write_prompt(self, section: str, analysis: str, hypothesis: str, template: str) -> str:
+        return (
+            f"Write the {section} section of a LaTeX scientific paper. Reply with only that section, "
+            f"starting with its \\section heading, and no preamble.\n\n"
+            f"Hypothesis:\n{hypothesis}\n\nData analysis summary:\n{analysis}\n\n"
+            f"Expand and improve this draft of the section:\n{template}"
+        )
+
+    def review_prompt(self, section: str, text: str) -> str:
+        return (
+            f"Critically review the {section} section of a scientific paper draft for clarity, soundness of the "
+            f"reported results and contribution. Give brief feedback, then a line containing only 'REVISED:' "
+            f"followed by the improved section in LaTeX.\n\n{text}"
+        )
+
+    # --- Progressive output ---
+
+    def _elapsed(self) -> float:
+        return round(time.perf_counter() - self._start, 3)
+
+    def _file_name(self, section: str) -> str:
+        return f"{self.sections.index(section) + 1:02d}-{section.lower()}.tex"
+
+    def _assemble(self, parts: dict, pending: str) -> str:
+        return LATEX_PREAMBLE + "".join(parts.get(section, f"% {section}: {pending}\n\n")
+                                        for section in self.sections) + LATEX_END
+
+    def _save_progress(self):
+        """Called with the lock held."""
+        _write_file(os.path.join(self.out_dir, "draft.tex"), self._assemble(self.drafts, "not written yet"))
+        _write_file(os.path.join(self.out_dir, "manuscript.tex"), self._assemble(self.revised, "under review"))
+        _write_file(os.path.join(self.out_dir, "reviews.md"), "".join(
+            f"## {section}\n\n{self.feedback[section]}\n\n" for section in self.sections if section in self.feedback))
+        _write_file(os.path.join(self.out_dir, "progress.json"),
+                    json.dumps({"sections": self.timings, **self.stats}, indent=2))
+
+    # --- Producer / consumers ---
+
+    def _span(self, name: str, stage: str):
+        tracer = get_tracer()
+        return tracer.span(name, "task", stage=stage) if tracer is not None else contextlib.nullcontext({})
+
+    def _produce(self, analysis: str, hypothesis: str, ready: queue.Queue, errors: list):
+        try:
+            for section in self.sections:
+                template = latex_section(section, analysis, hypothesis)
+                with self._span(f"write:{section}", "write"):
+                    response = self.write(self.write_prompt(section, analysis, hypothesis, template))
+                if response is None:
+                    raise RuntimeError(f"Writing the {section} section: the agent returned no response (LLM error).")
+                text = clean_section(section, str(response), template)
+                with self._lock:
+                    self.stats["fallbacks"] += text is template
+                    self.drafts[section] = text
+                    self.timings[section] = {"written": self._elapsed()}
+                    if self.stats["time_to_first_section"] is None:
+                        self.stats["time_to_first_section"] = self.timings[section]["written"]
+                    _write_file(os.path.join(self.out_dir, "sections", self._file_name(section)), text)
+                    self._save_progress()
+                print(f"--- Section '{section}' written ({self.timings[section]['written']:.1f}s) ---")
+                ready.put(section)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for _ in self.reviews:
+                ready.put(_DONE)
+
+    def _consume(self, review, ready: queue.Queue, errors: list):
+        while True:
+            section = ready.get()
+            if section is _DONE:
+                return
+            if errors:
+                continue  # Drain the queue; the run has failed.
+            try:
+                with self._span(f"review:{section}", "review"):
+                    response = review(self.review_prompt(section, self.drafts[section]))
+                if response is None:
+                    raise RuntimeError(f"Reviewing the {section} section: the agent returned no response (LLM error).")
+            except Exception as e:
+                errors.append(e)
+                continue
+            feedback, revised = split_review(str(response), self.drafts[section])
+            revised = clean_section(section, revised, self.drafts[section])
+            with self._lock:
+                self.revised[section] = revised
+                self.feedback[section] = feedback
+                self.timings[section]["reviewed"] = self._elapsed()
+                if self.stats["time_to_first_review"] is None:
+                    self.stats["time_to_first_review"] = self.timings[section]["reviewed"]
+                _write_file(os.path.join(self.out_dir, "reviewed", self._file_name(section)), revised)
+                self._save_progress()
+            print(f"--- Section '{section}' reviewed ({self.timings[section]['reviewed']:.1f}s) ---")
+
+    def run(self, analysis: str, hypothesis: str) -> dict:
+        """
+        Writes and reviews every section; returns {"draft", "manuscript",
+        "feedback"} with the full LaTeX texts. Re-raises the first failure.
+        """
+        self._start = time.perf_counter()
+        ready, errors = queue.Queue(), []
+        reviewers = [threading.Thread(target=self._consume, args=(review, ready, errors),
+                                      name=f"reviewer-{i}", daemon=True) for i, review in enumerate(self.reviews)]
+        for thread in reviewers:
+            thread.start()
+        self._produce(analysis, hypothesis, ready, errors)
+        for thread in reviewers:
+            thread.join()
+        with self._lock:
+            self.stats["wall_seconds"] = self._elapsed()
+            self._save_progress()
+        if errors:
+            raise errors[0]
+        return {"draft": self._assemble(self.drafts, "not written yet"),
+                "manuscript": self._assemble(self.revised, "under review"),
+                "feedback": dict(self.feedback)}
+
+    def summary(self) -> str:
+        return (f"Manuscript stream: first section after {self.stats['time_to_first_section']}s, first review "
+                f"after {self.stats['time_to_first_review']}s, done in {self.stats['wall_seconds']}s "
+                f"({len(self.revised)}/{len(self.sections)} sections reviewed, {self.stats['fallbacks']} "
+                f"template fallbacks) -> {self.out_dir}")
+
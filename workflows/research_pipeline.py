@@ -0,0 +1,99 @@
+from praisonaiagents import Task # Needed for type hinting
+
+from agents.researcher_agent import ResearcherAgent
+from agents.designer_agent import DesignerAgent
+from agents.technician_agent import TechnicianAgent
+from agents.analyst_agent import AnalystAgent
+from agents.writer_agent import WriterAgent
+from agents.reviewer_agent import ReviewerAgent
+from workflows.hypothesis_design_workflow import HypothesisDesignWorkflow
+from workflows.execution_workflow import ExecutionWorkflow
+from workflows.analysis_writing_workflow import AnalysisAndWritingWorkflow
+from workflows.review_workflow import ReviewWorkflow
+from workflows.scheduler import TaskNode
+
+# Pipeline order; keys match agents.chat_hooks.agent_key().
+AGENT_CLASSES = {
+    "researcher": ResearcherAgent,
+    "designer": DesignerAgent,
+    "technician": TechnicianAgent,
+    "analyst": AnalystAgent,
+    "writer": WriterAgent,
+    "reviewer": ReviewerAgent,
+}
+
+
+# The agent that runs each kind of task ("hypothesis" also covers hypothesis_<i>).
+TASK_AGENTS = {
+    "hypothesis": "researcher",
+    "design": "designer",
+    "execute": "technician",
+    "analyze": "analyst",
+    "write": "writer",
+    "review": "reviewer",
+}
+
+
+def build_agents(llm_config) -> dict:
+    """Instantiates one of each agent wrapper, keyed by short name."""
+    return {name: cls(llm=llm_config) for name, cls in AGENT_CLASSES.items()}
+
+
+# Stage groups in pipeline order: the workflow class and the agents it needs.
+STAGES = {
+    "hypothesis_design": (HypothesisDesignWorkflow, ("researcher", "designer")),
+    "execution": (ExecutionWorkflow, ("technician",)),
+    "analysis_writing": (AnalysisAndWritingWorkflow, ("analyst", "writer")),
+    "review": (ReviewWorkflow, ("reviewer",)),
+}
+
+
+def build_stage_workflow(stage: str, agents, **options):
+    """
+    One conceptual workflow; `agents` only needs the entries listed in STAGES.
+    `options` go to the workflow class (e.g. researcher_factory for hypothesis_design).
+    """
+    workflow_class, agent_names = STAGES[stage]
+    return workflow_class(*(agents[name] for name in agent_names), **options)
+
+
+def build_workflows(agents: dict) -> dict:
+    """The four conceptual workflows, keyed by stage group."""
+    return {stage: build_stage_workflow(stage, agents) for stage in STAGES}
+
+
+def build_tasks(agents: dict, research_topic: str) -> list[Task]:
+    """Collects the tasks of the four workflows, in pipeline order."""
+    workflows = build_workflows(agents)
+    return (workflows["hypothesis_design"].get_tasks(research_topic) + workflows["execution"].get_tasks()
+            + workflows["analysis_writing"].get_tasks() + workflows["review"].get_tasks())
+
+
+def build_nodes(workflows: dict, research_topic: str, num_hypotheses: int = 1, stages=None) -> list[TaskNode]:
+    """
+    The pipeline as a dependency graph for workflows.scheduler.DAGScheduler,
+    optionally restricted to some stage groups (`workflows` then only needs
+    those). Tasks of the other groups are left out, so their outputs must be
+    supplied as scheduler inputs. With several candidate hypotheses, the
+    design task states the chosen one, so the writer reads it from there.
+    """
+    stages = STAGES if stages is None else stages
+    hypothesis_nodes = ["hypothesis"] if num_hypotheses <= 1 else ["design"]
+    nodes = []
+    if "hypothesis_design" in stages:
+        nodes += workflows["hypothesis_design"].get_nodes(research_topic, num_hypotheses)
+    if "execution" in stages:
+        nodes += workflows["execution"].get_nodes()
+    if "analysis_writing" in stages:
+        nodes += workflows["analysis_writing"].get_nodes(hypothesis_nodes=hypothesis_nodes)
+    if "review" in stages:
+        nodes += workflows["review"].get_nodes()
+    return nodes
+
+
+def build_workflow(agents: dict, research_topic: str) -> "PraisonAIAgents":
+    """A self-contained PraisonAI workflow for one research topic."""
+    from praisonaiagents import PraisonAIAgents as Workflow  # Heavy; only needed here.
+
+    tasks = build_tasks(agents, research_topic)
+    return Workflow(agents=[a.agent for a in agents.values()], tasks=tasks, process="workflow")
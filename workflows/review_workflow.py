@@ -1,5 +1,6 @@
 from agents.reviewer_agent import ReviewerAgent
 from praisonaiagents import Task # Needed for type hinting
+from workflows.scheduler import TaskNode
 
 class ReviewWorkflow:
     def __init__(self, reviewer_agent: ReviewerAgent):
@@ -15,3 +16,9 @@ class ReviewWorkflow:
         # PraisonAI handles this dependency automatically.
 
         return [task_review]
+
+    def get_nodes(self, write_node: str = "write") -> list[TaskNode]:
+        """
+        Generates the task graph for paper review; it only needs the draft.
+        """
+        return [TaskNode("review", self.reviewer_agent.get_task(), depends_on=[write_node])]
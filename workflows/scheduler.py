@@ -0,0 +1,173 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from praisonaiagents import Task # Needed for type hinting
+
+from agents.context_budget import get_context_budget
+from tools.tracing import get_tracer
+
+
+class TaskNode:
+    """A task plus the names of the tasks whose outputs it needs."""
+
+    def __init__(self, name: str, task: Task, depends_on=()):
+        self.name = name
+        self.task = task
+        self.depends_on = tuple(depends_on)
+
+    def __repr__(self):
+        return f"TaskNode({self.name!r}, depends_on={list(self.depends_on)})"
+
+
+def topological_order(nodes: list[TaskNode], external=()) -> list[str]:
+    """
+    Kahn's algorithm; ties keep declaration order. Dependencies named in
+    `external` are provided from outside the graph. Raises ValueError on
+    cycles or unknown deps.
+    """
+    by_name = {node.name: node for node in nodes}
+    if len(by_name) != len(nodes):
+        raise ValueError("Duplicate task node names.")
+    indegree = {node.name: 0 for node in nodes}
+    dependents = {node.name: [] for node in nodes}
+    for node in nodes:
+        for dep in node.depends_on:
+            if dep in external and dep not in by_name:
+                continue
+            if dep not in by_name:
+                raise ValueError(f"Task '{node.name}' depends on unknown task '{dep}'.")
+            indegree[node.name] += 1
+            dependents[dep].append(node.name)
+    ready = [node.name for node in nodes if indegree[node.name] == 0]
+    order = []
+    while ready:
+        name = ready.pop(0)
+        order.append(name)
+        for child in dependents[name]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+    if len(order) != len(nodes):
+        stuck = sorted(set(by_name) - set(order))
+        raise ValueError(f"Dependency cycle between tasks: {stuck}")
+    return order
+
+
+class DAGScheduler:
+    """
+    Runs a graph of TaskNodes, starting each task as soon as all of its
+    dependencies have finished, with at most `max_workers` tasks in flight.
+
+    Each task is executed with `task.agent.chat(prompt)`, where the prompt is
+    the task description followed by the outputs of its declared upstream
+    tasks only -- nothing else from the run leaks into its context. A
+    `context_budget` (agents.context_budget.ContextBudget; by default the
+    process-wide one, disabled by CONTEXT_BUDGET=0) caps how many tokens of
+    those outputs a prompt carries, passing digests of oversized ones.
+
+    With a `checkpoints` store (workflows.checkpoint.CheckpointStore), tasks
+    whose inputs are unchanged since a previous attempt of the same run are
+    restored instead of executed, and every executed task is checkpointed.
+    """
+
+    def __init__(self, max_workers: int = 4, checkpoints=None, context_budget=None):
+        self.max_workers = max_workers
+        self.checkpoints = checkpoints
+        self.context_budget = get_context_budget() if context_budget is None else context_budget
+        self.timings = {}  # name -> (start, end) in time.perf_counter() seconds
+        self.restored = set()
+        self._lock = threading.Lock()
+
+    def build_prompt(self, node: TaskNode, upstream: dict) -> str:
+        if upstream and self.context_budget:
+            upstream = self.context_budget.fit(node.name, upstream)
+        prompt = node.task.description or ""
+        if upstream:
+            prompt += "\n\nContext from upstream tasks:"
+            for name in node.depends_on:
+                prompt += f"\n\n### {name}\n{upstream[name]}"
+        return prompt
+
+    def run_node(self, node: TaskNode, upstream: dict) -> str:
+        """Executes a single node. Override to change how tasks are run."""
+        response = node.task.agent.chat(self.build_prompt(node, upstream))
+        if response is None:
+            # PraisonAI returns None when the LLM call failed; don't let that pass as an (empty) result.
+            raise RuntimeError(f"Task '{node.name}': the agent returned no response (LLM error).")
+        return str(response)
+
+    def restore(self, node: TaskNode, fingerprint: str):
+        """The checkpointed output to reuse for a node, or None to run it. Override to skip checkpoints."""
+        return self.checkpoints.load(node.name, fingerprint)
+
+    def _execute(self, node: TaskNode, upstream: dict) -> str:
+        fingerprint = None
+        if self.checkpoints is not None:
+            fingerprint = self.checkpoints.fingerprint(node, upstream)
+            output = self.restore(node, fingerprint)
+            if output is not None:
+                with self._lock:
+                    self.restored.add(node.name)
+                return output
+        tracer = get_tracer()
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            if tracer is None:
+                output = self.run_node(node, upstream)
+            else:
+                with tracer.span(node.name, "task", stage=node.name,
+                                 in_bytes=sum(map(len, upstream.values()))) as span_args:
+                    output = self.run_node(node, upstream)
+                    span_args["out_bytes"] = len(output)
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.timings[node.name] = (start, end)
+        if self.checkpoints is not None:
+            self.checkpoints.save(node.name, fingerprint, output, started_at, end - start)
+        return output
+
+    def run(self, nodes: list[TaskNode], inputs: dict = None) -> dict:
+        """
+        Runs every node and returns {name: output}. `inputs` supplies outputs of
+        tasks that are not part of this graph (e.g. stages run earlier).
+        Re-raises the first task failure.
+        """
+        inputs = dict(inputs or {})
+        order = topological_order(nodes, external=inputs)
+        by_name = {node.name: node for node in nodes}
+        remaining = {node.name: set(node.depends_on) - (set(inputs) - set(by_name)) for node in nodes}
+        outputs = {name: output for name, output in inputs.items() if name not in by_name}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dag") as executor:
+            running = {}
+
+            def submit_ready():
+                for name in order:
+                    if name in remaining and not remaining[name]:
+                        del remaining[name]
+                        node = by_name[name]
+                        upstream = {dep: outputs[dep] for dep in node.depends_on}
+                        running[executor.submit(self._execute, node, upstream)] = name
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        outputs[name] = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    how = "restored from checkpoint" if name in self.restored else "complete"
+                    print(f"--- Task '{name}' {how} ---")
+                    for deps in remaining.values():
+                        deps.discard(name)
+                if error is None:
+                    submit_ready()
+        if error is not None:
+            raise error
+        return outputs